@@ -0,0 +1,261 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from assets.models import Asset
+from strategies.models import PortfolioStrategy, StrategyHolding
+from strategies.services import strategy_metrics_from_holdings
+
+ASSET_TYPE_LABELS = {
+    "STOCK": "Stocks",
+    "ETF": "ETFs",
+    "REIT": "REITs",
+}
+
+# Safety net only; trades and snapshots invalidate explicitly.
+DASHBOARD_CACHE_SECONDS = 300
+
+# Bumped after every snapshot run. Runs write with bulk_create, which
+# sends no post_save, so every cached dashboard is keyed on it instead.
+SNAPSHOTS_VERSION_KEY = "dashboard:snapshots-version"
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def bump_snapshots_version():
+    _bump_version(SNAPSHOTS_VERSION_KEY)
+
+
+class DashboardService:
+    """
+    Builds the customer dashboard payload for one portfolio.
+
+    Positions, strategies, snapshots and recent trades are cached until
+    the portfolio trades, gets a new snapshot or a snapshot run finishes.
+    Everything that depends
+    on prices is recomputed from them on every call with one price query,
+    so a warm dashboard costs a single query and price ticks never evict
+    it. The cache must be shared by all processes (see CACHES) for the
+    invalidations to reach every worker.
+    """
+
+    def __init__(self, portfolio):
+        self.portfolio = portfolio
+
+    @staticmethod
+    def cache_key(portfolio_id):
+        return f"dashboard:{portfolio_id}:{cache.get(SNAPSHOTS_VERSION_KEY, 0)}"
+
+    @classmethod
+    def invalidate(cls, portfolio_id):
+        cache.delete(cls.cache_key(portfolio_id))
+
+    def get(self):
+        key = self.cache_key(self.portfolio.pk)
+        positions = cache.get(key)
+        if positions is None:
+            positions = self.load_positions()
+            cache.set(key, positions, DASHBOARD_CACHE_SECONDS)
+
+        prices = {}
+        if positions["asset_ids"]:
+            prices = dict(
+                Asset.objects.filter(pk__in=positions["asset_ids"]).values_list("pk", "price")
+            )
+        return self.build(positions, prices)
+
+    def load_positions(self):
+        """
+        The price-independent part of the dashboard, from five queries.
+        """
+        portfolio = self.portfolio
+        holdings = [
+            (holding.asset_id, holding.asset.asset_type, holding.total_quantity,
+             holding.quantity, holding.average_price)
+            for holding in portfolio.holdings.with_valuation()
+        ]
+        strategies = self._load_strategies()
+
+        asset_ids = {holding[0] for holding in holdings}
+        for strategy in strategies:
+            asset_ids.update(sh.asset_id for sh in strategy["holdings"])
+
+        snapshots = portfolio.snapshots
+        return {
+            "asset_ids": sorted(asset_ids),
+            "holdings": holdings,
+            "strategies": strategies,
+            "latest_values": list(
+                snapshots.order_by("-created_at").values_list("total_value", flat=True)[:2]
+            ),
+            "first_value": snapshots.order_by("created_at").values_list(
+                "total_value", flat=True
+            ).first(),
+            "recent_trades": list(portfolio.trades.select_related("asset")[:7]),
+        }
+
+    def build(self, positions, prices):
+        payload = {}
+        payload.update(self._holdings_summary(positions["holdings"], prices))
+        payload.update(self._strategies_summary(positions["strategies"], prices))
+        payload.update(self._performance_summary(
+            positions["latest_values"], positions["first_value"]
+        ))
+        payload["recent_trades"] = positions["recent_trades"]
+        return payload
+
+    def _holdings_summary(self, holdings, prices):
+        """
+        Allocation, diversification and best asset type in a single pass
+        over the holdings.
+        """
+        allocation = {}
+        performance = {}
+        holding_count = 0
+
+        for asset_id, asset_type, total_quantity, quantity, average_price in holdings:
+            holding_count += 1
+            current_value = prices[asset_id] * total_quantity
+
+            allocation.setdefault(asset_type, 0)
+            allocation[asset_type] += current_value
+
+            cost = quantity * average_price
+            if cost > 0:
+                performance.setdefault(asset_type, {"profit": 0, "cost": 0})
+                performance[asset_type]["profit"] += current_value - cost
+                performance[asset_type]["cost"] += cost
+
+        total_allocation_value = sum(allocation.values())
+        allocation_percentages = {
+            k: round((v / total_allocation_value) * 100, 2)
+            if total_allocation_value > 0 else 0
+            for k, v in allocation.items()
+        }
+
+        largest_allocation_label = lowest_allocation_label = None
+        largest_allocation_percent = lowest_allocation_percent = 0
+        if allocation_percentages:
+            largest = max(allocation_percentages.items(), key=lambda x: x[1])
+            lowest = min(allocation_percentages.items(), key=lambda x: x[1])
+
+            largest_allocation_label = ASSET_TYPE_LABELS.get(largest[0])
+            largest_allocation_percent = largest[1]
+
+            lowest_allocation_label = ASSET_TYPE_LABELS.get(lowest[0])
+            lowest_allocation_percent = lowest[1]
+
+        best_asset_label = None
+        best_asset_roi = 0
+        performance_roi = {
+            k: (v["profit"] / v["cost"]) * 100
+            for k, v in performance.items()
+            if v["cost"] > 0
+        }
+        if performance_roi:
+            best = max(performance_roi.items(), key=lambda x: x[1])
+            best_asset_label = ASSET_TYPE_LABELS.get(best[0])
+            best_asset_roi = round(best[1], 2)
+
+        # Diversification Score (0–10, Herfindahl Index)
+        hhi = sum((p / 100) ** 2 for p in allocation_percentages.values())
+
+        return {
+            "holding_count": holding_count,
+            "allocation_labels": list(allocation.keys()),
+            "allocation_values": [float(v) for v in allocation.values()],
+            "allocation_percentages": allocation_percentages,
+            "largest_allocation_label": largest_allocation_label,
+            "largest_allocation_percent": largest_allocation_percent,
+            "lowest_allocation_label": lowest_allocation_label,
+            "lowest_allocation_percent": lowest_allocation_percent,
+            "best_asset_label": best_asset_label,
+            "best_asset_roi": best_asset_roi,
+            "diversification_score": round((1 - hhi) * 10, 1),
+        }
+
+    def _load_strategies(self):
+        """
+        Active strategies with their holdings, from two queries.
+        """
+        active_strategies = list(
+            PortfolioStrategy.objects
+            .filter(portfolio=self.portfolio, status="ACTIVE")
+            .select_related("strategy")
+        )
+
+        holdings_by_strategy = {ps.id: [] for ps in active_strategies}
+        if active_strategies:
+            for sh in StrategyHolding.objects.filter(strategy_allocation__in=active_strategies):
+                holdings_by_strategy[sh.strategy_allocation_id].append(sh)
+
+        return [
+            {
+                "id": ps.id,
+                "name": ps.strategy.name,
+                "risk": ps.strategy.get_risk_level_display(),
+                "allocated_cash": ps.allocated_cash,
+                "holdings": holdings_by_strategy[ps.id],
+            }
+            for ps in active_strategies
+        ]
+
+    def _strategies_summary(self, strategies, prices):
+        """
+        Strategy cards and risk profile.
+        """
+        strategy_cards = []
+        for strategy in strategies:
+            metrics = strategy_metrics_from_holdings(strategy["holdings"], prices)
+            strategy_cards.append({
+                "id": strategy["id"],
+                "name": strategy["name"],
+                "risk": strategy["risk"],
+                "allocated_cash": strategy["allocated_cash"],
+                "current_value": metrics["current_value"],
+                "pnl": metrics["pnl"],
+                "roi": metrics["roi"],
+            })
+
+        if len(strategies) == 1:
+            risk_profile = strategies[0]["risk"]
+        elif strategies:
+            risk_profile = "Multiple strategies"
+        else:
+            risk_profile = "—"
+
+        return {
+            "strategy_cards": strategy_cards,
+            "has_multiple_strategies": len(strategies) > 1,
+            "risk_profile": risk_profile,
+        }
+
+    def _performance_summary(self, latest, first):
+        """
+        Today's P&L from the two latest snapshots and ROI against the first.
+        """
+        todays_pnl = Decimal("0")
+        todays_pnl_percent = Decimal("0")
+        if len(latest) == 2:
+            today_value, yesterday_value = latest
+            todays_pnl = today_value - yesterday_value
+            if yesterday_value != Decimal("0"):
+                todays_pnl_percent = (todays_pnl / yesterday_value) * Decimal("100")
+
+        starting_cash = first or Decimal("0")
+        current_value = self.portfolio.total_value()
+        roi_percent = (
+            ((current_value - starting_cash) / starting_cash) * 100
+            if starting_cash > 0 else 0
+        )
+
+        return {
+            "todays_pnl": todays_pnl,
+            "todays_pnl_percent": round(todays_pnl_percent, 2),
+            "roi_percent": round(roi_percent, 2),
+        }
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from portfolios.models import Portfolio, PortfolioSnapshot
+from portfolios.signals import snapshots_taken
+from trading.models import Trade
+from trading.signals import trades_recorded
+from .services import DashboardService, bump_snapshots_version
+
+
+@receiver(post_save, sender=Trade)
+@receiver(post_save, sender=PortfolioSnapshot)
+def invalidate_dashboard(sender, instance, **kwargs):
+    DashboardService.invalidate(instance.portfolio_id)
+
+
+@receiver(trades_recorded)
+def invalidate_dashboard_on_trades(sender, trades, **kwargs):
+    for portfolio_id in {trade.portfolio_id for trade in trades}:
+        DashboardService.invalidate(portfolio_id)
+
+
+@receiver(snapshots_taken)
+def invalidate_dashboards_on_snapshot_run(sender, run, **kwargs):
+    bump_snapshots_version()
+
+
+@receiver(post_save, sender=Portfolio)
+def invalidate_dashboard_on_cash_change(sender, instance, **kwargs):
+    DashboardService.invalidate(instance.pk)
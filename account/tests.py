@@ -1,3 +1,129 @@
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from assets.models import Asset
+from assets.services import simulate_price_changes
+from portfolios.models import Portfolio, PortfolioSnapshot
+from portfolios.services import take_daily_snapshots
+from strategies.models import PortfolioStrategy, Strategy, StrategyAllocation
+from strategies.services import execute_strategy
+from trading.models import Trade
+from trading.services import record_trades
+from .models import User
+from .services import DashboardService
+
+# Holdings, active strategies, their holdings, two snapshot reads, recent
+# trades and the prices.
+COLD_DASHBOARD_QUERIES = 7
+# Prices only.
+WARM_DASHBOARD_QUERIES = 1
+
+
+class DashboardServiceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.assets = [
+            Asset.objects.create(
+                name=f"Asset {i}",
+                symbol=f"DASH{i}",
+                asset_type=asset_type,
+                price=Decimal('20.00')
+            )
+            for i, asset_type in enumerate(['STOCK', 'ETF', 'REIT', 'STOCK'])
+        ]
+        strategy = Strategy.objects.create(
+            name="Balanced",
+            risk_level='LOW',
+            target_return_min=1,
+            target_return_max=5
+        )
+        for asset in cls.assets:
+            StrategyAllocation.objects.create(
+                strategy=strategy,
+                asset=asset,
+                percentage=Decimal('25')
+            )
+
+        user = User.objects.create_user(email="dashboard@example.com", password="x", full_name="Dash")
+        cls.portfolio = user.portfolio
+        allocation = PortfolioStrategy.objects.create(
+            portfolio=cls.portfolio,
+            strategy=strategy,
+            allocated_cash=Decimal('10000'),
+            remaining_cash=Decimal('10000')
+        )
+        execute_strategy(cls.portfolio, allocation)
+
+    def setUp(self):
+        cache.clear()
+        self.portfolio.refresh_from_db()
+
+    def test_query_budget(self):
+        with self.assertNumQueries(COLD_DASHBOARD_QUERIES):
+            cold = DashboardService(self.portfolio).get()
+        with self.assertNumQueries(WARM_DASHBOARD_QUERIES):
+            warm = DashboardService(self.portfolio).get()
+
+        self.assertEqual(cold, warm)
+        self.assertEqual(cold["holding_count"], len(self.assets))
+        self.assertEqual(len(cold["strategy_cards"]), 1)
+
+    def test_trade_invalidates(self):
+        DashboardService(self.portfolio).get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_trades([Trade(
+                portfolio=self.portfolio,
+                asset=self.assets[0],
+                trade_type=Trade.BUY,
+                quantity=Decimal('1'),
+                price=self.assets[0].price,
+                note="Dashboard test"
+            )])
+
+        with self.assertNumQueries(COLD_DASHBOARD_QUERIES):
+            dashboard = DashboardService(self.portfolio).get()
+        self.assertEqual(dashboard["recent_trades"][0].note, "Dashboard test")
+
+    def test_snapshot_invalidates(self):
+        before = DashboardService(self.portfolio).get()
+
+        PortfolioSnapshot.objects.create(
+            portfolio=self.portfolio,
+            total_value=self.portfolio.total_value() + 100,
+            cash_balance=self.portfolio.cash_balance
+        )
+
+        with self.assertNumQueries(COLD_DASHBOARD_QUERIES):
+            after = DashboardService(self.portfolio).get()
+        self.assertNotEqual(after["todays_pnl"], before["todays_pnl"])
+
+    def test_snapshot_run_invalidates(self):
+        before = DashboardService(self.portfolio).get()
+
+        # A deposit that bypasses post_save, so only the run can tell.
+        Portfolio.objects.filter(pk=self.portfolio.pk).update(
+            cash_balance=self.portfolio.cash_balance + 500
+        )
+        take_daily_snapshots()
+
+        with self.assertNumQueries(COLD_DASHBOARD_QUERIES):
+            after = DashboardService(self.portfolio).get()
+        self.assertNotEqual(after["todays_pnl"], before["todays_pnl"])
+
+    def test_tick_reprices_warm_dashboard(self):
+        before = DashboardService(self.portfolio).get()
+
+        simulate_price_changes(rng=np.random.default_rng(1))
+
+        with self.assertNumQueries(WARM_DASHBOARD_QUERIES):
+            after = DashboardService(self.portfolio).get()
+        self.assertNotEqual(after["allocation_values"], before["allocation_values"])
+        self.assertNotEqual(
+            after["strategy_cards"][0]["current_value"],
+            before["strategy_cards"][0]["current_value"]
+        )
@@ -1,76 +1,34 @@
 from django.shortcuts import render, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.db.models import Q
 from decimal import Decimal
-from django.db.models import Count
+from django.db.models import Count, F
 
 from assets.models import Asset 
+from assets.services import CHART_RANGES, price_chart
 from portfolios.models import Portfolio
-from portfolios.services import calculate_portfolio_value
-from strategies.models import PortfolioStrategy
+from portfolios.services import (
+    DEFAULT_PERFORMANCE_RANGE, PERFORMANCE_RANGES, calculate_portfolio_value,
+    performance_chart, performance_chart_version
+)
 from copytrading.models import CopyRelationship, CopyTradePnL
+from strategies.models import PortfolioStrategy
 from trading.models import Trade
-from strategies.services import calculate_strategy_metrics
+from trading.services import trade_history_page
+from .services import DashboardService
 
 
 def customer_dashboard_view(request):
     portfolio = Portfolio.objects.get(user=request.user)
 
-    holdings = portfolio.holdings.select_related('asset')
-    snapshots = portfolio.snapshots.order_by('created_at')
-    holding_count = holdings.count()
-
-    # get active strategies
-    active_strategies = (
-        PortfolioStrategy.objects
-        .filter(portfolio=portfolio, status="ACTIVE")
-        .select_related("strategy")
-    )
-
-    strategy_cards = []
-
-    for ps in active_strategies:
-        metrics = calculate_strategy_metrics(ps)
-
-        strategy_cards.append({
-            "id": ps.id,
-            "name": ps.strategy.name,
-            "risk": ps.strategy.get_risk_level_display(),
-            "allocated_cash": ps.allocated_cash,
-            "current_value": metrics["current_value"],
-            "pnl": metrics["pnl"],
-            "roi": metrics["roi"],
-        })
-
-    # --------------------------------------------------
-    # Asset Allocation (Market Value)
-    # --------------------------------------------------
-    allocation = {}
-    for holding in holdings:
-        asset_type = holding.asset.asset_type
-        allocation.setdefault(asset_type, 0)
-        allocation[asset_type] += holding.market_value()
-
-    total_allocation_value = sum(allocation.values())
-
-    allocation_percentages = {
-        k: round((v / total_allocation_value) * 100, 2)
-        if total_allocation_value > 0 else 0
-        for k, v in allocation.items()
-    }
-
-    allocation_labels = list(allocation.keys())
-    allocation_values = [float(v) for v in allocation.values()]
+    performance_range = request.GET.get("range")
+    if performance_range not in PERFORMANCE_RANGES:
+        performance_range = DEFAULT_PERFORMANCE_RANGE
 
-    ASSET_TYPE_LABELS = {
-        "STOCK": "Stocks",
-        "ETF": "ETFs",
-        "REIT": "REITs",
-    }
-
-    # --------------------------------------------------
-    # Recent Trades (last 7)
-    # --------------------------------------------------
     TRADE_BADGES = {
         "BUY": "bg-primary",
         "SELL": "bg-danger",
@@ -79,177 +37,57 @@ def customer_dashboard_view(request):
         "SWITCH": "bg-secondary",
     }
 
-    recent_trades = (
-        portfolio.trades
-        .select_related("asset")
-        .all()[:7]
-    )
-
-    # --------------------------------------------------
-    # Allocation Summary (Largest / Lowest)
-    # --------------------------------------------------
-    largest_allocation_label = lowest_allocation_label = None
-    largest_allocation_percent = lowest_allocation_percent = 0
-
-    if allocation_percentages:
-        largest = max(allocation_percentages.items(), key=lambda x: x[1])
-        lowest = min(allocation_percentages.items(), key=lambda x: x[1])
-
-        largest_allocation_label = ASSET_TYPE_LABELS.get(largest[0])
-        largest_allocation_percent = largest[1]
-
-        lowest_allocation_label = ASSET_TYPE_LABELS.get(lowest[0])
-        lowest_allocation_percent = lowest[1]
-
-    # --------------------------------------------------
-    # Best Performing Asset Type (ROI)
-    # --------------------------------------------------
-    asset_performance = {}
-
-    for holding in holdings:
-        asset_type = holding.asset.asset_type
-        cost = holding.quantity * holding.average_price
-        current_value = holding.market_value()
-
-        if cost > 0:
-            asset_performance.setdefault(asset_type, {"profit": 0, "cost": 0})
-            asset_performance[asset_type]["profit"] += current_value - cost
-            asset_performance[asset_type]["cost"] += cost
-
-    best_asset_label = None
-    best_asset_roi = 0
-
-    if asset_performance:
-        performance_roi = {
-            k: (v["profit"] / v["cost"]) * 100
-            for k, v in asset_performance.items()
-            if v["cost"] > 0
-        }
-
-        if performance_roi:
-            best = max(performance_roi.items(), key=lambda x: x[1])
-            best_asset_label = ASSET_TYPE_LABELS.get(best[0])
-            best_asset_roi = round(best[1], 2)
-
-    # --------------------------------------------------
-    # Risk Profile (from Strategy)
-    # --------------------------------------------------
-    # risk_profile = "—"
-
-    # try:
-    #     portfolio_strategy = (
-    #         PortfolioStrategy.objects
-    #         .select_related("strategy")
-    #         .get(portfolio=portfolio)
-    #     )
-
-    #     risk_profile = portfolio_strategy.strategy.get_risk_level_display()
-
-    # except PortfolioStrategy.DoesNotExist:
-    #     risk_profile = "—"
-
-    if active_strategies.count() == 1:
-        risk_profile = active_strategies.first().strategy.get_risk_level_display()
-    elif active_strategies.exists():
-        risk_profile = "Multiple strategies"
-    else:
-        risk_profile = "—"
-
-
-    # --------------------------------------------------
-    # Diversification Score (0–10, Herfindahl Index)
-    # --------------------------------------------------
-    hhi = sum((p / 100) ** 2 for p in allocation_percentages.values())
-    diversification_score = round((1 - hhi) * 10, 1)
-
-    # --------------------------------------------------
-    # Trades
-    # --------------------------------------------------
-    # trades = portfolio.trades.all()[:10]
-
-    # --------------------------------------------------
-    # Snapshots / Performance
-    # --------------------------------------------------
-    snapshot_labels = [s.created_at.strftime("%Y-%m-%d") for s in snapshots]
-    snapshot_values = [float(s.total_value) for s in snapshots]
-
-    todays_pnl = Decimal("0")
-    todays_pnl_percent = Decimal("0")
-
-    if snapshots.count() >= 2:
-        today, yesterday = snapshots.order_by("-created_at")[:2]
-
-        today_value = today.total_value
-        yesterday_value = yesterday.total_value
-
-        todays_pnl = today_value - yesterday_value
+    # Allocation, risk, performance, recent trades and strategy cards;
+    # cached per portfolio (see account.services).
+    dashboard = DashboardService(portfolio).get()
 
-        if yesterday_value != Decimal("0"):
-            todays_pnl_percent = (todays_pnl / yesterday_value) * Decimal("100")
-
-    # --------------------------------------------------
-    # ROI
-    # --------------------------------------------------
-    # starting_cash = (
-    #     snapshots.first().cash_balance
-    #     if snapshots.exists()
-    #     else portfolio.cash_balance
-    # )
-    starting_cash = snapshots.first().total_value
-
-    current_value = portfolio.total_value()
-    roi_percent = (
-        ((current_value - starting_cash) / starting_cash) * 100
-        if starting_cash > 0 else 0
-    )
-
-    # --------------------------------------------------
-    # Render
-    # --------------------------------------------------
     return render(request, "account/customer/dashboard.html", {
         "current_url": request.resolver_match.url_name,
         "portfolio": portfolio,
-        "holding_count": holding_count,
-
-        # Allocation
-        "allocation_labels": allocation_labels,
-        "allocation_values": allocation_values,
-        "allocation_percentages": allocation_percentages,
+        **dashboard,
 
-        # Allocation Summary
-        "largest_allocation_label": largest_allocation_label,
-        "largest_allocation_percent": largest_allocation_percent,
-        "lowest_allocation_label": lowest_allocation_label,
-        "lowest_allocation_percent": lowest_allocation_percent,
+        # Charts
+        "performance_range": performance_range,
+        "performance_ranges": PERFORMANCE_RANGES,
 
-        # Best Performing
-        "best_asset_label": best_asset_label,
-        "best_asset_roi": best_asset_roi,
+        "trade_badges": TRADE_BADGES,
+    })
 
-        # Risk & Diversification
-        "risk_profile": risk_profile,
-        "diversification_score": diversification_score,
 
-        # Charts
-        "snapshot_labels": snapshot_labels,
-        "snapshot_values": snapshot_values,
+# Points per performance chart when the client sends no budget, and the
+# most it may ask for.
+DEFAULT_CHART_POINTS = 200
+MAX_CHART_POINTS = 1000
 
-        # Performance
-        "todays_pnl": todays_pnl,
-        "todays_pnl_percent": round(todays_pnl_percent, 2),
-        "roi_percent": round(roi_percent, 2),
 
-        # Trades
-        # "trades": trades,
-        "recent_trades": recent_trades,
-        "trade_badges": TRADE_BADGES,
+@login_required
+def performance_chart_view(request):
+    """
+    Dashboard performance chart as JSON, downsampled to `points` points.
+    Revalidated with an ETag built from the latest snapshot/rollup ids,
+    so an unchanged chart costs two small queries and a 304.
+    """
+    portfolio = request.user.portfolio
 
-        # strategies
-        "strategy_cards": strategy_cards,
-        "has_multiple_strategies": active_strategies.count() > 1,
+    range_key = request.GET.get("range")
+    if range_key not in PERFORMANCE_RANGES:
+        range_key = DEFAULT_PERFORMANCE_RANGE
 
-    })
+    try:
+        points = int(request.GET.get("points", DEFAULT_CHART_POINTS))
+    except ValueError:
+        return JsonResponse({"error": "Invalid points"}, status=400)
+    points = max(3, min(points, MAX_CHART_POINTS))
 
+    etag = quote_etag(
+        f"{portfolio.pk}-{performance_chart_version(portfolio)}-{range_key}-{points}"
+    )
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(performance_chart(portfolio, range_key, points))
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 @login_required
@@ -266,6 +104,23 @@ def portfolio_view(request):
     # Get all active strategies
     active_strategies = portfolio.strategy_allocations.filter(status='ACTIVE')
 
+    # Activations whose trade job failed: tell the user once, then retire
+    # them so the strategy can be activated again.
+    failed = list(
+        portfolio.strategy_allocations.filter(status='FAILED').select_related('strategy')
+    )
+    for ps in failed:
+        messages.error(
+            request,
+            f"Strategy {ps.strategy.name} could not be activated. "
+            f"No cash was used; please try again."
+        )
+    if failed:
+        PortfolioStrategy.objects.filter(
+            pk__in=[ps.pk for ps in failed],
+            status='FAILED'
+        ).update(status='STOPPED')
+
     active_copy = (
         CopyRelationship.objects
         .select_related('leader__user')
@@ -276,6 +131,7 @@ def portfolio_view(request):
     return render(request, "account/customer/portfolio.html", {
         "current_url": request.resolver_match.url_name,
         'portfolio': portfolio,
+        'holdings': portfolio.holdings.with_valuation(),
         'total_value': total_value,
         "active_strategies": active_strategies,
         "active_copy": active_copy,
@@ -304,10 +160,12 @@ def assets_view(request):
     })
 
 def asset_detail(request, symbol):
-    # asset = get_object_or_404(Asset, symbol=symbol)
+    asset = get_object_or_404(Asset, symbol=symbol)
 
     return render(request, "account/customer/asset_detail.html", {
-        # "asset": asset,
+        "asset": asset,
+        "price_chart": price_chart(asset, request.GET.get("range")),
+        "chart_ranges": CHART_RANGES,
         "current_url": "assets"
     })
 
@@ -316,7 +174,7 @@ def stocks_view(request):
     portfolio = request.user.portfolio
 
     # Get all stock holdings for this portfolio
-    stock_holdings = portfolio.holdings.filter(asset__asset_type='STOCK').select_related('asset')
+    stock_holdings = portfolio.holdings.filter(asset__asset_type='STOCK').with_valuation()
 
     # Calculate total stock value
     total_stock_value = sum([h.market_value() for h in stock_holdings])
@@ -333,8 +191,17 @@ def stocks_view(request):
     return render(request, "account/customer/stocks.html", context)
 
 
-def stock_detail_view(request):
+def stock_detail_view(request, symbol):
+    asset = get_object_or_404(Asset, symbol=symbol, asset_type='STOCK')
+    holding = None
+    if request.user.is_authenticated:
+        holding = request.user.portfolio.holdings.with_valuation().filter(asset=asset).first()
+
     return render(request, "account/customer/stock_detail.html", {
+        "asset": asset,
+        "holding": holding,
+        "price_chart": price_chart(asset, request.GET.get("range")),
+        "chart_ranges": CHART_RANGES,
         "current_url": "stocks"
     })
 
@@ -344,7 +211,7 @@ def reits_view(request):
     portfolio = get_object_or_404(Portfolio, user=request.user)
 
     # Filter REIT holdings
-    reit_holdings = portfolio.holdings.filter(asset__asset_type='REIT').select_related('asset')
+    reit_holdings = portfolio.holdings.filter(asset__asset_type='REIT').with_valuation()
 
     total_value = Decimal('0')
     total_yield_weighted = Decimal('0')
@@ -387,8 +254,17 @@ def reits_view(request):
     return render(request, "account/customer/reits.html", context)
 
 
-def reit_detail_view(request):
+def reit_detail_view(request, symbol):
+    asset = get_object_or_404(Asset, symbol=symbol, asset_type='REIT')
+    holding = None
+    if request.user.is_authenticated:
+        holding = request.user.portfolio.holdings.with_valuation().filter(asset=asset).first()
+
     return render(request, "account/customer/reit_detail.html", {
+        "asset": asset,
+        "holding": holding,
+        "price_chart": price_chart(asset, request.GET.get("range")),
+        "chart_ranges": CHART_RANGES,
         "current_url": "reits"
     })
 
@@ -402,14 +278,10 @@ def copy_trading_view(request):
         .exclude(user__is_staff=True)
     )
     active_traders = portfolios.count()
-    
-    # Convert to list so we can sort in Python
-    portfolios = list(portfolios)
 
-    # Sort by computed total_value
-    portfolios.sort(
-        key=lambda p: p.total_value(),
-        reverse=True
+    # Sort by materialized total value
+    portfolios = portfolios.select_related('user').order_by(
+        (F('cash_balance') + F('holdings_value')).desc()
     )
 
     # Summary P&L for this follower
@@ -481,8 +353,15 @@ def wallet_view(request):
 @login_required
 def trade_history_view(request):
     portfolio = Portfolio.objects.get(user=request.user)
-    trades = portfolio.trades.all()
-    return render(request, 'account/customer/trade_history.html', {'trades': trades, "current_url": request.resolver_match.url_name,})
+    history = trade_history_page(
+        portfolio.trades.select_related('asset'),
+        request.GET,
+        portfolio_id=portfolio.pk
+    )
+    return render(request, 'account/customer/trade_history.html', {
+        **history,
+        "current_url": request.resolver_match.url_name,
+    })
 
 
 
@@ -0,0 +1,218 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+# How often the index reloads every active alert from the database, which
+# also drops alerts cancelled by other processes. New alerts are picked up
+# on every tick (see AlertIndex.refresh).
+PRICE_ALERT_REBUILD_SECONDS = getattr(settings, 'PRICE_ALERT_REBUILD_SECONDS', 300)
+
+
+class AssetAlerts:
+    """
+    The active alerts of one asset as two pairs of parallel arrays sorted
+    by threshold: `above` alerts fire when the price rises to or through
+    their threshold, `below` alerts when it falls to or through it.
+    """
+
+    __slots__ = ('above_thresholds', 'above_ids', 'below_thresholds', 'below_ids')
+
+    def __init__(self):
+        self.above_thresholds = []
+        self.above_ids = []
+        self.below_thresholds = []
+        self.below_ids = []
+
+    def _side(self, above):
+        if above:
+            return self.above_thresholds, self.above_ids
+        return self.below_thresholds, self.below_ids
+
+    def add(self, alert_id, above, threshold):
+        thresholds, ids = self._side(above)
+        at = bisect_right(thresholds, threshold)
+        # The first add may follow a rebuild that already loaded it.
+        if alert_id in ids[bisect_left(thresholds, threshold, 0, at):at]:
+            return
+        thresholds.insert(at, threshold)
+        ids.insert(at, alert_id)
+
+    def remove(self, alert_id, above, threshold):
+        thresholds, ids = self._side(above)
+        lo = bisect_left(thresholds, threshold)
+        hi = bisect_right(thresholds, threshold, lo)
+        for at in range(lo, hi):
+            if ids[at] == alert_id:
+                del thresholds[at]
+                del ids[at]
+                return True
+        return False
+
+    def crossed(self, old_price, new_price):
+        """
+        Pop and return the alerts whose threshold lies in the interval
+        the price moved through, as (alert_id, above, threshold): (old, new]
+        on the way up, [new, old) on the way down.
+        """
+        above = new_price > old_price
+        if above:
+            thresholds, ids = self.above_thresholds, self.above_ids
+            lo = bisect_right(thresholds, old_price)
+            hi = bisect_right(thresholds, new_price, lo)
+        elif new_price < old_price:
+            thresholds, ids = self.below_thresholds, self.below_ids
+            lo = bisect_left(thresholds, new_price)
+            hi = bisect_left(thresholds, old_price, lo)
+        else:
+            return []
+
+        fired = [
+            (alert_id, above, threshold)
+            for alert_id, threshold in zip(ids[lo:hi], thresholds[lo:hi])
+        ]
+        if fired:
+            del thresholds[lo:hi]
+            del ids[lo:hi]
+        return fired
+
+    def __len__(self):
+        return len(self.above_ids) + len(self.below_ids)
+
+
+class AlertIndex:
+    """
+    AssetAlerts per asset. A tick costs two binary searches per moved
+    asset plus the alerts it actually crossed. Thread safe; `rebuild`
+    reloads every active PriceAlert from the database.
+
+    Like trading.orderbook.MatchingEngine, each process keeps its own
+    index: `refresh` runs before every tick to pick up alerts created
+    through other processes, and crossed alerts stay unsettled until the
+    tick commits, so a rolled back tick loses none of them.
+    evaluate_price_alerts only fires alerts still active in the
+    database, which makes a stale entry harmless.
+    """
+
+    def __init__(self, rebuild_every=PRICE_ALERT_REBUILD_SECONDS):
+        self.rebuild_every = rebuild_every
+        self._assets = {}
+        # Crossed alerts not yet confirmed by `settle`:
+        # {alert_id: (asset_id, above, threshold)}.
+        self._unsettled = {}
+        self._watermark = 0
+        self._rebuilt_at = None
+        self._lock = threading.Lock()
+
+    def _add(self, alert_id, asset_id, above, threshold):
+        alerts = self._assets.get(asset_id)
+        if alerts is None:
+            alerts = self._assets[asset_id] = AssetAlerts()
+        alerts.add(alert_id, above, threshold)
+
+    def add(self, alert_id, asset_id, above, threshold):
+        with self._lock:
+            self._add(alert_id, asset_id, above, threshold)
+
+    def remove(self, alert_id, asset_id, above, threshold):
+        with self._lock:
+            self._unsettled.pop(alert_id, None)
+            alerts = self._assets.get(asset_id)
+            return alerts is not None and alerts.remove(alert_id, above, threshold)
+
+    def crossed(self, changes):
+        """
+        Ids of the alerts crossed by a tick ({asset_id: (old, new)}).
+        Crossed alerts leave the index but stay unsettled until `settle`
+        confirms them once the tick commits; the next tick first puts
+        back whatever a rolled back tick left unsettled.
+        """
+        fired = []
+        with self._lock:
+            for alert_id, (asset_id, above, threshold) in self._unsettled.items():
+                self._add(alert_id, asset_id, above, threshold)
+            self._unsettled = {}
+
+            for asset_id, (old_price, new_price) in changes.items():
+                alerts = self._assets.get(asset_id)
+                if not alerts:
+                    continue
+                for alert_id, above, threshold in alerts.crossed(old_price, new_price):
+                    self._unsettled[alert_id] = (asset_id, above, threshold)
+                    fired.append(alert_id)
+        return fired
+
+    def settle(self, alert_ids):
+        """
+        Confirm crossed alerts whose firing committed.
+        """
+        with self._lock:
+            for alert_id in alert_ids:
+                self._unsettled.pop(alert_id, None)
+
+    def refresh(self):
+        """
+        Catch up with the database: a full rebuild every `rebuild_every`
+        seconds, otherwise one query for alerts newer than any loaded.
+        """
+        from .models import PriceAlert
+
+        if self._rebuilt_at is None or time.monotonic() - self._rebuilt_at >= self.rebuild_every:
+            return self.rebuild()
+
+        rows = list(
+            PriceAlert.objects.filter(is_active=True, pk__gt=self._watermark)
+            .values_list('pk', 'asset_id', 'direction', 'threshold')
+        )
+        with self._lock:
+            for alert_id, asset_id, direction, threshold in rows:
+                self._add(alert_id, asset_id, direction == PriceAlert.ABOVE, threshold)
+                self._watermark = max(self._watermark, alert_id)
+        return len(rows)
+
+    def rebuild(self):
+        from .models import PriceAlert
+
+        rows = PriceAlert.objects.filter(is_active=True).order_by(
+            'asset', 'direction', 'threshold', 'pk'
+        ).values_list('pk', 'asset_id', 'direction', 'threshold')
+
+        # Rows arrive sorted, so appending keeps every array ordered.
+        assets = {}
+        watermark = 0
+        for alert_id, asset_id, direction, threshold in rows.iterator(chunk_size=5000):
+            alerts = assets.get(asset_id)
+            if alerts is None:
+                alerts = assets[asset_id] = AssetAlerts()
+            thresholds, ids = alerts._side(direction == PriceAlert.ABOVE)
+            thresholds.append(threshold)
+            ids.append(alert_id)
+            watermark = max(watermark, alert_id)
+
+        with self._lock:
+            self._assets = assets
+            self._unsettled = {}
+            self._watermark = watermark
+            self._rebuilt_at = time.monotonic()
+        return len(self)
+
+    def __len__(self):
+        return sum(len(alerts) for alerts in self._assets.values())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_alert_index():
+    """
+    The process-wide alert index, rebuilt from the database on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = AlertIndex()
+            index.rebuild()
+            _index = index
+        return _index
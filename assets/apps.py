@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AssetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assets'
+
+    def ready(self):
+        import assets.signals
@@ -0,0 +1,19 @@
+from django.utils.functional import SimpleLazyObject
+
+from .services import pending_price_alert_messages
+
+
+def price_alerts(request):
+    """
+    The user's undelivered price alert messages, shown by
+    notification/messages.html. Lazy, so the lookup (which also marks
+    them delivered) only runs on pages that render that template; JSON
+    endpoints and pages without it never touch them.
+    """
+    if not request.user.is_authenticated:
+        return {}
+    return {
+        'price_alert_messages': SimpleLazyObject(
+            lambda: pending_price_alert_messages(request.user)
+        ),
+    }
@@ -0,0 +1,64 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assets.models import Asset
+from assets.services import simulate_price_changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark simulate_price_changes against synthetic asset sets. "
+        "Everything runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1000,10000,100000',
+            help='Comma separated asset counts to benchmark'
+        )
+        parser.add_argument(
+            '--ticks',
+            type=int,
+            default=5,
+            help='Number of ticks to time per size'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s]
+        ticks = options['ticks']
+
+        for size in sizes:
+            with transaction.atomic():
+                Asset.objects.bulk_create(
+                    [
+                        Asset(
+                            name=f"Benchmark {i}",
+                            symbol=f"BENCH{i}",
+                            asset_type='STOCK',
+                            price=Decimal('100.00'),
+                            volatility=Decimal('1.50'),
+                        )
+                        for i in range(size)
+                    ],
+                    batch_size=1000
+                )
+
+                # The first tick opens the candles per asset; time the
+                # steady state after it.
+                simulate_price_changes()
+
+                started = time.perf_counter()
+                for _ in range(ticks):
+                    simulate_price_changes()
+                elapsed = (time.perf_counter() - started) / ticks
+
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{size:>8} assets: {elapsed * 1000:10.1f} ms/tick "
+                f"({size / elapsed:,.0f} assets/sec)"
+            )
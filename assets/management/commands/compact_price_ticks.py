@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from assets.services import compact_price_ticks
+
+
+class Command(BaseCommand):
+    help = "Pack every pending price tick into the compact price history blocks."
+
+    def handle(self, *args, **options):
+        packed = compact_price_ticks()
+        self.stdout.write(f"Packed {packed} ticks")
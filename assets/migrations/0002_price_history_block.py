@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistoryBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('tick_count', models.PositiveIntegerField(default=0)),
+                ('offsets', models.BinaryField()),
+                ('prices', models.BinaryField()),
+                ('is_open', models.BooleanField(default=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_blocks', to='assets.asset')),
+            ],
+            options={
+                'ordering': ['asset', 'start_at'],
+                'indexes': [models.Index(fields=['asset', 'end_at'], name='assets_pric_asset_i_c1783e_idx'), models.Index(fields=['is_open'], name='assets_pric_is_open_f47431_idx')],
+            },
+        ),
+    ]
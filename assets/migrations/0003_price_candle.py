@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0002_price_history_block'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceCandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('1m', '1 minute'), ('1h', '1 hour'), ('1d', '1 day')], max_length=2)),
+                ('bucket_start', models.DateTimeField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candles', to='assets.asset')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='assets_pric_resolut_882723_idx')],
+                'unique_together': {('asset', 'resolution', 'bucket_start')},
+            },
+        ),
+    ]
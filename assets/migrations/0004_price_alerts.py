@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_price_candle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('ABOVE', 'Rises above'), ('BELOW', 'Falls below')], max_length=5)),
+                ('threshold', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('triggered_at', models.DateTimeField(blank=True, null=True)),
+                ('triggered_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to='assets.asset')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alerts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['is_active', 'asset'], name='assets_pric_is_acti_2a6bf9_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceAlertNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.TextField()),
+                ('alert_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField()),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_alert_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['user', 'delivered_at'], name='assets_pric_user_id_259653_idx')],
+            },
+        ),
+    ]
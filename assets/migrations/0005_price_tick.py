@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_price_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.DateTimeField()),
+                ('price_cents', models.BigIntegerField()),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_ticks', to='assets.asset')),
+            ],
+            options={
+                'ordering': ['asset', 'at'],
+                'indexes': [models.Index(fields=['asset', 'at'], name='assets_pric_asset_i_55d01d_idx'), models.Index(fields=['at'], name='assets_pric_at_817287_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.conf import settings
 from decimal import Decimal
 from django.core.exceptions import ValidationError
 
@@ -58,3 +59,160 @@ class Asset(models.Model):
 
     def __str__(self):
         return f"{self.symbol} ({self.asset_type})"
+
+
+class PriceHistoryBlock(models.Model):
+    """
+    A run of consecutive price ticks for one asset.
+
+    Ticks are packed into two parallel arrays instead of one row per tick:
+    `offsets` holds int32 seconds since `start_at` and `prices` holds int64
+    prices in cents. Only the newest block per asset is open for appends;
+    new ticks reach it through PriceTick rows, see compact_price_ticks.
+    """
+    asset = models.ForeignKey(
+        Asset,
+        on_delete=models.CASCADE,
+        related_name='price_blocks'
+    )
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    tick_count = models.PositiveIntegerField(default=0)
+    offsets = models.BinaryField()
+    prices = models.BinaryField()
+    is_open = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['asset', 'start_at']
+        indexes = [
+            models.Index(fields=['asset', 'end_at']),
+            models.Index(fields=['is_open']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} ticks @ {self.start_at} ({self.tick_count})"
+
+
+class PriceTick(models.Model):
+    """
+    One recorded tick that has not been packed into a PriceHistoryBlock
+    yet. Ticks land here as small inserts and compact_price_ticks moves
+    them into the blocks in batches.
+    """
+    asset = models.ForeignKey(
+        Asset,
+        on_delete=models.CASCADE,
+        related_name='pending_ticks'
+    )
+    at = models.DateTimeField()
+    price_cents = models.BigIntegerField()
+
+    class Meta:
+        ordering = ['asset', 'at']
+        indexes = [
+            models.Index(fields=['asset', 'at']),
+            models.Index(fields=['at']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} tick @ {self.at}"
+
+
+class PriceCandle(models.Model):
+    """
+    OHLC summary of an asset's ticks over one time bucket, rolled up
+    incrementally as ticks are recorded.
+    """
+    RESOLUTIONS = (
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    )
+
+    asset = models.ForeignKey(
+        Asset,
+        on_delete=models.CASCADE,
+        related_name='candles'
+    )
+    resolution = models.CharField(max_length=2, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=12, decimal_places=2)
+    high = models.DecimalField(max_digits=12, decimal_places=2)
+    low = models.DecimalField(max_digits=12, decimal_places=2)
+    close = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        ordering = ['bucket_start']
+        unique_together = ('asset', 'resolution', 'bucket_start')
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} {self.resolution} @ {self.bucket_start}"
+
+
+class PriceAlert(models.Model):
+    """
+    A one-shot alert that fires the first time a tick moves an asset's
+    price across `threshold` in the alert's direction. Active alerts are
+    also indexed in memory by assets.alerts.
+    """
+    ABOVE = 'ABOVE'
+    BELOW = 'BELOW'
+
+    DIRECTION_CHOICES = (
+        (ABOVE, 'Rises above'),
+        (BELOW, 'Falls below'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='price_alerts'
+    )
+    asset = models.ForeignKey(
+        Asset,
+        on_delete=models.CASCADE,
+        related_name='price_alerts'
+    )
+    direction = models.CharField(max_length=5, choices=DIRECTION_CHOICES)
+    threshold = models.DecimalField(max_digits=12, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    triggered_at = models.DateTimeField(null=True, blank=True)
+    triggered_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'asset']),
+        ]
+
+    def __str__(self):
+        return f"{self.asset_id} {self.direction} {self.threshold}"
+
+
+class PriceAlertNotification(models.Model):
+    """
+    Every alert a user had triggered by one tick, coalesced into a single
+    message. Shown on the next page that includes notification/messages.html.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='price_alert_notifications'
+    )
+    message = models.TextField()
+    alert_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField()
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['user', 'delivered_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.alert_count} alerts @ {self.created_at}"
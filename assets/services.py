@@ -1,22 +1,533 @@
-import random
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
 from decimal import Decimal
-from django.db import transaction
-from .models import Asset
 
-def simulate_price_changes():
-    assets = Asset.objects.all()
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .alerts import get_alert_index
+from .models import (
+    Asset,
+    PriceAlert,
+    PriceAlertNotification,
+    PriceCandle,
+    PriceHistoryBlock,
+    PriceTick,
+)
+from .signals import price_ticked
+
+PRICE_FLOOR = Decimal('1.00')
+
+# Ticks per PriceHistoryBlock.
+PRICE_BLOCK_CAPACITY = 256
+
+# How long ticks may wait as PriceTick rows before update_prices_task
+# packs them into blocks.
+PRICE_TICK_COMPACT_AFTER = getattr(
+    settings,
+    'PRICE_TICK_COMPACT_AFTER',
+    timedelta(hours=1)
+)
+
+PRICE_HISTORY_RETENTION = getattr(
+    settings,
+    'PRICE_HISTORY_RETENTION',
+    timedelta(days=30)
+)
+
+# How long minute and hourly candles are kept, a little past the longest
+# chart range that reads them (see CHART_RANGES). Daily candles are kept
+# for good; the backtester reads them.
+PRICE_CANDLE_RETENTION = getattr(
+    settings,
+    'PRICE_CANDLE_RETENTION',
+    {'1m': timedelta(days=2), '1h': timedelta(days=32)}
+)
+
+# Offsets are int32 seconds from a block's start_at; a tick further out
+# than this opens a new block.
+_MAX_BLOCK_OFFSET = 2 ** 31 - 1
+
+
+def simulate_price_changes(rng=None):
+    """
+    Apply one random price tick to every asset.
+
+    Each asset moves by a uniform percentage in [-volatility, +volatility]
+    and never drops below PRICE_FLOOR. All shocks are drawn in a single
+    vectorized call and written back with one bulk update. Listeners of
+    assets.signals.price_ticked run in the same transaction.
+
+    Returns a dict of {asset_id: (old_price, new_price)} for the tick.
+    """
+    rng = rng or np.random.default_rng()
+
+    rows = list(Asset.objects.values_list('id', 'price', 'volatility'))
+    if not rows:
+        return {}
+
+    ids, old_prices, volatilities = zip(*rows)
+    prices = np.array(old_prices, dtype=np.float64)
+    vol = np.array(volatilities, dtype=np.float64)
+
+    change_percent = rng.uniform(-vol, vol)
+    new_prices = np.maximum(
+        np.round(prices * (1.0 + change_percent / 100.0), 2),
+        float(PRICE_FLOOR)
+    )
+
+    price_field = Asset._meta.get_field('price')
+    changes = {}
+    params = []
+    for asset_id, old_price, new_price in zip(ids, old_prices, new_prices.tolist()):
+        new_price = Decimal(f"{new_price:.2f}")
+        changes[asset_id] = (old_price, new_price)
+        params.append((new_price, asset_id))
+
+    # A single prepared UPDATE executed for every row. bulk_update() builds
+    # a CASE expression per row, which dominates the tick at scale.
+    sql = "UPDATE {table} SET {price} = %s WHERE {pk} = %s".format(
+        table=connection.ops.quote_name(Asset._meta.db_table),
+        price=connection.ops.quote_name(price_field.column),
+        pk=connection.ops.quote_name(Asset._meta.pk.column),
+    )
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+        at = timezone.now()
+        record_price_ticks(changes, at=at)
+        update_price_candles(changes, at=at)
+        price_ticked.send(sender=Asset, changes=changes, at=at)
+
+    return changes
+
+
+# --------------------------------------------------
+# Price history
+# --------------------------------------------------
+
+def _pack(typecode, values):
+    packed = array(typecode, values)
+    if sys.byteorder != 'little':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(typecode, data):
+    unpacked = array(typecode)
+    unpacked.frombytes(bytes(data))
+    if sys.byteorder != 'little':
+        unpacked.byteswap()
+    return unpacked
+
+
+def _to_cents(price):
+    return int((price * 100).to_integral_value())
+
+
+def record_price_ticks(changes, at=None):
+    """
+    Record one tick per asset in `changes` ({asset_id: (old, new)}) as a
+    PriceTick row: a single small insert per asset, however full its
+    open history block is. compact_price_ticks packs them later.
+    """
+    if not changes:
+        return
+
+    at = at or timezone.now()
+    PriceTick.objects.bulk_create(
+        [
+            PriceTick(asset_id=asset_id, at=at, price_cents=_to_cents(new_price))
+            for asset_id, (_, new_price) in changes.items()
+        ],
+        batch_size=1000
+    )
+
+
+def compact_price_ticks(now=None, min_age=None):
+    """
+    Pack pending PriceTick rows into PriceHistoryBlocks, appending to each
+    asset's open block and opening new ones at PRICE_BLOCK_CAPACITY. Every
+    open block is rewritten once per compaction rather than once per tick.
+
+    With `min_age`, nothing happens until the oldest pending tick is at
+    least that old, so callers can run this after every tick. Returns the
+    number of ticks packed. A tick too far past its block's start for an
+    int32 offset also opens a new block.
+    """
+    now = now or timezone.now()
+    oldest = PriceTick.objects.order_by('at').values_list('at', flat=True).first()
+    if oldest is None or (min_age is not None and oldest > now - min_age):
+        return 0
 
     with transaction.atomic():
-        for asset in assets:
-            change_percent = Decimal(
-                random.uniform(
-                    -float(asset.volatility),
-                    float(asset.volatility)
-                )
+        pending = {}
+        last_pk = None
+        for pk, asset_id, at, cents in PriceTick.objects.filter(
+            at__lte=now
+        ).order_by('asset_id', 'at', 'pk').values_list('pk', 'asset_id', 'at', 'price_cents'):
+            pending.setdefault(asset_id, []).append((at, cents))
+            last_pk = pk if last_pk is None else max(last_pk, pk)
+        if not pending:
+            return 0
+
+        open_blocks = {
+            block.asset_id: block
+            for block in PriceHistoryBlock.objects.filter(
+                is_open=True,
+                asset_id__in=list(pending)
+            )
+        }
+
+        updated = []
+        created = []
+        packed = 0
+        for asset_id, ticks in pending.items():
+            packed += len(ticks)
+            block = open_blocks.get(asset_id)
+            if block is not None:
+                offsets = _unpack('i', block.offsets)
+                prices = _unpack('q', block.prices)
+                updated.append((block, offsets, prices))
+            for at, cents in ticks:
+                if block is not None and block.is_open and (
+                    (at - block.start_at).total_seconds() > _MAX_BLOCK_OFFSET
+                ):
+                    block.is_open = False
+                if block is None or not block.is_open:
+                    block = PriceHistoryBlock(asset_id=asset_id, start_at=at, is_open=True)
+                    offsets = array('i')
+                    prices = array('q')
+                    created.append((block, offsets, prices))
+                offsets.append(int((at - block.start_at).total_seconds()))
+                prices.append(cents)
+                block.end_at = at
+                block.tick_count = len(offsets)
+                block.is_open = block.tick_count < PRICE_BLOCK_CAPACITY
+
+        for block, offsets, prices in updated + created:
+            block.offsets = _pack('i', offsets)
+            block.prices = _pack('q', prices)
+        if updated:
+            PriceHistoryBlock.objects.bulk_update(
+                [block for block, _, _ in updated],
+                ['offsets', 'prices', 'tick_count', 'is_open', 'end_at'],
+                batch_size=500
+            )
+        if created:
+            PriceHistoryBlock.objects.bulk_create(
+                [block for block, _, _ in created],
+                batch_size=1000
+            )
+        PriceTick.objects.filter(at__lte=now, pk__lte=last_pk).delete()
+    return packed
+
+
+def get_price_history(symbol, start=None, end=None):
+    """
+    Return [(timestamp, price), ...] for `symbol` within [start, end],
+    oldest first.
+    """
+    blocks = PriceHistoryBlock.objects.filter(asset__symbol=symbol)
+    if start is not None:
+        blocks = blocks.filter(end_at__gte=start)
+    if end is not None:
+        blocks = blocks.filter(start_at__lte=end)
+
+    history = []
+    for block in blocks.order_by('start_at'):
+        offsets = _unpack('i', block.offsets)
+        prices = _unpack('q', block.prices)
+
+        lo = 0
+        hi = len(offsets)
+        if start is not None and start > block.start_at:
+            lo = bisect_left(offsets, (start - block.start_at).total_seconds())
+        if end is not None:
+            hi = bisect_right(offsets, (end - block.start_at).total_seconds())
+
+        for offset, cents in zip(offsets[lo:hi], prices[lo:hi]):
+            history.append((
+                block.start_at + timedelta(seconds=offset),
+                Decimal(cents).scaleb(-2)
+            ))
+
+    # Ticks not compacted yet are newer than every block.
+    ticks = PriceTick.objects.filter(asset__symbol=symbol)
+    if start is not None:
+        ticks = ticks.filter(at__gte=start)
+    if end is not None:
+        ticks = ticks.filter(at__lte=end)
+    history.extend(
+        (at, Decimal(cents).scaleb(-2))
+        for at, cents in ticks.order_by('at').values_list('at', 'price_cents')
+    )
+
+    return history
+
+
+def prune_price_history(now=None):
+    """
+    Delete closed history blocks whose last tick is older than
+    PRICE_HISTORY_RETENTION, and minute and hourly candles older than
+    PRICE_CANDLE_RETENTION. Returns {'blocks', '1m', '1h'} counts.
+    """
+    now = now or timezone.now()
+    deleted, _ = PriceHistoryBlock.objects.filter(
+        is_open=False,
+        end_at__lt=now - PRICE_HISTORY_RETENTION
+    ).delete()
+    pruned = {'blocks': deleted}
+    for resolution, retention in PRICE_CANDLE_RETENTION.items():
+        pruned[resolution], _ = PriceCandle.objects.filter(
+            resolution=resolution,
+            bucket_start__lt=now - retention
+        ).delete()
+    return pruned
+
+
+# --------------------------------------------------
+# OHLC candles
+# --------------------------------------------------
+
+CANDLE_BUCKETS = {
+    '1m': lambda at: at.replace(second=0, microsecond=0),
+    '1h': lambda at: at.replace(minute=0, second=0, microsecond=0),
+    '1d': lambda at: at.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+def update_price_candles(changes, at=None):
+    """
+    Fold one tick per asset in `changes` into the current 1m/1h/1d candles.
+    Existing candles are widened in place; the first tick of a bucket
+    opens a new candle.
+    """
+    if not changes:
+        return
+
+    at = at or timezone.now()
+    opts = PriceCandle._meta
+    qn = connection.ops.quote_name
+    sql = (
+        "UPDATE {table} SET {high} = %s, {low} = %s, {close} = %s "
+        "WHERE {pk} = %s"
+    ).format(
+        table=qn(opts.db_table),
+        high=qn(opts.get_field('high').column),
+        low=qn(opts.get_field('low').column),
+        close=qn(opts.get_field('close').column),
+        pk=qn(opts.pk.column),
+    )
+
+    for resolution, bucket_of in CANDLE_BUCKETS.items():
+        bucket_start = bucket_of(at)
+        current = {
+            asset_id: (pk, high, low)
+            for pk, asset_id, high, low in PriceCandle.objects.filter(
+                resolution=resolution,
+                bucket_start=bucket_start
+            ).values_list('pk', 'asset_id', 'high', 'low')
+        }
+
+        updated = []
+        created = []
+        for asset_id, (_, price) in changes.items():
+            candle = current.get(asset_id)
+            if candle is None:
+                created.append(PriceCandle(
+                    asset_id=asset_id,
+                    resolution=resolution,
+                    bucket_start=bucket_start,
+                    open=price,
+                    high=price,
+                    low=price,
+                    close=price,
+                ))
+            else:
+                pk, high, low = candle
+                updated.append((max(high, price), min(low, price), price, pk))
+
+        if updated:
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, updated)
+        if created:
+            PriceCandle.objects.bulk_create(created, batch_size=1000)
+
+
+def get_price_candles(asset, resolution, start=None, end=None, limit=None):
+    """
+    Return the candles of one resolution for `asset`, oldest first.
+    With `limit`, only the newest `limit` candles in the window are read.
+    """
+    candles = PriceCandle.objects.filter(asset=asset, resolution=resolution)
+    if start is not None:
+        candles = candles.filter(bucket_start__gte=start)
+    if end is not None:
+        candles = candles.filter(bucket_start__lte=end)
+
+    candles = candles.order_by('-bucket_start')
+    if limit is not None:
+        candles = candles[:limit]
+
+    return list(reversed(candles))
+
+
+CHART_RANGES = {
+    '1D': ('1m', timedelta(days=1), '%H:%M'),
+    '1W': ('1h', timedelta(days=7), '%m-%d %H:00'),
+    '1M': ('1h', timedelta(days=30), '%m-%d %H:00'),
+    '1Y': ('1d', timedelta(days=365), '%Y-%m-%d'),
+}
+DEFAULT_CHART_RANGE = '1M'
+
+# Upper bound on points per chart (1D at 1m resolution), which keeps the
+# detail pages independent of how much history an asset has.
+MAX_CHART_CANDLES = 1440
+
+
+def price_chart(asset, range_key=DEFAULT_CHART_RANGE):
+    """
+    Chart payload (labels + closing prices) for an asset detail page.
+    """
+    if range_key not in CHART_RANGES:
+        range_key = DEFAULT_CHART_RANGE
+    resolution, span, label_format = CHART_RANGES[range_key]
+
+    candles = get_price_candles(
+        asset,
+        resolution,
+        start=timezone.now() - span,
+        limit=MAX_CHART_CANDLES
+    )
+    return {
+        'range': range_key,
+        'resolution': resolution,
+        'labels': [
+            timezone.localtime(c.bucket_start).strftime(label_format)
+            for c in candles
+        ],
+        'values': [float(c.close) for c in candles],
+    }
+
+
+# --------------------------------------------------
+# Price alerts
+# --------------------------------------------------
+
+# Alerts loaded and updated per query when a tick fires many at once.
+PRICE_ALERT_BATCH_SIZE = 2000
+
+
+def create_price_alert(user, asset, direction, threshold):
+    """
+    Persist an alert and add it to the in-memory index once the
+    transaction commits.
+    """
+    if direction not in (PriceAlert.ABOVE, PriceAlert.BELOW):
+        raise ValueError(f"Unknown alert direction {direction}")
+    if threshold <= 0:
+        raise ValueError("Threshold must be positive")
+
+    alert = PriceAlert.objects.create(
+        user=user,
+        asset=asset,
+        direction=direction,
+        threshold=threshold,
+    )
+    transaction.on_commit(lambda: get_alert_index().add(
+        alert.pk, alert.asset_id, alert.direction == PriceAlert.ABOVE, alert.threshold
+    ))
+    return alert
+
+
+def cancel_price_alert(alert):
+    """
+    Deactivate an alert. Returns False if it already fired or was cancelled.
+    """
+    cancelled = PriceAlert.objects.filter(pk=alert.pk, is_active=True).update(
+        is_active=False
+    )
+    if cancelled:
+        transaction.on_commit(lambda: get_alert_index().remove(
+            alert.pk, alert.asset_id, alert.direction == PriceAlert.ABOVE, alert.threshold
+        ))
+    return bool(cancelled)
+
+
+def evaluate_price_alerts(changes, at=None):
+    """
+    Fire the alerts a tick ({asset_id: (old, new)}) moved through and
+    write one notification per affected user with a single bulk insert.
+    Must run after the tick's prices are written.
+
+    Returns the number of alerts fired.
+    """
+    index = get_alert_index()
+    index.refresh()
+    fired_ids = index.crossed(changes)
+    if not fired_ids:
+        return 0
+    transaction.on_commit(lambda: index.settle(fired_ids))
+
+    at = at or timezone.now()
+    by_user = {}
+    fired = 0
+    for start in range(0, len(fired_ids), PRICE_ALERT_BATCH_SIZE):
+        batch = PriceAlert.objects.filter(
+            pk__in=fired_ids[start:start + PRICE_ALERT_BATCH_SIZE],
+            is_active=True
+        )
+        batch.update(
+            is_active=False,
+            triggered_at=at,
+            triggered_price=Subquery(
+                Asset.objects.filter(pk=OuterRef('asset')).values('price')[:1]
+            ),
+        )
+        for alert in PriceAlert.objects.filter(
+            pk__in=fired_ids[start:start + PRICE_ALERT_BATCH_SIZE],
+            triggered_at=at
+        ).select_related('asset'):
+            by_user.setdefault(alert.user_id, []).append(alert)
+            fired += 1
+
+    PriceAlertNotification.objects.bulk_create(
+        [
+            PriceAlertNotification(
+                user_id=user_id,
+                message=render_to_string('notification/alert.html', {
+                    'alerts': sorted(alerts, key=lambda alert: alert.asset.symbol),
+                }).strip(),
+                alert_count=len(alerts),
+                created_at=at,
             )
+            for user_id, alerts in by_user.items()
+        ],
+        batch_size=1000
+    )
+    return fired
 
-            multiplier = Decimal('1.00') + (change_percent / Decimal('100'))
-            new_price = asset.price * multiplier
 
-            asset.price = max(new_price, Decimal('1.00'))
-            asset.save(update_fields=['price'])
+def pending_price_alert_messages(user):
+    """
+    Messages of the user's undelivered alert notifications, oldest first,
+    marked delivered.
+    """
+    pending = list(
+        user.price_alert_notifications.filter(
+            delivered_at__isnull=True
+        ).values_list('pk', 'message')
+    )
+    if pending:
+        PriceAlertNotification.objects.filter(
+            pk__in=[pk for pk, _ in pending]
+        ).update(delivered_at=timezone.now())
+    return [message for _, message in pending]
@@ -0,0 +1,11 @@
+from django.dispatch import Signal, receiver
+
+# Sent by simulate_price_changes inside the tick's transaction.
+# Arguments: changes ({asset_id: (old_price, new_price)}), at (datetime).
+price_ticked = Signal()
+
+
+@receiver(price_ticked)
+def evaluate_price_alerts_on_tick(sender, changes, at, **kwargs):
+    from .services import evaluate_price_alerts
+    evaluate_price_alerts(changes, at=at)
@@ -1,6 +1,11 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from .services import simulate_price_changes
+from .services import (
+    PRICE_TICK_COMPACT_AFTER,
+    compact_price_ticks,
+    prune_price_history,
+    simulate_price_changes,
+)
 
 @csrf_exempt
 def update_prices_task(request):
@@ -8,4 +13,6 @@ def update_prices_task(request):
         return JsonResponse({'error': 'POST required'}, status=400)
 
     simulate_price_changes()
+    compact_price_ticks(min_age=PRICE_TICK_COMPACT_AFTER)
+    prune_price_history()
     return JsonResponse({'status': 'prices updated'})
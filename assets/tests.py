@@ -1,3 +1,283 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import User
+from .alerts import AssetAlerts, get_alert_index
+from .models import Asset, PriceAlert, PriceAlertNotification, PriceCandle, PriceHistoryBlock, PriceTick
+from .services import (
+    compact_price_ticks,
+    evaluate_price_alerts,
+    get_price_history,
+    prune_price_history,
+    record_price_ticks,
+    simulate_price_changes,
+    update_price_candles,
+)
+
+T0 = datetime(2026, 3, 2, 10, 0, 30, tzinfo=dt_timezone.utc)
+
+
+class PriceAlertDeliveryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="alerts@example.com", password="x", full_name="Alert")
+        self.notification = PriceAlertNotification.objects.create(
+            user=self.user,
+            message="Price alert: ALRT0 rose above $10.00 (now $10.50).",
+            created_at=timezone.now()
+        )
+        self.client.force_login(self.user)
+
+    def test_json_endpoint_leaves_alerts_pending(self):
+        response = self.client.get(reverse('account:performance_chart'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('messages', response.cookies)
+        self.notification.refresh_from_db()
+        self.assertIsNone(self.notification.delivered_at)
+
+    def test_html_page_delivers_alerts_once(self):
+        response = self.client.get(reverse('account:portfolio'))
+        self.assertContains(response, "ALRT0 rose above")
+        self.notification.refresh_from_db()
+        self.assertIsNotNone(self.notification.delivered_at)
+
+        response = self.client.get(reverse('account:portfolio'))
+        self.assertNotContains(response, "ALRT0 rose above")
+
+
+class AssetAlertsTests(SimpleTestCase):
+
+    def setUp(self):
+        self.alerts = AssetAlerts()
+        self.alerts.add(1, True, Decimal('10.00'))
+        self.alerts.add(2, True, Decimal('10.00'))
+        self.alerts.add(3, True, Decimal('11.00'))
+        self.alerts.add(4, False, Decimal('9.00'))
+        self.alerts.add(5, False, Decimal('8.00'))
+
+    def ids(self, old_price, new_price):
+        return [alert_id for alert_id, _, _ in self.alerts.crossed(old_price, new_price)]
+
+    def test_rise_to_threshold_fires_every_alert_there(self):
+        self.assertEqual(self.ids(Decimal('9.50'), Decimal('10.00')), [1, 2])
+        self.assertEqual(len(self.alerts), 3)
+
+    def test_rise_from_threshold_does_not_fire_it(self):
+        self.assertEqual(self.ids(Decimal('10.00'), Decimal('10.50')), [])
+        self.assertEqual(self.ids(Decimal('10.50'), Decimal('12.00')), [3])
+
+    def test_fall_fires_below_side_only(self):
+        self.assertEqual(self.ids(Decimal('10.50'), Decimal('9.00')), [4])
+        self.assertEqual(self.ids(Decimal('9.00'), Decimal('8.50')), [])
+        self.assertEqual(self.ids(Decimal('8.50'), Decimal('7.00')), [5])
+        self.assertEqual(len(self.alerts), 3)
+
+    def test_unchanged_price_fires_nothing(self):
+        self.assertEqual(self.ids(Decimal('10.00'), Decimal('10.00')), [])
+
+
+class EvaluatePriceAlertsTests(TestCase):
+
+    def setUp(self):
+        # A fresh index per test; the process-wide one outlives the
+        # test transaction.
+        patcher = mock.patch('assets.alerts._index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(email="evaluate@example.com", password="x", full_name="Eval")
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="EVAL0",
+            asset_type='STOCK',
+            price=Decimal('10.50')
+        )
+        self.changes = {self.asset.pk: (Decimal('9.50'), Decimal('10.50'))}
+        get_alert_index()
+
+    def create_alert(self):
+        # Straight to the database, as another process would.
+        return PriceAlert.objects.create(
+            user=self.user,
+            asset=self.asset,
+            direction=PriceAlert.ABOVE,
+            threshold=Decimal('10.00')
+        )
+
+    def test_alert_created_elsewhere_fires(self):
+        alert = self.create_alert()
+
+        self.assertEqual(evaluate_price_alerts(self.changes), 1)
+        alert.refresh_from_db()
+        self.assertFalse(alert.is_active)
+        self.assertEqual(alert.triggered_price, Decimal('10.50'))
+        self.assertEqual(self.user.price_alert_notifications.count(), 1)
+
+    def test_rolled_back_tick_keeps_alert(self):
+        alert = self.create_alert()
+
+        with transaction.atomic():
+            self.assertEqual(evaluate_price_alerts(self.changes), 1)
+            transaction.set_rollback(True)
+
+        alert.refresh_from_db()
+        self.assertTrue(alert.is_active)
+        self.assertEqual(evaluate_price_alerts(self.changes), 1)
+
+
+class PriceHistoryTests(TestCase):
+
+    def setUp(self):
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="HIST0",
+            asset_type='STOCK',
+            price=Decimal('10.00')
+        )
+
+    def tick(self, at, price):
+        record_price_ticks({self.asset.pk: (None, Decimal(price))}, at=at)
+
+    def ticks(self, count, start=0):
+        expected = []
+        for i in range(start, start + count):
+            at = T0 + timedelta(seconds=10 * i)
+            price = Decimal(1000 + i).scaleb(-2)
+            self.tick(at, price)
+            expected.append((at, price))
+        return expected
+
+    def blocks(self):
+        return list(
+            PriceHistoryBlock.objects.filter(asset=self.asset)
+            .order_by('start_at')
+            .values_list('tick_count', 'is_open')
+        )
+
+    @mock.patch('assets.services.PRICE_BLOCK_CAPACITY', 4)
+    def test_blocks_fill_then_open_the_next(self):
+        expected = self.ticks(6)
+        self.assertEqual(compact_price_ticks(now=T0 + timedelta(hours=1)), 6)
+        self.assertEqual(self.blocks(), [(4, False), (2, True)])
+
+        expected += self.ticks(4, start=6)
+        compact_price_ticks(now=T0 + timedelta(hours=1))
+        self.assertEqual(self.blocks(), [(4, False), (4, False), (2, True)])
+        self.assertFalse(PriceTick.objects.exists())
+        self.assertEqual(get_price_history("HIST0"), expected)
+
+    def test_offset_past_int32_opens_new_block(self):
+        self.tick(T0, '10.00')
+        later = T0 + timedelta(seconds=2 ** 31 + 5)
+        self.tick(later, '11.00')
+        compact_price_ticks(now=later)
+
+        self.assertEqual(self.blocks(), [(1, False), (1, True)])
+        self.assertEqual(
+            get_price_history("HIST0"),
+            [(T0, Decimal('10.00')), (later, Decimal('11.00'))]
+        )
+
+    @mock.patch('assets.services.PRICE_BLOCK_CAPACITY', 4)
+    def test_history_spans_blocks_and_pending_ticks(self):
+        expected = self.ticks(6)
+        compact_price_ticks(now=T0 + timedelta(hours=1))
+        expected += self.ticks(3, start=6)
+
+        self.assertEqual(get_price_history("HIST0"), expected)
+        # A window cutting through both blocks and the pending ticks.
+        start, end = expected[2][0], expected[7][0]
+        self.assertEqual(get_price_history("HIST0", start=start, end=end), expected[2:8])
+        self.assertEqual(get_price_history("HIST0", start=expected[8][0]), expected[8:])
+
+    def test_candles_split_at_bucket_boundaries(self):
+        for at, price in (
+            (T0, '10.00'),
+            (T0 + timedelta(seconds=20), '12.00'),
+            (T0 + timedelta(seconds=25), '9.00'),
+            (T0 + timedelta(seconds=40), '11.00'),
+            (T0 + timedelta(hours=1), '8.00'),
+        ):
+            update_price_candles({self.asset.pk: (None, Decimal(price))}, at=at)
+
+        def candles(resolution):
+            return [
+                (bucket_start.strftime('%H:%M'), str(o), str(h), str(l), str(c))
+                for bucket_start, o, h, l, c in PriceCandle.objects.filter(
+                    asset=self.asset, resolution=resolution
+                ).order_by('bucket_start').values_list('bucket_start', 'open', 'high', 'low', 'close')
+            ]
+
+        self.assertEqual(candles('1m'), [
+            ('10:00', '10.00', '12.00', '9.00', '9.00'),
+            ('10:01', '11.00', '11.00', '11.00', '11.00'),
+            ('11:00', '8.00', '8.00', '8.00', '8.00'),
+        ])
+        self.assertEqual(candles('1h'), [
+            ('10:00', '10.00', '12.00', '9.00', '11.00'),
+            ('11:00', '8.00', '8.00', '8.00', '8.00'),
+        ])
+        self.assertEqual(candles('1d'), [('00:00', '10.00', '12.00', '8.00', '8.00')])
+
+    def test_prune_keeps_daily_candles_only_past_retention(self):
+        for days_ago in (0, 3, 40):
+            update_price_candles(
+                {self.asset.pk: (None, Decimal('10.00'))},
+                at=T0 - timedelta(days=days_ago)
+            )
+
+        pruned = prune_price_history(now=T0)
+
+        self.assertEqual(pruned, {'blocks': 0, '1m': 2, '1h': 1})
+        remaining = PriceCandle.objects.filter(asset=self.asset)
+        self.assertEqual(remaining.filter(resolution='1m').count(), 1)
+        self.assertEqual(remaining.filter(resolution='1h').count(), 2)
+        self.assertEqual(remaining.filter(resolution='1d').count(), 3)
+
+
+class SimulatePriceChangesTests(TestCase):
+
+    def setUp(self):
+        self.assets = [
+            Asset.objects.create(
+                name=f"Asset {i}",
+                symbol=f"SIM{i}",
+                asset_type='STOCK',
+                price=Decimal(price),
+                volatility=Decimal('5.00')
+            )
+            for i, price in enumerate(['1.50', '10.00', '10.00'])
+        ]
+
+    def tick(self, *change_percent):
+        rng = mock.Mock()
+        rng.uniform.return_value = np.array(change_percent)
+        return simulate_price_changes(rng=rng)
+
+    def test_prices_round_to_cents_and_stop_at_the_floor(self):
+        changes = self.tick(-50.0, 1.26, -1.234)
+
+        expected = {
+            self.assets[0].pk: (Decimal('1.50'), Decimal('1.00')),
+            self.assets[1].pk: (Decimal('10.00'), Decimal('10.13')),
+            self.assets[2].pk: (Decimal('10.00'), Decimal('9.88')),
+        }
+        self.assertEqual(changes, expected)
+        self.assertEqual(
+            dict(Asset.objects.values_list('pk', 'price')),
+            {pk: new for pk, (old, new) in expected.items()}
+        )
+
+    def test_floored_price_can_rise_again(self):
+        self.tick(-90.0, 0.0, 0.0)
+        changes = self.tick(3.0, 0.0, 0.0)
+        self.assertEqual(changes[self.assets[0].pk], (Decimal('1.00'), Decimal('1.03')))
@@ -7,4 +7,7 @@ app_name = 'assets'
 urlpatterns = [
     path('tasks/update-prices/', update_prices_task),
     path('manual-stimulation/', views.manual_price_stimulation, name="manual_stimulation"),
+    path('candles/<str:symbol>/', views.price_candles_view, name="price_candles"),
+    path('alerts/<int:asset_id>/create/', views.create_price_alert_view, name="create_price_alert"),
+    path('alerts/<int:alert_id>/cancel/', views.cancel_price_alert_view, name="cancel_price_alert"),
 ]
\ No newline at end of file
@@ -1,8 +1,34 @@
-from django.shortcuts import render, redirect
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_POST
 
+from .models import Asset, PriceAlert
+from .services import (
+    CANDLE_BUCKETS,
+    cancel_price_alert,
+    create_price_alert,
+    get_price_candles,
+)
 from .tasks import update_prices_task
 
+# Seconds a client may reuse a candle response, per resolution.
+CANDLE_CACHE_SECONDS = {
+    '1m': 15,
+    '1h': 60,
+    '1d': 300,
+}
+MAX_CANDLES_PER_REQUEST = 2000
+
 def manual_price_stimulation(request):
     if request.method == 'POST':
         update_prices_task(request)
@@ -10,3 +36,99 @@ def manual_price_stimulation(request):
         return redirect('staff:admin_dashboard')
 
     return render(request, 'assets/manual_price_stimulation.html')
+
+
+def _parse_bound(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def price_candles_view(request, symbol):
+    asset = get_object_or_404(Asset, symbol=symbol)
+
+    resolution = request.GET.get('resolution', '1h')
+    if resolution not in CANDLE_BUCKETS:
+        return JsonResponse({'error': 'Unknown resolution'}, status=400)
+
+    try:
+        start = _parse_bound(request.GET.get('start'))
+        end = _parse_bound(request.GET.get('end'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start/end datetime'}, status=400)
+
+    candles = get_price_candles(
+        asset,
+        resolution,
+        start=start,
+        end=end,
+        limit=MAX_CANDLES_PER_REQUEST
+    )
+    payload = {
+        'symbol': asset.symbol,
+        'resolution': resolution,
+        'candles': [
+            {
+                't': c.bucket_start.isoformat(),
+                'o': str(c.open),
+                'h': str(c.high),
+                'l': str(c.low),
+                'c': str(c.close),
+            }
+            for c in candles
+        ],
+    }
+
+    body = json.dumps(payload)
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=CANDLE_CACHE_SECONDS[resolution]
+    )
+    return response
+
+
+@login_required
+@require_POST
+def create_price_alert_view(request, asset_id):
+    asset = get_object_or_404(Asset, id=asset_id)
+
+    try:
+        alert = create_price_alert(
+            user=request.user,
+            asset=asset,
+            direction=request.POST.get('direction', ''),
+            threshold=Decimal(request.POST.get('threshold', '0')),
+        )
+    except (InvalidOperation, ValueError) as exc:
+        messages.error(request, f"Could not create alert: {exc}")
+    else:
+        messages.success(
+            request,
+            f"You will be notified when {asset.symbol} "
+            f"{alert.get_direction_display().lower()} ${alert.threshold}."
+        )
+    return redirect('account:customer_dashboard')
+
+
+@login_required
+@require_POST
+def cancel_price_alert_view(request, alert_id):
+    alert = get_object_or_404(PriceAlert, id=alert_id, user=request.user)
+
+    if cancel_price_alert(alert):
+        messages.success(request, "Price alert cancelled.")
+    else:
+        messages.info(request, "This alert is no longer active.")
+    return redirect('account:customer_dashboard')
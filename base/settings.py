@@ -73,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'assets.context_processors.price_alerts',
             ],
         },
     },
@@ -92,6 +93,18 @@ DATABASES = {
 }
 
 
+# Cache shared by every worker process on the host, so an invalidation
+# made by one process (a trade, a snapshot) reaches the others; the
+# default in-process LocMem cache would leave other workers serving stale
+# dashboards. Switch to Redis or Memcached when running on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
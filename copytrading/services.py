@@ -94,6 +94,18 @@ def check_follower_strategy_health(follower_portfolio):
             unwind_strategy_holdings(follower_portfolio, ps)
 
 
+def stop_copied_strategy(ps):
+    """
+    Unwind one copied strategy, return its cash and mark it stopped.
+    """
+    returned_cash = unwind_copy_strategy_holdings(ps)
+
+    ps.portfolio.move_cash(returned_cash)
+
+    ps.status = "STOPPED"
+    ps.save(update_fields=["status"])
+
+
 def stop_copying_and_unwind(follower_portfolio, leader_portfolio):
     """
     Stop copy trading and unwind only copied strategies.
@@ -123,8 +135,7 @@ def stop_copying_and_unwind(follower_portfolio, leader_portfolio):
         ps.save(update_fields=["status"])
 
     # Return allocated cash back to follower
-    follower_portfolio.cash_balance += total_returned_cash
-    follower_portfolio.save(update_fields=["cash_balance"])
+    follower_portfolio.move_cash(total_returned_cash)
 
     # Disable relationship
     relation.is_active = False
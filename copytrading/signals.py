@@ -3,8 +3,11 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from strategies.models import PortfolioStrategy
 from .models import CopyRelationship
-from .services import copy_leader_strategies_to_follower, check_follower_strategy_health
-from portfolios.services import unwind_copy_strategy_holdings
+from .services import (
+    copy_leader_strategies_to_follower, check_follower_strategy_health,
+    stop_copied_strategy
+)
+from trading.dispatcher import dispatch
 
 
 @receiver(post_save, sender=PortfolioStrategy)
@@ -37,9 +40,10 @@ def auto_copy_new_strategy(sender, instance, created, **kwargs):
     if leader_total_cash <= 0:
         return
 
+    # Each follower's trades run on that follower's trade worker.
     for relation in active_followers:
         follower = relation.follower
-        check_follower_strategy_health(follower)
+        dispatch(follower.pk, check_follower_strategy_health, follower)
 
         # Strategy weight
         weight = instance.allocated_cash / leader_total_cash
@@ -48,7 +52,9 @@ def auto_copy_new_strategy(sender, instance, created, **kwargs):
         if follower_cash <= 0:
             continue
 
-        copy_leader_strategies_to_follower(
+        dispatch(
+            follower.pk,
+            copy_leader_strategies_to_follower,
             leader_portfolio=leader_portfolio,
             follower_portfolio=follower,
             allocated_cash=follower_cash,
@@ -85,13 +91,7 @@ def propagate_strategy_stop_to_followers(sender, instance, **kwargs):
         )
 
         for ps in copied_ps:
-            returned_cash = unwind_copy_strategy_holdings(ps)
-
-            ps.portfolio.cash_balance += returned_cash
-            ps.portfolio.save(update_fields=["cash_balance"])
-
-            ps.status = "STOPPED"
-            ps.save(update_fields=["status"])
+            dispatch(ps.portfolio_id, stop_copied_strategy, ps)
 
 
 # @receiver(post_save, sender=PortfolioStrategy)
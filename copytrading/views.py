@@ -8,8 +8,11 @@ from .models import CopyRelationship
 from portfolios.services import liquidate_portfolio
 from strategies.models import PortfolioStrategy
 from .services import copy_leader_strategies_to_follower, stop_copying_and_unwind
+from trading.dispatcher import dispatch
+from trading.idempotency import idempotent, new_idempotency_key
 
 @login_required
+@idempotent
 def follow_portfolio(request, portfolio_id):
     follower = request.user.portfolio
     leader = get_object_or_404(Portfolio, id=portfolio_id)
@@ -44,8 +47,13 @@ def follow_portfolio(request, portfolio_id):
                 }
         )
 
-        # Copy all active leader strategies proportionally
-        copy_leader_strategies_to_follower(leader, follower, allocated_cash, relation)
+        # Copy all active leader strategies proportionally, on the
+        # follower's trade worker
+        dispatch(
+            follower.pk,
+            copy_leader_strategies_to_follower,
+            leader, follower, allocated_cash, relation
+        )
 
         messages.success(request, f"You are now copying {leader.user.nick_name}'s trades and strategies.")
         return redirect('account:copy_trading')
@@ -53,7 +61,8 @@ def follow_portfolio(request, portfolio_id):
     # GET → show form to enter allocated cash
     return render(request, "account/customer/copy_trading/follow_form.html", {
         "leader": leader,
-        "follower": follower
+        "follower": follower,
+        "idempotency_key": new_idempotency_key(),
     })
 
 
@@ -62,14 +71,16 @@ def stop_copying_view(request, leader_id):
     follower = request.user.portfolio
     leader = get_object_or_404(Portfolio, id=leader_id)
 
-    stop_copying_and_unwind(
+    dispatch(
+        follower.pk,
+        stop_copying_and_unwind,
         follower_portfolio=follower,
         leader_portfolio=leader
     )
 
     messages.success(
         request,
-        "Copy trading stopped. All copied strategies have been liquidated."
+        "Copy trading is stopping. All copied strategies are being liquidated."
     )
     return redirect("account:portfolio")
 
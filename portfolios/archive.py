@@ -0,0 +1,355 @@
+import heapq
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from portfolios.models import ArchiveSegment, Portfolio, PortfolioSnapshot
+from trading.models import Trade
+from assets.models import Asset
+
+ARCHIVE_ROOT = Path(getattr(settings, 'ARCHIVE_ROOT', settings.BASE_DIR / 'archive'))
+
+# Trades older than this move to cold storage. Snapshots follow the raw
+# snapshot retention instead (see portfolios.services.roll_up_snapshots).
+TRADE_ARCHIVE_AFTER = getattr(settings, 'TRADE_ARCHIVE_AFTER', timedelta(days=365))
+
+# Upper bound on rows per segment file, so reading one stays cheap.
+ARCHIVE_SEGMENT_ROWS = 250_000
+
+# Decoded segments kept in memory for paging through archived history.
+ARCHIVE_CACHE_SEGMENTS = 4
+
+ARCHIVE_DELETE_BATCH = 2000
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _encode(codec, values):
+    if codec == 'int':
+        return np.array(values, dtype=np.int64)
+    if codec == 'fk':
+        return np.array([-1 if v is None else v for v in values], dtype=np.int64)
+    if codec == 'time':
+        return np.array([(v - _EPOCH) // _MICROSECOND for v in values], dtype=np.int64)
+    if codec == 'str':
+        return np.array(values, dtype=str) if values else np.array([], dtype='<U1')
+    # Fixed-point decimals stored as scaled integers ('dec2', 'dec6').
+    places = int(codec[3:])
+    return np.array(
+        [int(v.scaleb(places).to_integral_value()) for v in values],
+        dtype=np.int64
+    )
+
+
+def _decode(codec, values):
+    values = values.tolist()
+    if codec == 'int':
+        return values
+    if codec == 'fk':
+        return [None if v < 0 else v for v in values]
+    if codec == 'time':
+        return [_EPOCH + timedelta(microseconds=v) for v in values]
+    if codec == 'str':
+        return values
+    places = int(codec[3:])
+    return [Decimal(v).scaleb(-places) for v in values]
+
+
+ArchiveSpec = namedtuple('ArchiveSpec', ['model', 'time_field', 'columns'])
+
+ARCHIVES = {
+    ArchiveSegment.TRADES: ArchiveSpec(
+        Trade,
+        'timestamp',
+        (
+            ('id', 'int'),
+            ('timestamp', 'time'),
+            ('portfolio_id', 'int'),
+            ('asset_id', 'fk'),
+            ('trade_type', 'str'),
+            ('quantity', 'dec6'),
+            ('price', 'dec2'),
+            ('total_value', 'dec2'),
+            ('note', 'str'),
+        ),
+    ),
+    ArchiveSegment.SNAPSHOTS: ArchiveSpec(
+        PortfolioSnapshot,
+        'created_at',
+        (
+            ('id', 'int'),
+            ('created_at', 'time'),
+            ('portfolio_id', 'int'),
+            ('total_value', 'dec2'),
+            ('cash_balance', 'dec2'),
+        ),
+    ),
+}
+
+
+# --------------------------------------------------
+# Writing
+# --------------------------------------------------
+
+def _archivable(kind, cutoff):
+    spec = ARCHIVES[kind]
+    rows = spec.model.objects.filter(**{f'{spec.time_field}__lt': cutoff})
+    if kind == ArchiveSegment.SNAPSHOTS:
+        # Every portfolio's first snapshot stays live, ROI is measured from it.
+        first_snapshot = PortfolioSnapshot.objects.filter(
+            portfolio=OuterRef('portfolio')
+        ).order_by('created_at').values('pk')[:1]
+        rows = rows.exclude(pk=Subquery(first_snapshot))
+    return rows
+
+
+def _write_segment(kind, rows):
+    """
+    Write `rows` (value tuples in column order, one month, id order) to a
+    new segment file and return its unsaved ArchiveSegment.
+    """
+    spec = ARCHIVES[kind]
+    names = [name for name, _ in spec.columns]
+    columns = {
+        name: _encode(codec, values)
+        for (name, codec), values in zip(spec.columns, zip(*rows))
+    }
+
+    times = [row[1] for row in rows]
+    period = min(times).astimezone(dt_timezone.utc).date().replace(day=1)
+    ids = [row[0] for row in rows]
+    relative = Path(kind) / f"{period:%Y-%m}" / f"{min(ids)}-{max(ids)}.npz"
+    target = ARCHIVE_ROOT / relative
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    # Write aside and rename, so a segment file is either complete or absent.
+    partial = target.with_suffix('.partial')
+    with open(partial, 'wb') as f:
+        np.savez_compressed(f, **{name: columns[name] for name in names})
+    os.replace(partial, target)
+
+    return ArchiveSegment(
+        kind=kind,
+        path=relative.as_posix(),
+        period=period,
+        first_id=min(ids),
+        last_id=max(ids),
+        start_at=min(times),
+        end_at=max(times),
+        row_count=len(rows),
+        size_bytes=target.stat().st_size,
+    ), sum(column.nbytes for column in columns.values())
+
+
+def archive_records(kind, cutoff, segment_rows=ARCHIVE_SEGMENT_ROWS):
+    """
+    Move `kind` rows older than `cutoff` out of the database into
+    compressed columnar segment files, one or more per calendar month.
+    Each batch is written to disk before its rows are deleted, in the
+    same transaction that catalogs the segment.
+
+    Returns {'rows', 'segments', 'archive_bytes', 'raw_bytes'}, where
+    raw_bytes is the uncompressed size of the archived columns.
+    """
+    spec = ARCHIVES[kind]
+    fields = [name for name, _ in spec.columns]
+    stats = {'rows': 0, 'segments': 0, 'archive_bytes': 0, 'raw_bytes': 0}
+
+    while True:
+        batch = list(
+            _archivable(kind, cutoff).order_by(spec.time_field, 'pk')
+            .values_list(*fields)[:segment_rows]
+        )
+        if not batch:
+            return stats
+
+        months = {}
+        for row in batch:
+            at = row[1].astimezone(dt_timezone.utc)
+            months.setdefault((at.year, at.month), []).append(row)
+
+        for rows in months.values():
+            rows.sort()
+            segment, raw_bytes = _write_segment(kind, rows)
+            ids = [row[0] for row in rows]
+            with transaction.atomic():
+                segment.save()
+                for start in range(0, len(ids), ARCHIVE_DELETE_BATCH):
+                    spec.model.objects.filter(
+                        pk__in=ids[start:start + ARCHIVE_DELETE_BATCH]
+                    ).delete()
+
+            stats['rows'] += len(rows)
+            stats['segments'] += 1
+            stats['archive_bytes'] += segment.size_bytes
+            stats['raw_bytes'] += raw_bytes
+
+        if len(batch) < segment_rows:
+            return stats
+
+
+def table_bytes(model):
+    """
+    On-disk bytes of a model's table and its indexes, where the backend
+    can tell (SQLite with dbstat, PostgreSQL); None elsewhere.
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table]
+                )
+            except Exception:
+                return None
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+# --------------------------------------------------
+# Reading
+# --------------------------------------------------
+
+@lru_cache(maxsize=ARCHIVE_CACHE_SEGMENTS)
+def _load(path):
+    with np.load(ARCHIVE_ROOT / path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _rows(kind, columns, indices):
+    """
+    Decoded rows (dicts) of a loaded segment at `indices`, in that order.
+    """
+    spec = ARCHIVES[kind]
+    decoded = {
+        name: _decode(codec, columns[name][indices])
+        for name, codec in spec.columns
+    }
+    names = [name for name, _ in spec.columns]
+    return [dict(zip(names, values)) for values in zip(*(decoded[n] for n in names))]
+
+
+def iter_archived(kind, portfolio_id=None, after_id=None, chunk_size=2000):
+    """
+    Archived rows of `kind` as dicts in id order, in lists of at most
+    `chunk_size`. Only one segment is decoded at a time.
+    """
+    segments = ArchiveSegment.objects.filter(kind=kind).order_by('first_id')
+    if after_id:
+        segments = segments.filter(last_id__gt=after_id)
+
+    for segment in segments.iterator():
+        columns = _load(segment.path)
+        mask = np.ones(len(columns['id']), dtype=bool)
+        if portfolio_id is not None:
+            mask &= columns['portfolio_id'] == portfolio_id
+        if after_id:
+            mask &= columns['id'] > after_id
+        indices = np.flatnonzero(mask)
+        for start in range(0, len(indices), chunk_size):
+            yield _rows(kind, columns, indices[start:start + chunk_size])
+
+
+def merge_by_id(*chunked):
+    """
+    Merge id-ordered chunk streams into one id-ordered stream of rows.
+    """
+    return heapq.merge(
+        *((row for chunk in stream for row in chunk) for stream in chunked),
+        key=lambda row: row[0] if isinstance(row, tuple) else row['id']
+    )
+
+
+def archived_trades(
+    portfolio_id=None,
+    trade_type=None,
+    asset_id=None,
+    start=None,
+    end=None,
+    older_than=None,
+    newer_than=None,
+    limit=50
+):
+    """
+    Up to `limit` archived trades as unsaved Trade instances (asset and
+    portfolio attached), matching the filters. Newest first below the
+    (timestamp, id) key `older_than`, or oldest first above `newer_than`.
+    `start` is inclusive, `end` exclusive.
+    """
+    ascending = newer_than is not None
+    segments = ArchiveSegment.objects.filter(kind=ArchiveSegment.TRADES)
+    if start is not None:
+        segments = segments.filter(end_at__gte=start)
+    if end is not None:
+        segments = segments.filter(start_at__lt=end)
+    if older_than is not None:
+        segments = segments.filter(start_at__lte=older_than[0])
+    if newer_than is not None:
+        segments = segments.filter(end_at__gte=newer_than[0])
+    segments = list(segments.order_by('start_at' if ascending else '-end_at'))
+
+    to_us = lambda at: (at - _EPOCH) // _MICROSECOND
+    matches = []
+    for segment in segments:
+        # Segments are visited nearest first; stop once no remaining one
+        # can hold a row that sorts before what is already collected.
+        if len(matches) >= limit:
+            edge = matches[limit - 1][0]
+            if ascending and to_us(segment.start_at) > edge[0]:
+                break
+            if not ascending and to_us(segment.end_at) < edge[0]:
+                break
+
+        columns = _load(segment.path)
+        times = columns['timestamp']
+        ids = columns['id']
+        mask = np.ones(len(ids), dtype=bool)
+        if portfolio_id is not None:
+            mask &= columns['portfolio_id'] == portfolio_id
+        if trade_type:
+            mask &= columns['trade_type'] == trade_type
+        if asset_id is not None:
+            mask &= columns['asset_id'] == asset_id
+        if start is not None:
+            mask &= times >= to_us(start)
+        if end is not None:
+            mask &= times < to_us(end)
+        if older_than is not None:
+            at, pk = to_us(older_than[0]), older_than[1]
+            mask &= (times < at) | ((times == at) & (ids < pk))
+        if newer_than is not None:
+            at, pk = to_us(newer_than[0]), newer_than[1]
+            mask &= (times > at) | ((times == at) & (ids > pk))
+
+        for index in np.flatnonzero(mask).tolist():
+            matches.append(((int(times[index]), int(ids[index])), segment.path, index))
+        matches.sort(reverse=not ascending)
+        del matches[limit:]
+
+    trades = []
+    for _, path, index in matches:
+        row = _rows(ArchiveSegment.TRADES, _load(path), [index])[0]
+        trades.append(Trade(**row))
+
+    assets = Asset.objects.in_bulk({t.asset_id for t in trades if t.asset_id})
+    portfolios = Portfolio.objects.select_related('user').in_bulk(
+        {t.portfolio_id for t in trades}
+    )
+    for trade in trades:
+        trade.asset = assets.get(trade.asset_id)
+        trade.portfolio = portfolios.get(trade.portfolio_id)
+    return trades
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import zlib
+from collections import namedtuple
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from assets.models import Asset
+from portfolios.archive import ARCHIVES, iter_archived, merge_by_id
+from portfolios.models import DividendLog, PortfolioSnapshot
+from trading.models import Trade
+
+# Rows per query. Every chunk is a bounded range read on the primary key,
+# so memory stays flat and an interrupted export can resume from the last
+# id it wrote.
+EXPORT_CHUNK_SIZE = 2000
+
+ExportSpec = namedtuple("ExportSpec", ["model", "fields", "columns"])
+
+EXPORTS = {
+    "trades": ExportSpec(
+        Trade,
+        ("id", "timestamp", "portfolio_id", "asset__symbol", "trade_type",
+         "quantity", "price", "total_value", "note"),
+        ("id", "timestamp", "portfolio", "asset", "trade_type",
+         "quantity", "price", "total_value", "note"),
+    ),
+    "snapshots": ExportSpec(
+        PortfolioSnapshot,
+        ("id", "created_at", "portfolio_id", "total_value", "cash_balance"),
+        ("id", "created_at", "portfolio", "total_value", "cash_balance"),
+    ),
+    "dividends": ExportSpec(
+        DividendLog,
+        ("id", "paid_at", "portfolio_id", "asset__symbol", "amount"),
+        ("id", "paid_at", "portfolio", "asset", "amount"),
+    ),
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _live_chunks(spec, portfolio_id, after, chunk_size):
+    rows = spec.model.objects.all()
+    if portfolio_id is not None:
+        rows = rows.filter(portfolio_id=portfolio_id)
+
+    last_id = after or 0
+    while True:
+        chunk = list(
+            rows.filter(pk__gt=last_id).order_by("pk").values_list(*spec.fields)[:chunk_size]
+        )
+        if chunk:
+            yield chunk
+            last_id = chunk[-1][0]
+        if len(chunk) < chunk_size:
+            return
+
+
+def _archived_chunks(kind, spec, portfolio_id, after, chunk_size):
+    symbols = {}
+    if "asset__symbol" in spec.fields:
+        symbols = dict(Asset.objects.values_list("pk", "symbol"))
+
+    for chunk in iter_archived(kind, portfolio_id, after, chunk_size):
+        yield [
+            tuple(
+                symbols.get(row["asset_id"]) if field == "asset__symbol" else row[field]
+                for field in spec.fields
+            )
+            for row in chunk
+        ]
+
+
+def export_chunks(
+    kind,
+    portfolio_id=None,
+    after=None,
+    chunk_size=EXPORT_CHUNK_SIZE,
+    progress=None
+):
+    """
+    Rows of export `kind` in id order, as lists of at most `chunk_size`
+    value tuples (id first), archived rows included. Limited to one
+    portfolio when given, and to ids above `after` when resuming.
+    `progress(rows, last_id)` is called once the consumer has taken each
+    chunk.
+    """
+    spec = EXPORTS[kind]
+    chunks = _live_chunks(spec, portfolio_id, after, chunk_size)
+    if kind in ARCHIVES:
+        rows = merge_by_id(
+            _archived_chunks(kind, spec, portfolio_id, after, chunk_size),
+            chunks
+        )
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+
+    exported = 0
+    for chunk in chunks:
+        yield chunk
+        exported += len(chunk)
+        if progress:
+            progress(exported, chunk[-1][0])
+
+
+def _csv(spec, chunks, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(spec.columns)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson(spec, chunks, header):
+    encoder = DjangoJSONEncoder()
+    for chunk in chunks:
+        yield "".join(
+            encoder.encode(dict(zip(spec.columns, row))) + "\n" for row in chunk
+        )
+
+
+def _gzip(parts):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for part in parts:
+        data = compressor.compress(part.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(
+    kind,
+    fmt="csv",
+    compress=False,
+    portfolio_id=None,
+    after=None,
+    progress=None
+):
+    """
+    The export as an iterator of text chunks, or of gzip bytes with
+    `compress`. A resumed CSV export (`after`) repeats no header.
+    """
+    spec = EXPORTS[kind]
+    chunks = export_chunks(
+        kind,
+        portfolio_id=portfolio_id,
+        after=after,
+        progress=progress
+    )
+    write = _csv if fmt == "csv" else _ndjson
+    parts = write(spec, chunks, header=not after)
+    return _gzip(parts) if compress else parts
+
+
+def export_filename(kind, fmt="csv", compress=False, portfolio_id=None):
+    scope = f"portfolio-{portfolio_id}" if portfolio_id is not None else "all"
+    return f"{kind}-{scope}.{fmt}" + (".gz" if compress else "")
@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from portfolios.archive import ARCHIVES, TRADE_ARCHIVE_AFTER, archive_records, table_bytes
+from portfolios.models import ArchiveSegment
+from portfolios.services import SNAPSHOT_RETENTION
+from trading.services import trade_page
+
+
+class Command(BaseCommand):
+    help = (
+        "Move trades or snapshots older than a cutoff into compressed "
+        "archive files, then report the space saved and how the usual "
+        "queries on the live table sped up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(ARCHIVES))
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Archive rows older than this many days (default: '
+                 f'{TRADE_ARCHIVE_AFTER.days} for trades, the raw snapshot retention for snapshots)'
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        model = ARCHIVES[kind].model
+        if options['days'] is not None:
+            age = timedelta(days=options['days'])
+        elif kind == ArchiveSegment.TRADES:
+            age = TRADE_ARCHIVE_AFTER
+        else:
+            age = SNAPSHOT_RETENTION['RAW']
+        cutoff = timezone.now() - age
+
+        bytes_before = table_bytes(model)
+        timings_before = self._time_queries(kind, model)
+
+        started = time.perf_counter()
+        stats = archive_records(kind, cutoff)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Archived {stats['rows']:,} {kind} older than {cutoff:%Y-%m-%d} "
+            f"into {stats['segments']} segments in {elapsed:.1f} s"
+        )
+        if not stats['rows']:
+            return
+
+        self.stdout.write(
+            f"Archive files: {stats['archive_bytes']:,} bytes "
+            f"({stats['raw_bytes']:,} bytes of raw columns, "
+            f"{stats['raw_bytes'] / max(stats['archive_bytes'], 1):.1f}x compression)"
+        )
+        bytes_after = table_bytes(model)
+        if bytes_before is not None and bytes_after is not None:
+            # SQLite keeps freed pages in the file until VACUUM.
+            freed = bytes_before - bytes_after
+            self.stdout.write(
+                f"Live table and indexes: {bytes_before:,} -> {bytes_after:,} bytes; "
+                f"saved {freed - stats['archive_bytes']:,} bytes net of the archive"
+            )
+
+        timings_after = self._time_queries(kind, model)
+        for label, before in timings_before.items():
+            after = timings_after[label]
+            self.stdout.write(
+                f"{label}: {before:.1f} ms -> {after:.1f} ms "
+                f"({before / max(after, 0.001):.1f}x)"
+            )
+
+    def _time_queries(self, kind, model):
+        if kind == ArchiveSegment.TRADES:
+            queries = {
+                "volume by trade type": lambda: list(
+                    model.objects.values('trade_type').annotate(
+                        count=Count('pk'), value=Sum('total_value')
+                    )
+                ),
+                "staff history, first page": lambda: trade_page(
+                    model.objects.select_related('asset')
+                ),
+            }
+        else:
+            queries = {
+                "snapshot count per portfolio": lambda: list(
+                    model.objects.values('portfolio').annotate(count=Count('pk'))
+                ),
+            }
+
+        timings = {}
+        for label, query in queries.items():
+            started = time.perf_counter()
+            query()
+            timings[label] = (time.perf_counter() - started) * 1000
+        return timings
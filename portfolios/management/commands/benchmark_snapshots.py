@@ -0,0 +1,179 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from assets.models import Asset
+from portfolios.models import Holding, Portfolio, SnapshotRun
+from portfolios.services import SNAPSHOT_CHUNK_SIZE, take_daily_snapshots
+from strategies.models import PortfolioStrategy, Strategy, StrategyHolding
+
+HOLDINGS_PER_PORTFOLIO = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark take_daily_snapshots against synthetic portfolios with "
+        "a few strategy holdings each. Runs in a rolled back transaction, "
+        "except with --workers: worker processes only see committed rows, "
+        "so the synthetic portfolios are committed and deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000',
+            help='Comma separated portfolio counts to benchmark'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SNAPSHOT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Also time a run valued by this many processes (see portfolios.parallel)'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s]
+
+        for size in sizes:
+            if options['workers'] > 1:
+                self.compare(size, options['chunk_size'], options['workers'])
+                continue
+
+            with transaction.atomic():
+                self.seed(size)
+
+                started = time.perf_counter()
+                run = take_daily_snapshots(chunk_size=options['chunk_size'])
+                elapsed = time.perf_counter() - started
+
+                transaction.set_rollback(True)
+
+            self.report(size, run, elapsed)
+
+    def compare(self, size, chunk_size, workers):
+        first_portfolio = Portfolio.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        with transaction.atomic():
+            first_user = self.seed(size)
+
+        runs = []
+        try:
+            timings = []
+            for count in (1, workers):
+                # An unfinished run is resumed from its checkpoint, so
+                # only the synthetic portfolios are snapshotted.
+                runs.append(SnapshotRun.objects.create(
+                    run_date=timezone.localdate(),
+                    last_portfolio_id=first_portfolio
+                ).pk)
+                started = time.perf_counter()
+                run = take_daily_snapshots(chunk_size=chunk_size, workers=count)
+                elapsed = time.perf_counter() - started
+                timings.append(elapsed)
+                self.report(size, run, elapsed, f", {count} worker{'s' if count > 1 else ''}")
+
+            self.stdout.write(f"{'':>8} speedup: {timings[0] / timings[1]:.2f}x")
+        finally:
+            self.unseed(first_user)
+            SnapshotRun.objects.filter(pk__in=runs).delete()
+
+    def report(self, size, run, elapsed, label=""):
+        self.stdout.write(
+            f"{size:>8} portfolios{label}: {elapsed:8.2f} s "
+            f"({run.snapshots_created / elapsed:,.0f} portfolios/sec)"
+        )
+
+    def seed(self, size):
+        """
+        Create `size` users with a portfolio and strategy holdings. Returns
+        the last user id before them.
+        """
+        User = get_user_model()
+        batch = 1000
+
+        assets = Asset.objects.bulk_create([
+            Asset(
+                name=f"Snapshot bench {i}",
+                symbol=f"SNAPBENCH{i}",
+                asset_type='STOCK',
+                price=Decimal('100.00')
+            )
+            for i in range(HOLDINGS_PER_PORTFOLIO)
+        ])
+        strategy = Strategy.objects.create(
+            name='Snapshot bench',
+            risk_level='LOW',
+            target_return_min=Decimal('1'),
+            target_return_max=Decimal('2')
+        )
+
+        first_user = User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        User.objects.bulk_create([
+            User(email=f"snapbench{i}@example.com", full_name=f"Bench {i}")
+            for i in range(size)
+        ], batch_size=batch)
+        user_ids = User.objects.filter(pk__gt=first_user).values_list('pk', flat=True)
+
+        first_portfolio = Portfolio.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        Portfolio.objects.bulk_create(
+            [Portfolio(user_id=user_id) for user_id in user_ids],
+            batch_size=batch
+        )
+        portfolio_ids = list(
+            Portfolio.objects.filter(pk__gt=first_portfolio).values_list('pk', flat=True)
+        )
+
+        PortfolioStrategy.objects.bulk_create([
+            PortfolioStrategy(
+                portfolio_id=portfolio_id,
+                strategy=strategy,
+                allocated_cash=Decimal('3000.00')
+            )
+            for portfolio_id in portfolio_ids
+        ], batch_size=batch)
+        allocations = dict(
+            PortfolioStrategy.objects.filter(strategy=strategy)
+            .values_list('portfolio_id', 'pk')
+        )
+
+        Holding.objects.bulk_create([
+            Holding(
+                portfolio_id=portfolio_id,
+                asset=asset,
+                quantity=Decimal('10'),
+                average_price=Decimal('95.00')
+            )
+            for portfolio_id in portfolio_ids
+            for asset in assets
+        ], batch_size=batch)
+
+        StrategyHolding.objects.bulk_create([
+            StrategyHolding(
+                portfolio_id=portfolio_id,
+                strategy_allocation_id=allocations[portfolio_id],
+                holding_id=holding_id,
+                asset_id=asset_id,
+                quantity=Decimal('10'),
+                average_price=Decimal('95.00')
+            )
+            for holding_id, portfolio_id, asset_id in Holding.objects.filter(
+                asset__in=assets
+            ).values_list('pk', 'portfolio_id', 'asset_id')
+        ], batch_size=batch)
+        return first_user
+
+    def unseed(self, first_user):
+        get_user_model().objects.filter(
+            pk__gt=first_user,
+            email__startswith='snapbench'
+        ).delete()
+        Strategy.objects.filter(name='Snapshot bench').delete()
+        Asset.objects.filter(symbol__startswith='SNAPBENCH').delete()
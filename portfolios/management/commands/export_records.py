@@ -0,0 +1,67 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolios.exports import EXPORT_FORMATS, EXPORTS, export_stream
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream trades, snapshots or dividends to a file or stdout as CSV "
+        "or NDJSON. Interrupted exports resume with --after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument(
+            '--portfolio',
+            type=int,
+            default=None,
+            help='Only this portfolio (default: every portfolio)'
+        )
+        parser.add_argument(
+            '--after',
+            type=int,
+            default=0,
+            help='Resume after this id (the last one already exported)'
+        )
+        parser.add_argument('--output', default='-', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        def report(rows, last_id):
+            self.stderr.write(f"{rows} rows exported, resume with --after {last_id}")
+
+        parts = export_stream(
+            options['kind'],
+            options['format'],
+            options['gzip'],
+            portfolio_id=options['portfolio'],
+            after=options['after'],
+            progress=report
+        )
+
+        if options['output'] == '-':
+            out = sys.stdout.buffer if options['gzip'] else sys.stdout
+            close = False
+        else:
+            try:
+                out = open(
+                    options['output'],
+                    # Appending continues a resumed export in place.
+                    ('a' if options['after'] else 'w') + ('b' if options['gzip'] else ''),
+                    **({} if options['gzip'] else {'newline': '', 'encoding': 'utf-8'})
+                )
+            except OSError as exc:
+                raise CommandError(exc)
+            close = True
+
+        try:
+            for part in parts:
+                out.write(part)
+        finally:
+            if close:
+                out.close()
+            else:
+                out.flush()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from portfolios.services import SNAPSHOT_CHUNK_SIZE, take_daily_snapshots
+
+
+class Command(BaseCommand):
+    help = "Take the daily portfolio snapshots, resuming an interrupted run."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=SNAPSHOT_CHUNK_SIZE,
+            help='Portfolios valued and written per chunk'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes valuing chunks in parallel'
+        )
+
+    def handle(self, *args, **options):
+        def report(done, total):
+            self.stdout.write(f"{done}/{total} portfolios snapshotted")
+
+        run = take_daily_snapshots(
+            chunk_size=options['chunk_size'],
+            progress=report,
+            workers=options['workers']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot run {run.pk} complete: {run.snapshots_created} snapshots"
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_date', models.DateField()),
+                ('last_portfolio_id', models.BigIntegerField(default=0)),
+                ('snapshots_created', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
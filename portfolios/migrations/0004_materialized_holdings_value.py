@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_holdings_value(apps, schema_editor):
+    Portfolio = apps.get_model('portfolios', 'Portfolio')
+    StrategyHolding = apps.get_model('strategies', 'StrategyHolding')
+
+    values = {}
+    for portfolio_id, quantity, price in StrategyHolding.objects.values_list(
+        'holding__portfolio_id', 'quantity', 'holding__asset__price'
+    ):
+        values[portfolio_id] = values.get(portfolio_id, Decimal('0')) + quantity * price
+
+    for portfolio_id, value in values.items():
+        Portfolio.objects.filter(pk=portfolio_id).update(holdings_value=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_price_candle'),
+        ('portfolios', '0003_snapshotrun'),
+        ('strategies', '0004_portfoliostrategy_remaining_cash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='holdings_value',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), max_digits=24),
+        ),
+        migrations.AddIndex(
+            model_name='holding',
+            index=models.Index(fields=['asset', 'portfolio', 'quantity'], name='portfolios__asset_i_deba3c_idx'),
+        ),
+        migrations.RunPython(backfill_holdings_value, migrations.RunPython.noop),
+    ]
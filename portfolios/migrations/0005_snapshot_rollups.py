@@ -0,0 +1,50 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0004_materialized_holdings_value'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshotRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('DAY', 'Daily'), ('WEEK', 'Weekly'), ('MONTH', 'Monthly')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('last_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('min_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('max_value', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cash_balance', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+            options={
+                'ordering': ['period_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='portfoliosnapshot',
+            index=models.Index(fields=['portfolio', 'created_at'], name='portfolios__portfol_020873_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfoliosnapshot',
+            index=models.Index(fields=['created_at'], name='portfolios__created_b13bf4_idx'),
+        ),
+        migrations.AddField(
+            model_name='portfoliosnapshotrollup',
+            name='portfolio',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot_rollups', to='portfolios.portfolio'),
+        ),
+        migrations.AddIndex(
+            model_name='portfoliosnapshotrollup',
+            index=models.Index(fields=['tier', 'period_start'], name='portfolios__tier_bc531c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='portfoliosnapshotrollup',
+            unique_together={('portfolio', 'tier', 'period_start')},
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations
+
+MERGE_BATCH_SIZE = 2000
+
+
+def merge_transactions(apps, schema_editor):
+    """
+    Copy every Transaction into the Trade ledger, keeping its timestamp.
+    Rows that already exist as a trade (same portfolio, asset, type,
+    quantity, price and timestamp) are not duplicated.
+    """
+    Transaction = apps.get_model('portfolios', 'Transaction')
+    Trade = apps.get_model('trading', 'Trade')
+
+    last_id = 0
+    while True:
+        batch = list(Transaction.objects.filter(pk__gt=last_id).order_by('pk')[:MERGE_BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].pk
+
+        existing = set(
+            Trade.objects.filter(
+                portfolio_id__in={t.portfolio_id for t in batch},
+                timestamp__gte=min(t.timestamp for t in batch),
+                timestamp__lte=max(t.timestamp for t in batch),
+            ).values_list('portfolio_id', 'asset_id', 'trade_type', 'quantity', 'price', 'timestamp')
+        )
+        rows = [t for t in batch if (
+            t.portfolio_id, t.asset_id, t.transaction_type, t.quantity, t.price, t.timestamp
+        ) not in existing]
+        trades = Trade.objects.bulk_create([
+            Trade(
+                portfolio_id=t.portfolio_id,
+                asset_id=t.asset_id,
+                trade_type=t.transaction_type,
+                quantity=t.quantity,
+                price=t.price,
+                total_value=t.total_value,
+                note=t.note,
+            )
+            for t in rows
+        ])
+        # bulk_create stamps auto_now_add fields with "now"; put the
+        # original timestamps back with an update, which leaves them be.
+        for trade, t in zip(trades, rows):
+            trade.timestamp = t.timestamp
+        Trade.objects.bulk_update(trades, ['timestamp'], batch_size=MERGE_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0005_snapshot_rollups'),
+        ('trading', '0004_trade_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_transactions, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='Transaction',
+        ),
+    ]
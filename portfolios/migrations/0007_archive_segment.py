@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0006_merge_transactions_into_trades'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('trades', 'Trades'), ('snapshots', 'Snapshots')], max_length=10)),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('period', models.DateField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('start_at', models.DateTimeField()),
+                ('end_at', models.DateTimeField()),
+                ('row_count', models.PositiveIntegerField()),
+                ('size_bytes', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['kind', 'first_id'],
+                'indexes': [models.Index(fields=['kind', 'end_at'], name='portfolios__kind_eb36df_idx')],
+            },
+        ),
+    ]
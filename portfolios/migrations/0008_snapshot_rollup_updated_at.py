@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0007_archive_segment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfoliosnapshotrollup',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,12 +1,75 @@
 from django.conf import settings
 from django.db import models
 from decimal import Decimal
-from django.db.models import Sum, F, DecimalField, ExpressionWrapper
+from django.db.models import Sum, F, DecimalField, ExpressionWrapper, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 
 from assets.models import Asset
 
 User = settings.AUTH_USER_MODEL
 
+# Output type for valuation aggregates: price (2dp) x quantity (4dp).
+VALUATION_FIELD = DecimalField(max_digits=24, decimal_places=6)
+
+CENTS = Decimal('0.01')
+
+
+def move_balance(instance, field, delta):
+    """
+    Add `delta` (negative to spend) to a 2dp cash column of `instance`
+    with one conditional UPDATE that never takes it below zero, so
+    concurrent writers cannot lose each other's changes. The instance is
+    refreshed from the row. Raises ValueError if the balance is too low.
+    """
+    delta = Decimal(delta).quantize(CENTS)
+    if not delta:
+        return
+    rows = type(instance).objects.filter(pk=instance.pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    if not rows.update(**{field: F(field) + delta}):
+        raise ValueError(
+            f"Insufficient {field} on {instance._meta.object_name} {instance.pk} for {-delta}"
+        )
+    instance.refresh_from_db(fields=[field])
+
+
+def _slice_total(portfolio_ref, per_unit):
+    """
+    Correlated subquery summing strategy-slice quantity x `per_unit`
+    over every holding of the portfolio referenced by `portfolio_ref`.
+    """
+    return Coalesce(
+        Subquery(
+            Holding.objects
+            .filter(portfolio=portfolio_ref)
+            .order_by()
+            .values('portfolio')
+            .annotate(total=Sum(ExpressionWrapper(
+                F('strategy_slices__quantity') * F(per_unit),
+                output_field=VALUATION_FIELD
+            )))
+            .values('total'),
+            output_field=VALUATION_FIELD
+        ),
+        Value(Decimal('0')),
+        output_field=VALUATION_FIELD
+    )
+
+
+class PortfolioQuerySet(models.QuerySet):
+
+    def with_valuation(self):
+        """
+        Annotate each portfolio with holdings_market_value and
+        holdings_cost_basis, computed in the same SELECT.
+        """
+        return self.annotate(
+            holdings_market_value=_slice_total(OuterRef('pk'), 'asset__price'),
+            holdings_cost_basis=_slice_total(OuterRef('pk'), 'average_price'),
+        )
+
+
 class Portfolio(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     cash_balance = models.DecimalField(
@@ -14,19 +77,63 @@ class Portfolio(models.Model):
         decimal_places=2,
         default=Decimal('1000000.00')  # virtual money
     )
+    # Materialized market value of all holdings. Adjusted incrementally by
+    # price ticks and trades, checked by reconcile_holdings_values().
+    holdings_value = models.DecimalField(
+        max_digits=24,
+        decimal_places=6,
+        default=Decimal('0')
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
-    def total_holding_value(self):
-        holdings_value = sum(
-            h.market_value() for h in self.holdings.all()
+    objects = PortfolioQuerySet.as_manager()
+
+    def valuation(self):
+        """
+        Cash, holdings value, cost basis and unrealized P&L.
+
+        Uses the with_valuation() annotations when the instance was loaded
+        through that queryset, otherwise runs it for this portfolio only.
+        """
+        if hasattr(self, 'holdings_market_value'):
+            holdings_value = self.holdings_market_value
+            cost_basis = self.holdings_cost_basis
+        else:
+            holdings_value, cost_basis = Portfolio.objects.with_valuation().filter(
+                pk=self.pk
+            ).values_list('holdings_market_value', 'holdings_cost_basis').get()
+
+        return {
+            'cash_balance': self.cash_balance,
+            'holdings_value': holdings_value,
+            'total_value': self.cash_balance + holdings_value,
+            'cost_basis': cost_basis,
+            'unrealized_pnl': holdings_value - cost_basis,
+        }
+
+    def adjust_holdings_value(self, delta):
+        """
+        Shift the materialized holdings value by `delta` with an atomic
+        UPDATE, keeping this instance in step.
+        """
+        if not delta:
+            return
+        Portfolio.objects.filter(pk=self.pk).update(
+            holdings_value=F('holdings_value') + delta
         )
-        return holdings_value
+        self.holdings_value += delta
+
+    def move_cash(self, delta):
+        """
+        Atomically add `delta` to cash_balance (see move_balance).
+        """
+        move_balance(self, 'cash_balance', delta)
+
+    def total_holding_value(self):
+        return self.holdings_value
     
     def total_value(self):
-        holdings_value = sum(
-            h.market_value() for h in self.holdings.all()
-        )
-        return self.cash_balance + holdings_value
+        return self.cash_balance + self.holdings_value
 
     def __str__(self):
         return f"{self.user} Portfolio"
@@ -56,6 +163,22 @@ class Portfolio(models.Model):
     #     return (self.total_return() / initial) * 100
     
 
+class HoldingQuerySet(models.QuerySet):
+
+    def with_valuation(self):
+        """
+        Load the asset and the summed strategy-slice quantity with each
+        holding, so market_value() and friends issue no further queries.
+        """
+        return self.select_related('asset').annotate(
+            slice_quantity=Coalesce(
+                Sum('strategy_slices__quantity'),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=15, decimal_places=4)
+            )
+        )
+
+
 class Holding(models.Model):
     portfolio = models.ForeignKey(
         Portfolio,
@@ -76,11 +199,19 @@ class Holding(models.Model):
         default=Decimal('0')
     )
 
+    objects = HoldingQuerySet.as_manager()
+
     class Meta:
         unique_together = ('portfolio', 'asset')
+        indexes = [
+            # asset -> holders lookup used to apply price ticks
+            models.Index(fields=['asset', 'portfolio', 'quantity']),
+        ]
 
     @property
     def total_quantity(self):
+        if 'slice_quantity' in self.__dict__:
+            return self.slice_quantity
         return self.strategy_slices.aggregate(
             total=models.Sum('quantity')
         )['total'] or Decimal('0')
@@ -158,31 +289,105 @@ class PortfolioSnapshot(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['portfolio', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.portfolio.id} @ {self.created_at}"
     
 
-class Transaction(models.Model):
-    TRANSACTION_TYPES = [
-        ('BUY', 'Buy'),
-        ('SELL', 'Sell'),
-        ('DIVIDEND', 'Dividend'),
-        ('REBALANCE', 'Rebalance'),
-        ('SWITCH', 'Strategy Switch'),
+class PortfolioSnapshotRollup(models.Model):
+    """
+    Summary of a portfolio's snapshots over one day, week or month.
+    Raw snapshots and finer tiers are deleted once they age out, leaving
+    these rows as the long-term history.
+    """
+    DAY = 'DAY'
+    WEEK = 'WEEK'
+    MONTH = 'MONTH'
+
+    TIER_CHOICES = [
+        (DAY, 'Daily'),
+        (WEEK, 'Weekly'),
+        (MONTH, 'Monthly'),
     ]
 
-    portfolio = models.ForeignKey('Portfolio', on_delete=models.CASCADE, related_name='transactions')
-    asset = models.ForeignKey('assets.Asset', on_delete=models.SET_NULL, null=True, blank=True)
-    transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
-    quantity = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'))
-    price = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0'))
-    total_value = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0'))
-    timestamp = models.DateTimeField(auto_now_add=True)
-    note = models.TextField(blank=True)
+    portfolio = models.ForeignKey(
+        Portfolio,
+        on_delete=models.CASCADE,
+        related_name='snapshot_rollups'
+    )
+    tier = models.CharField(max_length=5, choices=TIER_CHOICES)
+    period_start = models.DateField()
+    last_value = models.DecimalField(max_digits=14, decimal_places=2)
+    min_value = models.DecimalField(max_digits=14, decimal_places=2)
+    max_value = models.DecimalField(max_digits=14, decimal_places=2)
+    cash_balance = models.DecimalField(max_digits=14, decimal_places=2)
+    # Moves on every upsert, so chart ETags notice rewritten periods.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['period_start']
+        unique_together = ('portfolio', 'tier', 'period_start')
+        indexes = [
+            models.Index(fields=['tier', 'period_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.portfolio_id} {self.tier} @ {self.period_start}"
+
+
+class SnapshotRun(models.Model):
+    """
+    Progress checkpoint for one take_daily_snapshots run. Portfolios are
+    processed in id order, so an interrupted run resumes after
+    last_portfolio_id.
+    """
+    run_date = models.DateField()
+    last_portfolio_id = models.BigIntegerField(default=0)
+    snapshots_created = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Snapshot run {self.run_date} @ {self.last_portfolio_id}"
+
+
+class ArchiveSegment(models.Model):
+    """
+    One cold-storage file of archived Trade or PortfolioSnapshot rows
+    (see portfolios.archive). Segments are written once and never
+    changed; each covers rows from a single calendar month.
+    """
+    TRADES = 'trades'
+    SNAPSHOTS = 'snapshots'
+
+    KIND_CHOICES = (
+        (TRADES, 'Trades'),
+        (SNAPSHOTS, 'Snapshots'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    path = models.CharField(max_length=255, unique=True)
+    period = models.DateField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    start_at = models.DateTimeField()
+    end_at = models.DateTimeField()
+    row_count = models.PositiveIntegerField()
+    size_bytes = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-timestamp']
+        ordering = ['kind', 'first_id']
+        indexes = [
+            models.Index(fields=['kind', 'end_at']),
+        ]
 
     def __str__(self):
-        return f"{self.transaction_type} {self.asset} {self.total_value}"
+        return f"{self.kind} {self.period:%Y-%m} ({self.row_count} rows)"
@@ -0,0 +1,69 @@
+"""
+Process-pool valuation for the snapshot job.
+
+Portfolio id ranges are sharded across worker processes, each valuing its
+range over its own database connection. Models are imported lazily so the
+module can be loaded by spawned workers before Django is set up.
+"""
+import multiprocessing
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+    # Never share the parent's connection across processes.
+    from django.db import connections
+    connections.close_all()
+
+
+def _value_shard(bounds):
+    from portfolios.services import snapshot_rows
+
+    start_id, end_id = bounds
+    return snapshot_rows(start_id, end_id)
+
+
+def shard_bounds(after_id, shard_size):
+    """
+    Split portfolios with id > after_id into (start_exclusive, end_inclusive)
+    id ranges of at most shard_size portfolios each.
+    """
+    from portfolios.models import Portfolio
+
+    ids = list(
+        Portfolio.objects.filter(pk__gt=after_id)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+    bounds = []
+    start_id = after_id
+    for i in range(0, len(ids), shard_size):
+        end_id = ids[min(i + shard_size, len(ids)) - 1]
+        bounds.append((start_id, end_id))
+        start_id = end_id
+    return bounds
+
+
+def valued_chunks(after_id, shard_size, workers):
+    """
+    Yield snapshot rows (see snapshot_rows) shard by shard, in id order,
+    while the shards are valued concurrently by `workers` processes.
+
+    Must be called outside a transaction: the caller's connection is closed
+    before forking.
+    """
+    from django.db import connections
+
+    bounds = shard_bounds(after_id, shard_size)
+    if not bounds:
+        return
+
+    connections.close_all()
+    with multiprocessing.get_context().Pool(
+        processes=workers,
+        initializer=_init_worker
+    ) as pool:
+        # imap keeps shard order, so the coordinator's checkpoint only
+        # ever moves forward.
+        yield from pool.imap(_value_shard, bounds)
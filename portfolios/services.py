@@ -1,22 +1,138 @@
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from django.db import transaction
-from portfolios.models import Portfolio, PortfolioSnapshot, Holding, RebalanceLog, DividendLog
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils import timezone
+from portfolios.archive import archive_records
+from portfolios.signals import snapshots_taken
+from portfolios.models import (
+    ArchiveSegment, Portfolio, PortfolioSnapshot, PortfolioSnapshotRollup, Holding,
+    RebalanceLog, DividendLog, SnapshotRun
+)
 from strategies.models import PortfolioStrategy, StrategyHolding
 from trading.models import Trade
-from trading.services import execute_sell
+from trading.services import Order, execute_orders, record_trades
 from copytrading.utils import is_copy_trading
 
 def calculate_portfolio_value(portfolio):
-    holdings_value = sum(
-        h.market_value() for h in portfolio.holdings.all()
-    )
-    return portfolio.cash_balance + holdings_value
+    return portfolio.total_value()
 
 
 def calculate_holdings_value(portfolio):
-    return sum(
-        h.market_value() for h in portfolio.holdings.all()
+    return portfolio.total_holding_value()
+
+
+def portfolio_valuations(portfolios=None):
+    """
+    Value many portfolios in one query.
+    Returns {portfolio_id: valuation dict} (see Portfolio.valuation).
+    """
+    if portfolios is None:
+        portfolios = Portfolio.objects.all()
+
+    return {
+        portfolio.pk: portfolio.valuation()
+        for portfolio in portfolios.with_valuation()
+    }
+
+SNAPSHOT_CHUNK_SIZE = 2000
+
+# Asset ids per holders lookup; keeps IN (...) under backend parameter limits.
+HOLDERS_LOOKUP_BATCH = 500
+
+
+def _add_to_holdings_values(deltas):
+    """
+    Apply {portfolio_id: delta} to Portfolio.holdings_value with one
+    prepared UPDATE executed per portfolio.
+    """
+    if not deltas:
+        return
+
+    qn = connection.ops.quote_name
+    column = qn(Portfolio._meta.get_field('holdings_value').column)
+    sql = "UPDATE {table} SET {column} = {column} + %s WHERE {pk} = %s".format(
+        table=qn(Portfolio._meta.db_table),
+        column=column,
+        pk=qn(Portfolio._meta.pk.column),
     )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (delta, portfolio_id) for portfolio_id, delta in deltas.items()
+        ])
+
+
+def apply_price_changes(changes):
+    """
+    Move the materialized holdings value of every portfolio holding a
+    repriced asset by quantity x price delta.
+    `changes` is {asset_id: (old_price, new_price)} as produced by a tick.
+    """
+    moved = {
+        asset_id: new_price - old_price
+        for asset_id, (old_price, new_price) in changes.items()
+        if new_price != old_price
+    }
+    asset_ids = list(moved)
+
+    deltas = {}
+    for i in range(0, len(asset_ids), HOLDERS_LOOKUP_BATCH):
+        holders = Holding.objects.filter(
+            asset_id__in=asset_ids[i:i + HOLDERS_LOOKUP_BATCH],
+            quantity__gt=0
+        ).values_list('portfolio_id', 'asset_id', 'quantity')
+
+        for portfolio_id, asset_id, quantity in holders:
+            deltas[portfolio_id] = (
+                deltas.get(portfolio_id, Decimal('0'))
+                + quantity * moved[asset_id]
+            )
+
+    _add_to_holdings_values(deltas)
+    return len(deltas)
+
+
+def reconcile_holdings_values(fix=True, tolerance=Decimal('0.01'), chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Compare every materialized holdings_value with a full recompute.
+    Returns [(portfolio_id, stored, actual), ...] for portfolios off by
+    more than `tolerance`; with `fix`, the stored values are corrected.
+    """
+    mismatches = []
+    last_id = 0
+    while True:
+        rows = list(
+            Portfolio.objects.filter(pk__gt=last_id)
+            .with_valuation()
+            .order_by('pk')
+            .values_list('pk', 'holdings_value', 'holdings_market_value')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        chunk = [
+            (portfolio_id, stored, actual)
+            for portfolio_id, stored, actual in rows
+            if abs(stored - actual) > tolerance
+        ]
+        if fix and chunk:
+            with transaction.atomic():
+                Portfolio.objects.bulk_update(
+                    [Portfolio(pk=pk, holdings_value=actual) for pk, _, actual in chunk],
+                    ['holdings_value']
+                )
+        mismatches.extend(chunk)
+
+    return mismatches
+
+
+# Rebalancing leaves a position alone while it is within this many dollars
+# of its target value.
+REBALANCE_DRIFT_THRESHOLD = Decimal('1.00')
+
 
 def rebalance_portfolio(portfolio):
     """
@@ -34,6 +150,7 @@ def rebalance_portfolio(portfolio):
 
     strategy = portfolio_strategy.strategy
     total_value = portfolio.total_value()
+    trades = []
 
     for allocation in strategy.allocations.select_related('asset'):
         target_value = (
@@ -50,31 +167,33 @@ def rebalance_portfolio(portfolio):
         difference = target_value - current_value
 
         # Ignore very small drift
-        if abs(difference) < Decimal('1.00'):
+        if abs(difference) < REBALANCE_DRIFT_THRESHOLD:
             continue
 
         if difference > 0:
             amount_bought = holding.buy_value(difference)
             if amount_bought > 0 and holding.asset.price is not None:
-                Trade.objects.create(
+                trades.append(Trade(
                     portfolio=portfolio,
                     asset=holding.asset,
                     trade_type=Trade.REBALANCE,
                     quantity=amount_bought,
                     price=holding.asset.price,
                     note=f"Rebalance BUY to target {allocation.percentage}%"
-                )
+                ))
         else:
             amount_sold = holding.sell_value(abs(difference))
             if amount_sold > 0 and holding.asset.price is not None:
-                Trade.objects.create(
+                trades.append(Trade(
                     portfolio=portfolio,
                     asset=holding.asset,
                     trade_type=Trade.REBALANCE,
                     quantity=amount_sold,
                     price=holding.asset.price,
                     note=f"Rebalance SELL to target {allocation.percentage}%"
-                )
+                ))
+
+    record_trades(trades)
 
     # Optional: log a high-level rebalance
     RebalanceLog.objects.create(
@@ -84,62 +203,486 @@ def rebalance_portfolio(portfolio):
     )
 
 
+def reit_period_yield(asset):
+    """
+    Percent of market value a REIT pays per dividend period (a month or a
+    quarter, by its dividend_frequency); None if it pays nothing.
+    """
+    if asset.asset_type != 'REIT' or not asset.annual_yield:
+        return None
+    if asset.dividend_frequency == 'MONTHLY':
+        return asset.annual_yield / Decimal('12')
+    return asset.annual_yield / Decimal('4')
+
+
 def pay_reit_dividends():
-    reit_holdings = Holding.objects.filter(
-        asset__asset_type='REIT',
-        quantity__gt=0
-    ).select_related('asset', 'portfolio')
+    with transaction.atomic():
+        reit_holdings = Holding.objects.filter(
+            asset__asset_type='REIT',
+            quantity__gt=0
+        ).with_valuation().select_related('portfolio')
+
+        dividends = []
+        trades = []
+        for holding in reit_holdings:
+            asset = holding.asset
+
+            # Determine period yield
+            period_yield = reit_period_yield(asset)
+            if period_yield is None:
+                continue
+
+            # Calculate dividend
+            dividend_amount = holding.market_value() * period_yield / Decimal('100')
+
+            if dividend_amount <= 0:
+                continue
+
+            # Add to portfolio cash
+            portfolio = holding.portfolio
+            portfolio.move_cash(dividend_amount)
+
+            # Log Dividend
+            dividends.append(DividendLog(
+                portfolio=portfolio,
+                asset=asset,
+                amount=dividend_amount
+            ))
 
-    for holding in reit_holdings:
-        asset = holding.asset
+            # ✅ Add Trade/Audit entry
+            trades.append(Trade(
+                portfolio=portfolio,
+                asset=asset,
+                trade_type=Trade.DIVIDEND,
+                quantity=0,
+                price=dividend_amount,
+                note=f"{asset.symbol} dividend payout"
+            ))
 
-        if not asset.annual_yield:
-            continue
+        DividendLog.objects.bulk_create(dividends, batch_size=1000)
+        record_trades(trades)
 
-        # Determine period yield
-        if asset.dividend_frequency == 'MONTHLY':
-            period_yield = asset.annual_yield / Decimal('12')
-        else:
-            period_yield = asset.annual_yield / Decimal('4')
 
-        # Calculate dividend
-        dividend_amount = holding.market_value() * period_yield / Decimal('100')
+def snapshot_rows(start_id, end_id=None, limit=None):
+    """
+    Valued (portfolio_id, total_value, cash_balance) rows for portfolios
+    with start_id < id <= end_id, in id order, from a single query.
+    """
+    portfolios = Portfolio.objects.filter(pk__gt=start_id)
+    if end_id is not None:
+        portfolios = portfolios.filter(pk__lte=end_id)
+
+    rows = portfolios.with_valuation().order_by('pk').values_list(
+        'pk', 'cash_balance', 'holdings_market_value'
+    )
+    if limit is not None:
+        rows = rows[:limit]
 
-        if dividend_amount <= 0:
-            continue
+    return [
+        (portfolio_id, cash_balance + holdings_value, cash_balance)
+        for portfolio_id, cash_balance, holdings_value in rows
+    ]
 
-        # Add to portfolio cash
-        portfolio = holding.portfolio
-        portfolio.cash_balance += dividend_amount
-        portfolio.save(update_fields=['cash_balance'])
 
-        # Log Dividend
-        DividendLog.objects.create(
-            portfolio=portfolio,
-            asset=asset,
-            amount=dividend_amount
-        )
+def write_snapshot_chunk(run, rows):
+    """
+    Insert one chunk of snapshots and advance the run checkpoint in the
+    same transaction, so a crash never leaves a half-written chunk.
+    A shard can come back empty if its portfolios were deleted after the
+    ids were sharded; that leaves the run untouched.
+    """
+    if not rows:
+        return
+
+    with transaction.atomic():
+        PortfolioSnapshot.objects.bulk_create([
+            PortfolioSnapshot(
+                portfolio_id=portfolio_id,
+                total_value=total_value,
+                cash_balance=cash_balance
+            )
+            for portfolio_id, total_value, cash_balance in rows
+        ])
+        run.last_portfolio_id = rows[-1][0]
+        run.snapshots_created += len(rows)
+        run.save(update_fields=['last_portfolio_id', 'snapshots_created'])
 
-        # ✅ Add Trade/Audit entry
-        Trade.objects.create(
-            portfolio=portfolio,
-            asset=asset,
-            trade_type=Trade.DIVIDEND,
-            quantity=0,
-            price=dividend_amount,
-            note=f"{asset.symbol} dividend payout"
+
+def _serial_chunks(run, chunk_size):
+    while True:
+        rows = snapshot_rows(run.last_portfolio_id, limit=chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def take_daily_snapshots(chunk_size=SNAPSHOT_CHUNK_SIZE, progress=None, workers=1):
+    """
+    Snapshot every portfolio, streaming through them in id-ordered chunks.
+
+    Each chunk is valued with one query and written with bulk_create.
+    An unfinished run from today is resumed from its checkpoint instead of
+    starting over. `progress(done, total)` is called after every chunk.
+
+    With workers > 1, chunks are valued by a process pool (see
+    portfolios.parallel) and this process only writes them.
+    """
+    run = SnapshotRun.objects.filter(
+        run_date=timezone.localdate(),
+        completed_at__isnull=True
+    ).first()
+    if run is None:
+        run = SnapshotRun.objects.create(run_date=timezone.localdate())
+
+    total = run.snapshots_created + Portfolio.objects.filter(
+        pk__gt=run.last_portfolio_id
+    ).count()
+
+    if workers > 1:
+        from portfolios.parallel import valued_chunks
+        chunks = valued_chunks(run.last_portfolio_id, chunk_size, workers)
+    else:
+        chunks = _serial_chunks(run, chunk_size)
+
+    for rows in chunks:
+        write_snapshot_chunk(run, rows)
+        if progress:
+            progress(run.snapshots_created, total)
+
+    run.completed_at = timezone.now()
+    run.save(update_fields=['completed_at'])
+    snapshots_taken.send(sender=SnapshotRun, run=run)
+    return run
+
+
+# --------------------------------------------------
+# Snapshot rollups & retention
+# --------------------------------------------------
+
+# How long raw snapshots and the finer rollup tiers are kept. Monthly
+# rollups are kept forever.
+SNAPSHOT_RETENTION = getattr(settings, 'SNAPSHOT_RETENTION', {
+    'RAW': timedelta(days=30),
+    PortfolioSnapshotRollup.DAY: timedelta(days=365),
+    PortfolioSnapshotRollup.WEEK: timedelta(days=3 * 365),
+})
+
+ROLLUP_BATCH_SIZE = 2000
+
+
+def _period_start(tier, day):
+    if tier == PortfolioSnapshotRollup.WEEK:
+        return day - timedelta(days=day.weekday())
+    if tier == PortfolioSnapshotRollup.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _next_period_start(tier, day):
+    if tier == PortfolioSnapshotRollup.WEEK:
+        return day + timedelta(days=7)
+    if tier == PortfolioSnapshotRollup.MONTH:
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _fold_rollups(rows, tier):
+    """
+    Fold (portfolio_id, day, last, low, high, cash) rows, ordered by
+    portfolio and then time, into one rollup per portfolio and period.
+    """
+    rollup = None
+    for portfolio_id, day, last, low, high, cash in rows:
+        period_start = _period_start(tier, day)
+        if (
+            rollup is None
+            or rollup.portfolio_id != portfolio_id
+            or rollup.period_start != period_start
+        ):
+            if rollup is not None:
+                yield rollup
+            rollup = PortfolioSnapshotRollup(
+                portfolio_id=portfolio_id,
+                tier=tier,
+                period_start=period_start,
+                last_value=last,
+                min_value=low,
+                max_value=high,
+                cash_balance=cash,
+            )
+        else:
+            rollup.last_value = last
+            rollup.cash_balance = cash
+            rollup.min_value = min(rollup.min_value, low)
+            rollup.max_value = max(rollup.max_value, high)
+
+    if rollup is not None:
+        yield rollup
+
+
+def _upsert_rollups(batch):
+    with transaction.atomic():
+        PortfolioSnapshotRollup.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['portfolio', 'tier', 'period_start'],
+            update_fields=['last_value', 'min_value', 'max_value', 'cash_balance', 'updated_at'],
         )
+    return len(batch)
 
 
-def take_daily_snapshots():
-    portfolios = Portfolio.objects.all()
+def _save_rollups(rollups):
+    """
+    Upsert rollups in batches. Returns the number of rows written.
+    """
+    written = 0
+    batch = []
+    for rollup in rollups:
+        batch.append(rollup)
+        if len(batch) >= ROLLUP_BATCH_SIZE:
+            written += _upsert_rollups(batch)
+            batch = []
+    if batch:
+        written += _upsert_rollups(batch)
+    return written
 
-    for portfolio in portfolios:
-        PortfolioSnapshot.objects.create(
-            portfolio=portfolio,
-            total_value=portfolio.total_value(),
-            cash_balance=portfolio.cash_balance
+
+def _rollup_watermark(tier):
+    return PortfolioSnapshotRollup.objects.filter(tier=tier).order_by(
+        '-period_start'
+    ).values_list('period_start', flat=True).first()
+
+
+def roll_up_daily(today):
+    """
+    Roll raw snapshots of every finished day since the newest DAY rollup
+    into DAY rollups. The newest day is redone, so reruns are safe.
+    """
+    snapshots = PortfolioSnapshot.objects.filter(created_at__lt=_day_start(today))
+    since = _rollup_watermark(PortfolioSnapshotRollup.DAY)
+    if since is not None:
+        snapshots = snapshots.filter(created_at__gte=_day_start(since))
+
+    rows = (
+        (portfolio_id, timezone.localtime(created_at).date(), value, value, value, cash)
+        for portfolio_id, created_at, value, cash in
+        snapshots.order_by('portfolio_id', 'created_at').values_list(
+            'portfolio_id', 'created_at', 'total_value', 'cash_balance'
+        ).iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    )
+    return _save_rollups(_fold_rollups(rows, PortfolioSnapshotRollup.DAY))
+
+
+def roll_up_from_daily(tier, today):
+    """
+    Build WEEK or MONTH rollups for every finished period since the
+    newest one, from the DAY rollups.
+    """
+    days = PortfolioSnapshotRollup.objects.filter(
+        tier=PortfolioSnapshotRollup.DAY,
+        period_start__lt=_period_start(tier, today)
+    )
+    since = _rollup_watermark(tier)
+    if since is not None:
+        days = days.filter(period_start__gte=since)
+
+    rows = days.order_by('portfolio_id', 'period_start').values_list(
+        'portfolio_id', 'period_start', 'last_value',
+        'min_value', 'max_value', 'cash_balance'
+    ).iterator(chunk_size=ROLLUP_BATCH_SIZE)
+    return _save_rollups(_fold_rollups(rows, tier))
+
+
+def prune_snapshots(today):
+    """
+    Delete raw snapshots and DAY/WEEK rollups older than SNAPSHOT_RETENTION.
+    Every portfolio's first snapshot is kept, since ROI is measured from it.
+    """
+    first_snapshot = PortfolioSnapshot.objects.filter(
+        portfolio=OuterRef('portfolio')
+    ).order_by('created_at').values('pk')[:1]
+
+    raw_deleted, _ = PortfolioSnapshot.objects.filter(
+        created_at__lt=_day_start(today - SNAPSHOT_RETENTION['RAW'])
+    ).exclude(pk=Subquery(first_snapshot)).delete()
+
+    deleted = {'RAW': raw_deleted}
+    for tier in (PortfolioSnapshotRollup.DAY, PortfolioSnapshotRollup.WEEK):
+        deleted[tier], _ = PortfolioSnapshotRollup.objects.filter(
+            tier=tier,
+            period_start__lt=today - SNAPSHOT_RETENTION[tier]
+        ).delete()
+    return deleted
+
+
+def roll_up_snapshots(today=None):
+    """
+    Nightly job: refresh DAY, WEEK and MONTH rollups, then apply retention.
+    Only finished periods are rolled up, and rollups are always written
+    before their source rows age out. Raw snapshots past retention are
+    moved to cold storage rather than lost (see portfolios.archive).
+    """
+    today = today or timezone.localdate()
+    rolled_up = {
+        PortfolioSnapshotRollup.DAY: roll_up_daily(today),
+        PortfolioSnapshotRollup.WEEK: roll_up_from_daily(PortfolioSnapshotRollup.WEEK, today),
+        PortfolioSnapshotRollup.MONTH: roll_up_from_daily(PortfolioSnapshotRollup.MONTH, today),
+    }
+    archived = archive_records(
+        ArchiveSegment.SNAPSHOTS,
+        _day_start(today - SNAPSHOT_RETENTION['RAW'])
+    )
+    return {
+        'rolled_up': rolled_up,
+        'archived': archived['rows'],
+        'deleted': prune_snapshots(today),
+    }
+
+
+PERFORMANCE_RANGES = {
+    '7D': timedelta(days=7),
+    '1M': timedelta(days=30),
+    '3M': timedelta(days=90),
+    '1Y': timedelta(days=365),
+    'ALL': None,
+}
+DEFAULT_PERFORMANCE_RANGE = '7D'
+
+
+def _series_tier(span):
+    if span <= SNAPSHOT_RETENTION['RAW']:
+        return 'RAW'
+    if span <= SNAPSHOT_RETENTION[PortfolioSnapshotRollup.DAY]:
+        return PortfolioSnapshotRollup.DAY
+    if span <= SNAPSHOT_RETENTION[PortfolioSnapshotRollup.WEEK]:
+        return PortfolioSnapshotRollup.WEEK
+    return PortfolioSnapshotRollup.MONTH
+
+
+def performance_series(portfolio, range_key=DEFAULT_PERFORMANCE_RANGE):
+    """
+    Chart payload (labels + total values) for the dashboard.
+
+    The tier follows the span actually covered, so a young account's ALL
+    range still reads raw snapshots while old accounts read rollups.
+    Raw snapshots newer than the last rollup are appended so the series
+    always ends at the latest value.
+    """
+    if range_key not in PERFORMANCE_RANGES:
+        range_key = DEFAULT_PERFORMANCE_RANGE
+
+    now = timezone.now()
+    first = portfolio.snapshots.order_by('created_at').values_list(
+        'created_at', flat=True
+    ).first()
+    if first is None:
+        return {'range': range_key, 'tier': 'RAW', 'labels': [], 'values': []}
+
+    span = now - first
+    if PERFORMANCE_RANGES[range_key] is not None:
+        span = min(span, PERFORMANCE_RANGES[range_key])
+    start = now - span
+    tier = _series_tier(span)
+
+    labels = []
+    values = []
+    raw_since = start
+    if tier != 'RAW':
+        rollups = portfolio.snapshot_rollups.filter(
+            tier=tier,
+            period_start__gte=_period_start(tier, timezone.localtime(start).date())
+        ).order_by('period_start').values_list('period_start', 'last_value')
+        for period_start, last_value in rollups:
+            labels.append(period_start.strftime("%Y-%m-%d"))
+            values.append(float(last_value))
+        if labels:
+            raw_since = max(
+                raw_since,
+                _day_start(_next_period_start(tier, period_start))
+            )
+
+    raw = portfolio.snapshots.filter(created_at__gte=raw_since).order_by(
+        'created_at'
+    ).values_list('created_at', 'total_value')
+    for created_at, total_value in raw:
+        labels.append(timezone.localtime(created_at).strftime("%Y-%m-%d"))
+        values.append(float(total_value))
+
+    return {'range': range_key, 'tier': tier, 'labels': labels, 'values': values}
+
+
+def downsample_lttb(values, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; in between, each bucket
+    keeps the point forming the largest triangle with the previously kept
+    point and the mean of the next bucket, which preserves peaks and dips.
+    Points are treated as evenly spaced, matching the chart's category axis.
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    y = np.asarray(values, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
         )
+        a = start + int(area.argmax())
+        kept.append(a)
+
+    kept.append(n - 1)
+    return kept
+
+
+def performance_chart(portfolio, range_key=DEFAULT_PERFORMANCE_RANGE, points=None):
+    """
+    performance_series() downsampled to at most `points` points.
+    """
+    series = performance_series(portfolio, range_key)
+    if points is not None:
+        kept = downsample_lttb(series['values'], points)
+        series['labels'] = [series['labels'][i] for i in kept]
+        series['values'] = [series['values'][i] for i in kept]
+    return series
+
+
+def performance_chart_version(portfolio):
+    """
+    Cheap fingerprint of the data behind a portfolio's performance chart:
+    newest id and row count of its snapshots, and newest update and row
+    count of its rollups. New snapshots, rollup upserts, pruning and
+    archiving all change it. Two aggregate queries on indexed columns, so
+    conditional requests never build the series.
+    """
+    snapshots = portfolio.snapshots.order_by().aggregate(
+        latest=Max('pk'), count=Count('pk')
+    )
+    rollups = portfolio.snapshot_rollups.order_by().aggregate(
+        updated=Max('updated_at'), count=Count('pk')
+    )
+    updated = rollups['updated'].timestamp() if rollups['updated'] else None
+    return (
+        f"{snapshots['latest']}.{snapshots['count']}-"
+        f"{updated}.{rollups['count']}"
+    )
 
 
 # def unwind_portfolio(portfolio):
@@ -199,33 +742,31 @@ def take_daily_snapshots():
 
 #     portfolio.holdings.filter(quantity=0).delete()
 
-def unwind_strategy_holdings(portfolio, strategy_allocation):
-    """
-    Sell all holdings associated with a specific strategy allocation
-    """
+def _strategy_sell_orders(strategy_allocation, note):
     holdings = StrategyHolding.objects.filter(
-        strategy_allocation=strategy_allocation
-    ).select_related('holding', 'asset')  # correct select_related
+        strategy_allocation=strategy_allocation,
+        quantity__gt=0
+    ).select_related('asset')
 
-    for sh in holdings:
-        holding = sh.holding
-        asset = sh.asset
-        price = asset.price
+    return [
+        Order(asset=sh.asset, side=Trade.SELL, quantity=sh.quantity, note=note)
+        for sh in holdings
+        if sh.asset.price is not None
+    ]
 
-        if price is None or sh.quantity <= 0:
-            continue
 
-        execute_sell(
-            portfolio=portfolio,
-            asset=asset,
-            quantity=sh.quantity,
-            strategy_allocation=strategy_allocation,
+def unwind_strategy_holdings(portfolio, strategy_allocation):
+    """
+    Sell all holdings associated with a specific strategy allocation
+    """
+    execute_orders(
+        portfolio,
+        _strategy_sell_orders(
+            strategy_allocation,
             note=f"Liquidating strategy: {strategy_allocation.strategy.name}"
-        )
-
-
-    # Remove empty strategy holdings
-    holdings.filter(quantity__lte=0).delete()
+        ),
+        strategy_allocation=strategy_allocation
+    )
 
 
 def unwind_copy_strategy_holdings(strategy_allocation):
@@ -233,40 +774,15 @@ def unwind_copy_strategy_holdings(strategy_allocation):
     Sell all holdings associated with a specific strategy allocation
     and return total cash realized.
     """
-    portfolio = strategy_allocation.portfolio
-    total_returned_cash = Decimal("0")
-
-    holdings = StrategyHolding.objects.filter(
-        strategy_allocation=strategy_allocation
-    ).select_related("holding", "asset")
-
-    for sh in holdings:
-        asset = sh.asset
-        quantity = sh.quantity
-        price = asset.price
-
-        if quantity <= 0 or price is None:
-            continue
-
-        proceeds = quantity * price
-
-        execute_sell(
-            portfolio=portfolio,
-            asset=asset,
-            quantity=quantity,
-            strategy_allocation=strategy_allocation,
+    trades = execute_orders(
+        strategy_allocation.portfolio,
+        _strategy_sell_orders(
+            strategy_allocation,
             note=f"Liquidating strategy: {strategy_allocation.strategy.name}"
-        )
-
-        total_returned_cash += proceeds
-
-    # Cleanup empty strategy holdings
-    StrategyHolding.objects.filter(
-        strategy_allocation=strategy_allocation,
-        quantity__lte=0
-    ).delete()
-
-    return total_returned_cash
+        ),
+        strategy_allocation=strategy_allocation
+    )
+    return sum((trade.total_value for trade in trades), Decimal("0"))
 
 
 
@@ -286,14 +802,15 @@ def liquidate_portfolio(portfolio):
     """
     Sell all holdings in a portfolio
     """
-    for holding in portfolio.holdings.select_related('asset'):
-        if holding.quantity > 0:
-            execute_sell(
-                portfolio=portfolio,
-                asset=holding.asset,
-                quantity=holding.quantity,
-                note="Copy trading liquidation"
-            )
+    execute_orders(portfolio, [
+        Order(
+            asset=holding.asset,
+            side=Trade.SELL,
+            quantity=holding.quantity,
+            note="Copy trading liquidation"
+        )
+        for holding in portfolio.holdings.filter(quantity__gt=0).select_related('asset')
+    ])
     # Step 3 — snapshot
     PortfolioSnapshot.objects.create(
         portfolio=portfolio,
@@ -1,10 +1,15 @@
 from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from django.conf import settings
+from assets.signals import price_ticked
 from .models import Portfolio, PortfolioSnapshot
 
 User = settings.AUTH_USER_MODEL
 
+# Sent by take_daily_snapshots once a run has snapshotted every portfolio,
+# with the finished `run` (a SnapshotRun).
+snapshots_taken = Signal()
+
 @receiver(post_save, sender=User)
 def create_portfolio(sender, instance, created, **kwargs):
     if created:
@@ -18,3 +23,8 @@ def create_initial_snapshot(sender, instance, created, **kwargs):
             total_value=instance.total_value(),
             cash_balance=instance.cash_balance
         )
+
+@receiver(price_ticked)
+def apply_price_tick(sender, changes, **kwargs):
+    from .services import apply_price_changes
+    apply_price_changes(changes)
@@ -1,3 +1,408 @@
+import csv
+import gzip
+import io
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import User
+from assets.models import Asset
+from strategies.models import PortfolioStrategy, Strategy, StrategyAllocation
+from strategies.services import execute_strategy
+from trading.models import AssetDailyVolume, Trade
+from trading.services import rebuild_asset_volume, record_trades
+from . import archive
+from .models import (
+    ArchiveSegment, Holding, Portfolio, PortfolioSnapshot, PortfolioSnapshotRollup, SnapshotRun
+)
+from .services import (
+    calculate_holdings_value,
+    calculate_portfolio_value,
+    _upsert_rollups,
+    performance_chart_version,
+    prune_snapshots,
+    roll_up_daily,
+    snapshot_rows,
+    take_daily_snapshots,
+    write_snapshot_chunk,
+)
+
+
+class PortfolioValuationQueryTests(TestCase):
+    """
+    Valuing a portfolio and its holdings must not grow with the number
+    of holdings; these pin the query counts.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.assets = [
+            Asset.objects.create(
+                name=f"Asset {i}",
+                symbol=f"VAL{i}",
+                asset_type='STOCK',
+                price=Decimal('10.00') + i
+            )
+            for i in range(5)
+        ]
+        strategy = Strategy.objects.create(
+            name="Even",
+            risk_level='LOW',
+            target_return_min=1,
+            target_return_max=5
+        )
+        for asset in cls.assets:
+            StrategyAllocation.objects.create(
+                strategy=strategy,
+                asset=asset,
+                percentage=Decimal('20')
+            )
+
+        user = User.objects.create_user(email="valuation@example.com", password="x", full_name="Val")
+        cls.portfolio = user.portfolio
+        allocation = PortfolioStrategy.objects.create(
+            portfolio=cls.portfolio,
+            strategy=strategy,
+            allocated_cash=Decimal('10000'),
+            remaining_cash=Decimal('10000')
+        )
+        execute_strategy(cls.portfolio, allocation)
+
+    def test_valuation_is_one_query(self):
+        portfolio = Portfolio.objects.get(pk=self.portfolio.pk)
+        with self.assertNumQueries(1):
+            valuation = portfolio.valuation()
+
+        holdings = list(Holding.objects.filter(portfolio=portfolio).with_valuation())
+        self.assertEqual(len(holdings), len(self.assets))
+        self.assertEqual(valuation['holdings_value'], sum(h.market_value() for h in holdings))
+        self.assertEqual(valuation['total_value'], portfolio.cash_balance + valuation['holdings_value'])
+
+    def test_annotated_valuation_needs_no_query(self):
+        portfolio = Portfolio.objects.with_valuation().get(pk=self.portfolio.pk)
+        with self.assertNumQueries(0):
+            portfolio.valuation()
+
+    def test_materialized_totals_need_no_query(self):
+        portfolio = Portfolio.objects.get(pk=self.portfolio.pk)
+        with self.assertNumQueries(0):
+            total = calculate_portfolio_value(portfolio)
+            holdings_value = calculate_holdings_value(portfolio)
+
+        self.assertEqual(total, portfolio.cash_balance + holdings_value)
+        self.assertEqual(holdings_value, portfolio.valuation()['holdings_value'])
+
+    def test_holdings_with_valuation_is_one_query(self):
+        with self.assertNumQueries(1):
+            holdings = list(Holding.objects.filter(portfolio=self.portfolio).with_valuation())
+            for holding in holdings:
+                holding.market_value()
+                holding.cost_basis()
+                holding.unrealized_pnl_percent()
+
+        self.assertEqual(len(holdings), len(self.assets))
+
+
+class SnapshotChunkTests(TestCase):
+
+    def test_empty_shard_leaves_run_untouched(self):
+        User.objects.create_user(email="shard@example.com", password="x", full_name="Shard")
+        last_id = Portfolio.objects.order_by('-pk').values_list('pk', flat=True).first()
+        run = SnapshotRun.objects.create(run_date=date.today(), last_portfolio_id=last_id)
+
+        # A shard whose portfolios were deleted after sharding.
+        rows = snapshot_rows(last_id, last_id + 100)
+        self.assertEqual(rows, [])
+        write_snapshot_chunk(run, rows)
+
+        run.refresh_from_db()
+        self.assertEqual(run.last_portfolio_id, last_id)
+        self.assertEqual(run.snapshots_created, 0)
+
+    def test_interrupted_run_resumes_from_its_checkpoint(self):
+        for i in range(5):
+            User.objects.create_user(email=f"resume{i}@example.com", password="x", full_name="Resume")
+        # Leave out the opening snapshot every new portfolio gets.
+        opening = set(PortfolioSnapshot.objects.values_list('pk', flat=True))
+
+        def crash_after_first_chunk(done, total):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            take_daily_snapshots(chunk_size=2, progress=crash_after_first_chunk)
+        run = SnapshotRun.objects.get()
+        self.assertIsNone(run.completed_at)
+        self.assertEqual(run.snapshots_created, 2)
+
+        progress = []
+        resumed = take_daily_snapshots(chunk_size=2, progress=lambda *p: progress.append(p))
+
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertIsNotNone(resumed.completed_at)
+        self.assertEqual(progress, [(4, 5), (5, 5)])
+        self.assertEqual(
+            sorted(PortfolioSnapshot.objects.exclude(pk__in=opening).values_list('portfolio_id', flat=True)),
+            sorted(Portfolio.objects.values_list('pk', flat=True))
+        )
+
+        # A finished run is not resumed; the next one starts afresh.
+        take_daily_snapshots(chunk_size=2)
+        self.assertEqual(SnapshotRun.objects.count(), 2)
+
+
+class PerformanceChartVersionTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(email="chart@example.com", password="x", full_name="Chart")
+        self.portfolio = user.portfolio
+        self.today = timezone.localdate()
+        for days_ago in (400, 40, 2):
+            snapshot = PortfolioSnapshot.objects.create(
+                portfolio=self.portfolio,
+                total_value=Decimal('1000') + days_ago,
+                cash_balance=Decimal('1000')
+            )
+            PortfolioSnapshot.objects.filter(pk=snapshot.pk).update(
+                created_at=timezone.now() - timedelta(days=days_ago)
+            )
+
+    def test_rollup_rewrite_changes_version(self):
+        roll_up_daily(self.today)
+        before = performance_chart_version(self.portfolio)
+
+        # A rerun rewrites an existing period in place.
+        rollup = self.portfolio.snapshot_rollups.order_by('-period_start').first()
+        _upsert_rollups([PortfolioSnapshotRollup(
+            portfolio=self.portfolio,
+            tier=rollup.tier,
+            period_start=rollup.period_start,
+            last_value=rollup.last_value + 1,
+            min_value=rollup.min_value,
+            max_value=rollup.max_value + 1,
+            cash_balance=rollup.cash_balance,
+        )])
+        self.assertEqual(self.portfolio.snapshot_rollups.count(), 3)
+        self.assertNotEqual(performance_chart_version(self.portfolio), before)
+
+    def test_prune_changes_version(self):
+        roll_up_daily(self.today)
+        before = performance_chart_version(self.portfolio)
+        deleted = prune_snapshots(self.today + timedelta(days=400))
+
+        self.assertTrue(any(deleted.values()))
+        self.assertNotEqual(performance_chart_version(self.portfolio), before)
+
+
+class MaintenanceViewTests(TestCase):
+    """
+    The views that rewrite holdings and snapshot data are staff-only POSTs.
+    """
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email="customer@example.com", password="x", full_name="Cust")
+        self.staff = User.objects.create_user(
+            email="staff@example.com", password="x", full_name="Staff", is_staff=True
+        )
+        self.urls = [reverse('portfolio:reconcile_values'), reverse('portfolio:roll_up_snapshots')]
+
+    def test_anonymous_and_customers_are_refused(self):
+        for url in self.urls:
+            self.assertEqual(self.client.post(url).status_code, 302)
+
+        self.client.force_login(self.customer)
+        for url in self.urls:
+            self.assertEqual(self.client.post(url).status_code, 403)
+
+    def test_staff_must_post(self):
+        self.client.force_login(self.staff)
+        for url in self.urls:
+            self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertEqual(self.client.post(self.urls[0]).json()['status'], 'reconciled')
+
+
+class TradeArchiveTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(archive, 'ARCHIVE_ROOT', Path(root.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        archive._load.cache_clear()
+        self.addCleanup(archive._load.cache_clear)
+
+        self.asset = Asset.objects.create(name="Asset", symbol="ARCH0", asset_type='STOCK')
+        self.portfolio = User.objects.create_user(
+            email="archive@example.com", password="x", full_name="Arch"
+        ).portfolio
+        self.old = timezone.now().replace(microsecond=123456) - timedelta(days=40)
+
+        self.trades = record_trades([
+            Trade(
+                portfolio=self.portfolio,
+                asset=self.asset,
+                trade_type=trade_type,
+                quantity=quantity,
+                price=price,
+                note=note
+            )
+            for trade_type, quantity, price, note in (
+                (Trade.BUY, Decimal('1.234567'), Decimal('12.34'), "first"),
+                (Trade.SELL, Decimal('0.000001'), Decimal('99999.99'), ""),
+                (Trade.BUY, Decimal('250'), Decimal('0.01'), "last, with ünïcode"),
+            )
+        ])
+        for offset, trade in enumerate(self.trades):
+            trade.timestamp = self.old + timedelta(seconds=offset)
+            Trade.objects.filter(pk=trade.pk).update(timestamp=trade.timestamp)
+        self.live = record_trades([Trade(
+            portfolio=self.portfolio,
+            asset=self.asset,
+            trade_type=Trade.BUY,
+            quantity=Decimal('1'),
+            price=Decimal('10.00')
+        )])
+
+    def columns(self, trade):
+        return (
+            trade.pk, trade.timestamp, trade.portfolio_id, trade.asset_id,
+            trade.trade_type, trade.quantity, trade.price, trade.total_value, trade.note
+        )
+
+    def archive(self):
+        return archive.archive_records(ArchiveSegment.TRADES, timezone.now() - timedelta(days=30))
+
+    def test_round_trip_keeps_every_value(self):
+        originals = list(Trade.objects.filter(pk__in=[t.pk for t in self.trades]).order_by('pk'))
+        stats = self.archive()
+
+        self.assertEqual(stats['rows'], 3)
+        self.assertEqual(
+            list(Trade.objects.values_list('pk', flat=True)),
+            [self.live[0].pk]
+        )
+        segment = ArchiveSegment.objects.get()
+        self.assertEqual((segment.first_id, segment.last_id), (self.trades[0].pk, self.trades[-1].pk))
+        self.assertEqual((segment.start_at, segment.end_at), (self.trades[0].timestamp, self.trades[-1].timestamp))
+
+        rows = [row for chunk in archive.iter_archived(ArchiveSegment.TRADES) for row in chunk]
+        self.assertEqual(
+            [tuple(row.values()) for row in rows],
+            [self.columns(trade) for trade in originals]
+        )
+        self.assertIsInstance(rows[0]['quantity'], Decimal)
+
+        decoded = archive.archived_trades(portfolio_id=self.portfolio.pk, limit=10)
+        self.assertEqual(
+            [self.columns(trade) for trade in decoded],
+            [self.columns(trade) for trade in reversed(originals)]
+        )
+        self.assertEqual(decoded[0].asset, self.asset)
+
+    def test_failed_delete_catalogs_nothing(self):
+        with mock.patch('django.db.models.query.QuerySet.delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.archive()
+
+        self.assertFalse(ArchiveSegment.objects.exists())
+        self.assertEqual(Trade.objects.count(), 4)
+
+    def test_archived_days_keep_their_volume(self):
+        # The trades were rolled up on the day they were recorded; date
+        # the rollup back to the archived day with them.
+        day = timezone.localdate(self.old)
+        AssetDailyVolume.objects.filter(asset=self.asset).update(day=day)
+        before = list(AssetDailyVolume.objects.values_list('day', 'buy_count', 'sell_count'))
+        self.archive()
+
+        with self.assertRaises(ValueError):
+            rebuild_asset_volume(day)
+        self.assertEqual(
+            list(AssetDailyVolume.objects.values_list('day', 'buy_count', 'sell_count')),
+            before
+        )
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(archive, 'ARCHIVE_ROOT', Path(root.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        archive._load.cache_clear()
+        self.addCleanup(archive._load.cache_clear)
+
+        asset = Asset.objects.create(name="Asset", symbol="EXP0", asset_type='STOCK')
+        self.customer = User.objects.create_user(email="export@example.com", password="x", full_name="Exp")
+        self.other = User.objects.create_user(email="other@example.com", password="x", full_name="Other")
+        self.staff = User.objects.create_user(
+            email="exportstaff@example.com", password="x", full_name="Staff", is_staff=True
+        )
+
+        # Old and new trades interleaved by id across both portfolios; the
+        # old ones go to cold storage, so exports merge the two by id.
+        old = timezone.now() - timedelta(days=40)
+        self.ids = {}
+        for i in range(8):
+            user = self.customer if i % 2 == 0 else self.other
+            trade, = record_trades([Trade(
+                portfolio=user.portfolio,
+                asset=asset,
+                trade_type=Trade.BUY,
+                quantity=Decimal(i + 1),
+                price=Decimal('10.00')
+            )])
+            if i % 4 < 2:
+                Trade.objects.filter(pk=trade.pk).update(timestamp=old + timedelta(minutes=i))
+            self.ids.setdefault(user.pk, []).append(trade.pk)
+        archive.archive_records(ArchiveSegment.TRADES, timezone.now() - timedelta(days=30))
+        self.assertEqual(Trade.objects.count(), 4)
+
+    def export(self, user, **params):
+        self.client.force_login(user)
+        response = self.client.get(reverse('portfolio:export', args=['trades']), params)
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content)
+        if params.get('gzip'):
+            self.assertEqual(response['Content-Type'], 'application/gzip')
+            body = gzip.decompress(body)
+        return body.decode()
+
+    def rows(self, body, header=True):
+        rows = list(csv.reader(io.StringIO(body)))
+        if header:
+            self.assertEqual(rows[0][0], 'id')
+            rows = rows[1:]
+        return [int(row[0]) for row in rows]
+
+    def test_staff_export_merges_archived_and_live_rows(self):
+        body = self.export(self.staff)
+        self.assertEqual(self.rows(body), sorted(self.ids[self.customer.pk] + self.ids[self.other.pk]))
+
+    def test_gzip_body(self):
+        body = self.export(self.customer, gzip='1')
+        self.assertEqual(self.rows(body), self.ids[self.customer.pk])
+
+    def test_resume_after_repeats_no_header(self):
+        mine = self.ids[self.customer.pk]
+        body = self.export(self.customer, after=mine[1])
+        self.assertEqual(self.rows(body, header=False), mine[2:])
+
+        body = self.export(self.customer, after=mine[1], format='ndjson')
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], mine[2:])
+
+    def test_customer_cannot_export_other_portfolios(self):
+        body = self.export(self.customer, portfolio=self.other.portfolio.pk)
+        self.assertEqual(self.rows(body), self.ids[self.customer.pk])
 
-# Create your tests here.
+        body = self.export(self.staff, portfolio=self.other.portfolio.pk)
+        self.assertEqual(self.rows(body), self.ids[self.other.pk])
@@ -5,4 +5,7 @@ app_name = 'portfolio'
 urlpatterns = [
     path('rebalance/', views.rebalance_all_portfolios, name='rebalance'),
     path('run-dividends/', views.run_dividends, name='run_dividends'),
+    path('reconcile-values/', views.reconcile_values, name='reconcile_values'),
+    path('roll-up-snapshots/', views.roll_up_snapshots_view, name='roll_up_snapshots'),
+    path('export/<str:kind>/', views.export_view, name='export'),
 ]
\ No newline at end of file
@@ -1,6 +1,14 @@
-from django.http import JsonResponse
-from .services import rebalance_portfolio, pay_reit_dividends
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from .exports import EXPORT_FORMATS, EXPORTS, export_filename, export_stream
+from .services import (
+    rebalance_portfolio, pay_reit_dividends, reconcile_holdings_values,
+    roll_up_snapshots
+)
 from portfolios.models import Portfolio
+from staff.decorators import admin_staff_only
+from trading.dispatcher import dispatch
 
 
 def rebalance_all_portfolios(request):
@@ -9,7 +17,7 @@ def rebalance_all_portfolios(request):
     ).select_related('portfoliostrategy__strategy')
 
     for portfolio in portfolios:
-        rebalance_portfolio(portfolio)
+        dispatch(portfolio.pk, rebalance_portfolio, portfolio)
 
     return JsonResponse({"status": "ok"})
 
@@ -18,3 +26,57 @@ def run_dividends(request):
     pay_reit_dividends()
     return JsonResponse({"status": "dividends paid"})
 
+
+@login_required
+@admin_staff_only
+@require_POST
+def reconcile_values(request):
+    mismatches = reconcile_holdings_values()
+    return JsonResponse({
+        "status": "reconciled",
+        "corrected": len(mismatches),
+    })
+
+
+@login_required
+@admin_staff_only
+@require_POST
+def roll_up_snapshots_view(request):
+    result = roll_up_snapshots()
+    return JsonResponse({"status": "rolled up", **result})
+
+
+@login_required
+def export_view(request, kind):
+    """
+    Stream an export as CSV or NDJSON (?format=), optionally gzipped
+    (?gzip=1) and resumed after a given id (?after=). Customers export
+    their own portfolio; staff export one portfolio (?portfolio=) or
+    everything.
+    """
+    if kind not in EXPORTS:
+        raise Http404("Unknown export")
+
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({"error": "Unknown format"}, status=400)
+
+    try:
+        after = int(request.GET.get("after") or 0)
+        if request.user.is_staff:
+            portfolio_id = request.GET.get("portfolio")
+            portfolio_id = int(portfolio_id) if portfolio_id else None
+        else:
+            portfolio_id = request.user.portfolio.pk
+    except ValueError:
+        return JsonResponse({"error": "Invalid after/portfolio"}, status=400)
+
+    compress = request.GET.get("gzip") in ("1", "true")
+    response = StreamingHttpResponse(
+        export_stream(kind, fmt, compress, portfolio_id=portfolio_id, after=after),
+        content_type="application/gzip" if compress else EXPORT_FORMATS[fmt]
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export_filename(kind, fmt, compress, portfolio_id)}"'
+    )
+    return response
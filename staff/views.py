@@ -7,6 +7,7 @@ from .decorators import admin_staff_only
 from assets.forms import AssetForm
 from assets.models import Asset
 from trading.models import Trade
+from trading.services import asset_volume_panel, trade_history_page
 from strategies.models import Strategy
 from strategies import forms 
 from account.models import User
@@ -20,7 +21,8 @@ def admin_dashboard_view(request):
 
     context = {
         "current_url": request.resolver_match.url_name,
-        'all_assets':all_assets
+        'all_assets':all_assets,
+        'top_volumes': asset_volume_panel(),
     }
     return render(request, 'account/admin/admin_dashboard.html', context )
 
@@ -131,14 +133,14 @@ def delete_asset_view(request, asset_id):
 @login_required
 @admin_staff_only
 def admin_trade_list_view(request):
-    trades = Trade.objects.select_related(
-        'portfolio',
-        'asset'
-    ).order_by('-timestamp')
+    history = trade_history_page(
+        Trade.objects.select_related('portfolio__user', 'asset'),
+        request.GET
+    )
 
     context = {
         "current_url": request.resolver_match.url_name,
-        "trades": trades,
+        **history,
     }
     return render(request, 'account/admin/trade_list.html', context)
 
@@ -29,14 +29,8 @@ document.addEventListener("DOMContentLoaded", function () {
     // chartjs
     // ===== PORTFOLIO SNAPSHOT CHART =====
     const portfolioCanvas = document.getElementById("portfolioChart");
-    const portfolioLabelsEl = document.getElementById("snapshot-labels");
-    const portfolioValuesEl = document.getElementById("snapshot-values");
-    console.log("Portfolio labels element:", document.getElementById("portfolio-labels"));
-
-    if (portfolioCanvas && portfolioLabelsEl && portfolioValuesEl) {
-        const labels = JSON.parse(portfolioLabelsEl.textContent);
-        const values = JSON.parse(portfolioValuesEl.textContent);
 
+    function renderPortfolioChart(labels, values) {
         new Chart(portfolioCanvas, {
             type: "line",
             data: {
@@ -75,6 +69,17 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     }
 
+    // Fetched after the page loads, with roughly one point per pixel.
+    if (portfolioCanvas && portfolioCanvas.dataset.url) {
+        const points = Math.max(Math.round(portfolioCanvas.clientWidth), 50);
+
+        fetch(`${portfolioCanvas.dataset.url}&points=${points}`, {
+            credentials: "same-origin"
+        })
+            .then(response => response.json())
+            .then(chart => renderPortfolioChart(chart.labels, chart.values));
+    }
+
     // ===== ALLOCATION CHART =====
     const allocationCanvas = document.getElementById("allocationChart");
     const allocationLabelsEl = document.getElementById("allocation-labels");
@@ -114,58 +119,30 @@ document.addEventListener("DOMContentLoaded", function () {
 
 
 
-    const reitCtx = document.getElementById("reitPriceChart");
-
-    if (reitCtx) {
-        new Chart(reitCtx, {
-            type: "line",
-            data: {
-                labels: ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul"],
-                datasets: [{
-                    label: "Price",
-                    data: [78.5, 80.2, 81.0, 82.3, 81.8, 83.5, 82.5],
-                    borderColor: getComputedStyle(document.documentElement)
-                        .getPropertyValue("--color-primary"),
-                    backgroundColor: "transparent",
-                    tension: 0.4,
-                    borderWidth: 2,
-                    pointRadius: 3
-                }]
-            },
-            options: {
-                responsive: true,
-                maintainAspectRatio: false,
-                plugins: { legend: { display: false } },
-                scales: {
-                    y: {
-                        ticks: {
-                            callback: value => "$" + value.toLocaleString()
-                        },
-                        grid: { color: "rgba(0,0,0,0.05)" }
-                    },
-                    x: { grid: { display: false } }
-                }
-            }
-        });
-    }
+    // ===== ASSET PRICE CHART (asset / stock / REIT detail) =====
+    const priceCanvas = document.getElementById("assetPriceChart")
+        || document.getElementById("stockPriceChart")
+        || document.getElementById("reitPriceChart");
+    const priceLabelsEl = document.getElementById("price-chart-labels");
+    const priceValuesEl = document.getElementById("price-chart-values");
 
+    if (priceCanvas && priceLabelsEl && priceValuesEl) {
+        const labels = JSON.parse(priceLabelsEl.textContent);
+        const values = JSON.parse(priceValuesEl.textContent);
 
-    const stockCtx = document.getElementById("stockPriceChart");
-
-    if (stockCtx) {
-        new Chart(stockCtx, {
+        new Chart(priceCanvas, {
             type: "line",
             data: {
-                labels: ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul"],
+                labels: labels,
                 datasets: [{
                     label: "Price",
-                    data: [150, 155, 162, 165, 168, 170, 172.5],
+                    data: values,
                     borderColor: getComputedStyle(document.documentElement)
                         .getPropertyValue("--color-primary"),
                     backgroundColor: "transparent",
                     tension: 0.3,
                     borderWidth: 2,
-                    pointRadius: 3
+                    pointRadius: values.length > 60 ? 0 : 3
                 }]
             },
             options: {
@@ -185,8 +162,6 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     }
 
-
-
 });
 
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StrategiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'strategies'
+
+    def ready(self):
+        import strategies.signals
@@ -0,0 +1,228 @@
+from collections import namedtuple
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from assets.models import PriceCandle
+from portfolios.services import REBALANCE_DRIFT_THRESHOLD, reit_period_yield
+from .models import StrategyAllocation
+
+BACKTEST_CAPITAL = 10_000.0
+
+# The inputs of one backtest run, as arrays over T days, A assets and
+# S strategies:
+#   dates    (T,)   datetime.date of each daily close
+#   prices   (T, A) closes, NaN before an asset's first recorded price
+#   weights  (S, A) target fraction of the portfolio per asset
+#   payouts  (T, A) fraction of position value paid as dividend that day
+BacktestInputs = namedtuple('BacktestInputs', ['dates', 'prices', 'weights', 'payouts'])
+
+
+def daily_closes(asset_ids, start=None, end=None):
+    """
+    (dates, prices) from the recorded daily candles of `asset_ids`:
+    one row per day any of them has a candle, prices carried forward
+    over gaps and NaN before an asset's first candle.
+    """
+    columns = {asset_id: index for index, asset_id in enumerate(asset_ids)}
+    candles = PriceCandle.objects.filter(resolution='1d', asset_id__in=asset_ids)
+    if start is not None:
+        candles = candles.filter(bucket_start__gte=start)
+    if end is not None:
+        candles = candles.filter(bucket_start__lte=end)
+    rows = list(candles.order_by('bucket_start').values_list('bucket_start', 'asset_id', 'close'))
+
+    days = sorted({timezone.localdate(at) for at, _, _ in rows})
+    index = {day: i for i, day in enumerate(days)}
+    prices = np.full((len(days), len(asset_ids)), np.nan)
+    for at, asset_id, close in rows:
+        prices[index[timezone.localdate(at)], columns[asset_id]] = float(close)
+
+    # Carry the last known close forward over days without a candle.
+    known = np.where(np.isnan(prices), 0, np.arange(len(days))[:, None])
+    np.maximum.accumulate(known, axis=0, out=known)
+    prices = prices[known, np.arange(len(asset_ids))]
+    return days, prices
+
+
+def dividend_payouts(dates, assets):
+    """
+    (T, A) payout fractions following pay_reit_dividends: each REIT pays
+    its period yield on the position's market value, on the last day of
+    every month (MONTHLY) or quarter (QUARTERLY) in `dates`.
+    """
+    payouts = np.zeros((len(dates), len(assets)))
+    if not dates:
+        return payouts
+
+    months = np.array([day.year * 12 + day.month - 1 for day in dates])
+    # The last day only closes its month if the month is really over.
+    month_end = np.append(
+        months[1:] != months[:-1],
+        (dates[-1] + timedelta(days=1)).month != dates[-1].month
+    )
+    quarter_end = month_end & (months % 3 == 2)
+    for column, asset in enumerate(assets):
+        period_yield = reit_period_yield(asset)
+        if period_yield is None:
+            continue
+        period_end = month_end if asset.dividend_frequency == 'MONTHLY' else quarter_end
+        payouts[period_end, column] = float(period_yield) / 100
+    return payouts
+
+
+def load_backtest(strategies, start=None, end=None):
+    """
+    BacktestInputs for `strategies` over their assets' recorded daily
+    prices, from two queries.
+    """
+    strategies = list(strategies)
+    rows = {strategy.pk: row for row, strategy in enumerate(strategies)}
+    allocations = list(
+        StrategyAllocation.objects.filter(strategy__in=strategies).select_related('asset')
+    )
+    assets = list({allocation.asset_id: allocation.asset for allocation in allocations}.values())
+    columns = {asset.pk: column for column, asset in enumerate(assets)}
+
+    weights = np.zeros((len(strategies), len(assets)))
+    for allocation in allocations:
+        weights[rows[allocation.strategy_id], columns[allocation.asset_id]] = (
+            float(allocation.percentage) / 100
+        )
+
+    dates, prices = daily_closes([asset.pk for asset in assets], start, end)
+    return BacktestInputs(dates, prices, weights, dividend_payouts(dates, assets))
+
+
+def simulate(
+    inputs,
+    capital=BACKTEST_CAPITAL,
+    rebalance_every=1,
+    threshold=float(REBALANCE_DRIFT_THRESHOLD)
+):
+    """
+    Replay every strategy at once. Each starts as `capital` in cash on
+    the first day all of its assets have a price and buys its weights;
+    dividends are paid into cash; every `rebalance_every` days each
+    position is traded back to its weight of the total value, unless it
+    is within `threshold` dollars of it, as rebalance_portfolio does.
+
+    Returns (equity (T, S), start (S,)), where start is the index of each
+    strategy's first day, T when it never gets one.
+    """
+    dates, prices, weights, payouts = inputs
+    steps = len(dates)
+    held = weights > 0
+    if not steps:
+        return np.empty((0, len(weights))), np.zeros(len(weights), dtype=int)
+
+    # A strategy starts once every asset it holds has a price.
+    first_price = np.where(
+        np.isnan(prices).all(axis=0), steps, np.argmax(~np.isnan(prices), axis=0)
+    )
+    start = np.where(held, first_price, 0).max(axis=1)
+    start[~held.any(axis=1)] = steps
+    prices = np.nan_to_num(prices)
+
+    quantities = np.zeros(weights.shape)
+    cash = np.full(len(weights), float(capital))
+    equity = np.empty((steps, len(weights)))
+
+    for t in range(steps):
+        price = prices[t]
+        values = quantities * price
+        cash += values @ payouts[t]
+
+        if t % rebalance_every == 0 or (start == t).any():
+            active = start <= t
+            total = values.sum(axis=1) + cash
+            difference = weights * total[:, None] - values
+            trade = (np.abs(difference) >= threshold) & active[:, None] & (price > 0)
+            difference = np.where(trade, difference, 0)
+            quantities += np.divide(difference, price, out=np.zeros_like(difference), where=trade)
+            cash -= difference.sum(axis=1)
+            values = quantities * price
+
+        equity[t] = values.sum(axis=1) + cash
+
+    return equity, start
+
+
+def backtest_metrics(dates, equity, start, capital=BACKTEST_CAPITAL):
+    """
+    CAGR, max drawdown and annualised volatility per strategy column of
+    `equity`, each measured from that strategy's start. Returns three
+    (S,) arrays, NaN where a strategy never started or ran under a day.
+    """
+    steps, count = equity.shape
+    nan = np.full(count, np.nan)
+    if steps < 2:
+        return nan, nan.copy(), nan.copy()
+
+    ordinals = np.array([day.toordinal() for day in dates], dtype=float)
+    started = start < steps
+    first = ordinals[np.minimum(start, steps - 1)]
+    years = (ordinals[-1] - first) / 365.25
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = np.where(
+            started & (years > 0),
+            (equity[-1] / capital) ** (1 / years) - 1,
+            np.nan
+        )
+
+        # Equity is flat at `capital` before the start, so the running
+        # peak needs no masking.
+        peaks = np.maximum.accumulate(equity, axis=0)
+        max_drawdown = np.where(started, ((peaks - equity) / peaks).max(axis=0), np.nan)
+
+        returns = equity[1:] / equity[:-1] - 1
+        in_run = np.arange(1, steps)[:, None] > start[None, :]
+        returns = np.where(in_run, returns, np.nan)
+        periods_per_year = 365.25 / np.mean(np.diff(ordinals))
+        counted = in_run.sum(axis=0)
+        volatility = np.where(
+            counted > 1,
+            np.nanstd(np.where(counted > 1, returns, 0), axis=0, ddof=1) * np.sqrt(periods_per_year),
+            np.nan
+        )
+    return cagr, max_drawdown, volatility
+
+
+def backtest_strategies(
+    strategies,
+    start=None,
+    end=None,
+    capital=BACKTEST_CAPITAL,
+    rebalance_every=1
+):
+    """
+    Backtest `strategies` over recorded daily prices (see simulate).
+    Returns one dict per strategy: equity curve, CAGR, max drawdown and
+    volatility (fractions), and whether the CAGR lies within the
+    strategy's target_return_min..max; metrics are None without history.
+    """
+    strategies = list(strategies)
+    inputs = load_backtest(strategies, start, end)
+    equity, first = simulate(inputs, capital=capital, rebalance_every=rebalance_every)
+    cagr, max_drawdown, volatility = backtest_metrics(inputs.dates, equity, first, capital)
+
+    results = []
+    for column, strategy in enumerate(strategies):
+        ran = not np.isnan(cagr[column])
+        begin = int(first[column])
+        results.append({
+            'strategy': strategy,
+            'dates': inputs.dates[begin:],
+            'equity': equity[begin:, column],
+            'cagr': float(cagr[column]) if ran else None,
+            'max_drawdown': float(max_drawdown[column]) if ran else None,
+            'volatility': (
+                float(volatility[column]) if not np.isnan(volatility[column]) else None
+            ),
+            'within_target': (
+                float(strategy.target_return_min) <= cagr[column] * 100
+                <= float(strategy.target_return_max)
+            ) if ran else None,
+        })
+    return results
@@ -0,0 +1,59 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from strategies.backtest import BACKTEST_CAPITAL, backtest_strategies
+from strategies.models import Strategy
+
+
+def _percent(value):
+    return "-" if value is None else f"{value * 100:.2f}%"
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest strategies over the recorded daily price candles and check "
+        "each CAGR against the strategy's target return range."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('strategy_ids', nargs='*', type=int,
+                            help='Strategies to backtest (default: every active one)')
+        parser.add_argument('--start', type=date.fromisoformat, default=None)
+        parser.add_argument('--end', type=date.fromisoformat, default=None)
+        parser.add_argument('--capital', type=float, default=BACKTEST_CAPITAL)
+        parser.add_argument('--rebalance-every', type=int, default=1,
+                            help='Days between rebalances (default: daily)')
+
+    def handle(self, *args, **options):
+        strategies = Strategy.objects.filter(is_active=True)
+        if options['strategy_ids']:
+            strategies = Strategy.objects.filter(pk__in=options['strategy_ids'])
+        if options['rebalance_every'] < 1:
+            raise CommandError("--rebalance-every must be at least 1")
+
+        started = time.perf_counter()
+        results = backtest_strategies(
+            strategies,
+            start=options['start'],
+            end=options['end'],
+            capital=options['capital'],
+            rebalance_every=options['rebalance_every']
+        )
+        elapsed = time.perf_counter() - started
+
+        for result in results:
+            strategy = result['strategy']
+            if result['cagr'] is None:
+                self.stdout.write(f"{strategy.name}: no price history")
+                continue
+            verdict = "within" if result['within_target'] else "OUTSIDE"
+            self.stdout.write(
+                f"{strategy.name}: {result['dates'][0]} to {result['dates'][-1]}, "
+                f"final {result['equity'][-1]:,.2f}, CAGR {_percent(result['cagr'])} "
+                f"({verdict} target {strategy.target_return_min}%-{strategy.target_return_max}%), "
+                f"max drawdown {_percent(result['max_drawdown'])}, "
+                f"volatility {_percent(result['volatility'])}"
+            )
+        self.stdout.write(f"Backtested {len(results)} strategies in {elapsed:.2f} s")
@@ -0,0 +1,59 @@
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from strategies.backtest import BacktestInputs, backtest_metrics, simulate
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the backtest engine on synthetic daily prices: many "
+        "strategies over a shared universe of assets, no database involved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strategies', type=int, default=500)
+        parser.add_argument('--assets', type=int, default=200)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--assets-per-strategy', type=int, default=8)
+        parser.add_argument('--rebalance-every', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        steps = options['years'] * 365
+        assets = options['assets']
+        dates = [date(2020, 1, 1) + timedelta(days=i) for i in range(steps)]
+
+        # Geometric random walks, with a few assets listed part way in.
+        returns = rng.normal(0.0003, 0.015, size=(steps, assets))
+        prices = 100 * np.exp(np.cumsum(returns, axis=0))
+        listed = rng.integers(0, steps // 4, size=assets) * (rng.random(assets) < 0.1)
+        prices[np.arange(steps)[:, None] < listed[None, :]] = np.nan
+
+        weights = np.zeros((options['strategies'], assets))
+        for row in weights:
+            picks = rng.choice(assets, size=options['assets_per_strategy'], replace=False)
+            row[picks] = rng.dirichlet(np.ones(len(picks)))
+
+        payouts = np.zeros((steps, assets))
+        month_ends = [i for i in range(steps - 1) if dates[i].month != dates[i + 1].month]
+        payouts[np.ix_(month_ends, np.arange(0, assets, 10))] = 0.005
+
+        inputs = BacktestInputs(dates, prices, weights, payouts)
+        started = time.perf_counter()
+        equity, start = simulate(inputs, rebalance_every=options['rebalance_every'])
+        simulated = time.perf_counter() - started
+        cagr, max_drawdown, volatility = backtest_metrics(dates, equity, start)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{options['strategies']} strategies x {assets} assets x {steps} days: "
+            f"simulate {simulated:.2f} s, total {elapsed:.2f} s"
+        )
+        self.stdout.write(
+            f"median CAGR {np.nanmedian(cagr) * 100:.2f}%, "
+            f"median max drawdown {np.nanmedian(max_drawdown) * 100:.2f}%, "
+            f"median volatility {np.nanmedian(volatility) * 100:.2f}%"
+        )
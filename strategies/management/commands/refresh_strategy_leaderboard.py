@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from strategies.services import refresh_strategy_leaderboard
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the precomputed strategy leaderboard. Also runs after every "
+        "completed snapshot run."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        ranked = refresh_strategy_leaderboard()
+        self.stdout.write(
+            f"Ranked {ranked} strategies in {time.perf_counter() - started:.2f} s"
+        )
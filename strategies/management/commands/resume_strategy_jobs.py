@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from strategies.services import resume_strategy_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Rerun strategy activations and liquidations whose trade jobs were "
+        "lost with a restarted process. Run it after deploys or from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=10,
+            help='Only resume activations queued at least this many minutes ago (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        activated, stopped = resume_strategy_jobs(
+            older_than=timedelta(minutes=options['older_than'])
+        )
+        self.stdout.write(
+            f"Resumed {activated} strategy activations and {stopped} liquidations"
+        )
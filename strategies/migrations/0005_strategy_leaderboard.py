@@ -0,0 +1,33 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('strategies', '0004_portfoliostrategy_remaining_cash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StrategyLeaderboardEntry',
+            fields=[
+                ('strategy', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to='strategies.strategy')),
+                ('asset_types', models.CharField(blank=True, max_length=255)),
+                ('portfolio_count', models.PositiveIntegerField(default=0)),
+                ('average_return', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('median_return', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('return_1d', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('return_7d', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('return_30d', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['-average_return'],
+                'indexes': [models.Index(fields=['average_return'], name='strategies__average_18111b_idx')],
+            },
+        ),
+    ]
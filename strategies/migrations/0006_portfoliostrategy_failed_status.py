@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('strategies', '0005_strategy_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='portfoliostrategy',
+            name='status',
+            field=models.CharField(choices=[('ACTIVE', 'Active'), ('STOPPED', 'Stopped'), ('FAILED', 'Failed')], default='ACTIVE', max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('strategies', '0006_portfoliostrategy_failed_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='strategyholding',
+            name='strategy_allocation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='strategy_holdings', to='strategies.portfoliostrategy'),
+        ),
+        migrations.AddConstraint(
+            model_name='strategyholding',
+            constraint=models.UniqueConstraint(condition=models.Q(('strategy_allocation__isnull', True)), fields=('portfolio', 'asset'), name='one_direct_position_per_asset'),
+        ),
+    ]
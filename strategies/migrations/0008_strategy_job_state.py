@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+def mark_existing_executed(apps, schema_editor):
+    # Everything created so far already ran its activation.
+    PortfolioStrategy = apps.get_model('strategies', 'PortfolioStrategy')
+    PortfolioStrategy.objects.update(executed_at=models.F('activated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('strategies', '0007_direct_positions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfoliostrategy',
+            name='executed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_executed, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='portfoliostrategy',
+            name='status',
+            field=models.CharField(choices=[('ACTIVE', 'Active'), ('STOPPED', 'Stopped'), ('FAILED', 'Failed'), ('STOPPING', 'Stopping')], default='ACTIVE', max_length=10),
+        ),
+    ]
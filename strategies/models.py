@@ -96,6 +96,10 @@ class PortfolioStrategy(models.Model):
     STATUS_CHOICES = (
         ('ACTIVE', 'Active'),
         ('STOPPED', 'Stopped'),
+        # Activation job raised; nothing was bought (see activate_strategy).
+        ('FAILED', 'Failed'),
+        # Liquidation job queued (see stop_strategy_view).
+        ('STOPPING', 'Stopping'),
     )
 
     portfolio = models.ForeignKey(
@@ -135,12 +139,20 @@ class PortfolioStrategy(models.Model):
     )
 
     activated_at = models.DateTimeField(auto_now_add=True)
+    # When execute_strategy bought the allocation; null while the
+    # activation job is still queued (see resume_strategy_jobs).
+    executed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.strategy.name} ({self.allocated_cash})"
 
 
 class StrategyHolding(models.Model):
+    """
+    The part of a Holding owned by one strategy allocation. A slice
+    without an allocation is the portfolio's direct position, bought
+    outside any strategy (e.g. by a limit order).
+    """
     portfolio = models.ForeignKey(
         Portfolio,
         on_delete=models.CASCADE
@@ -149,7 +161,9 @@ class StrategyHolding(models.Model):
     strategy_allocation = models.ForeignKey(
         PortfolioStrategy,
         on_delete=models.CASCADE,
-        related_name='strategy_holdings'
+        related_name='strategy_holdings',
+        null=True,
+        blank=True
     )
 
     holding = models.ForeignKey(
@@ -173,4 +187,44 @@ class StrategyHolding(models.Model):
 
     class Meta:
         unique_together = ('strategy_allocation', 'asset')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['portfolio', 'asset'],
+                condition=models.Q(strategy_allocation__isnull=True),
+                name='one_direct_position_per_asset'
+            ),
+        ]
+
+
+
+class StrategyLeaderboardEntry(models.Model):
+    """
+    Precomputed leaderboard row for one strategy, rebuilt by
+    strategies.services.refresh_strategy_leaderboard after every snapshot
+    run. Returns are percentages over the portfolios running the
+    strategy; windowed ones are null when no portfolio has a snapshot
+    that old.
+    """
+    strategy = models.OneToOneField(
+        Strategy,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='leaderboard_entry'
+    )
+    asset_types = models.CharField(max_length=255, blank=True)
+    portfolio_count = models.PositiveIntegerField(default=0)
+    average_return = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    median_return = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    return_1d = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    return_7d = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    return_30d = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    refreshed_at = models.DateTimeField()
 
+    class Meta:
+        ordering = ['-average_return']
+        indexes = [
+            models.Index(fields=['average_return']),
+        ]
+
+    def __str__(self):
+        return f"{self.strategy_id}: {self.average_return}%"
@@ -0,0 +1,135 @@
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from assets.services import PRICE_FLOOR
+from .models import StrategyAllocation
+
+# Simulated price paths per projection.
+PROJECTION_PATHS = getattr(settings, 'PROJECTION_PATHS', 2000)
+
+# Price ticks (simulate_price_changes runs) per day, to turn a horizon in
+# days into simulated ticks.
+PRICE_TICKS_PER_DAY = getattr(settings, 'PRICE_TICKS_PER_DAY', 1)
+
+PROJECTION_DAYS = 365
+PROJECTION_POINTS = 12
+PROJECTION_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Projections are keyed by day rather than by price version: a tick
+# moves every price, and recomputing every strategy's paths after each one
+# costs about 0.3s a page. Within a day a projection starts from the
+# prices of its first request; the returns are relative, so a drift of a
+# few ticks barely moves them.
+PROJECTION_CACHE_SECONDS = 24 * 3600
+
+
+def simulate_returns(weights, prices, volatilities, checkpoints, paths, rng):
+    """
+    Portfolio returns at each tick count in `checkpoints` (ascending), as a
+    (len(checkpoints), paths) matrix, for buy-and-hold positions of
+    `weights` (fractions of the capital; the rest stays in cash). The
+    last checkpoint is the number of ticks simulated.
+
+    Every tick moves each asset by a uniform percentage in
+    [-volatility, +volatility], rounds to cents and floors at PRICE_FLOOR,
+    as simulate_price_changes does.
+    """
+    start = np.tile(prices, (paths, 1))
+    current = start.copy()
+    returns = np.empty((len(checkpoints), paths))
+    cash = 1.0 - weights.sum()
+    floor = float(PRICE_FLOOR)
+    # Uniform in [-volatility, +volatility] percent, as a growth factor.
+    low = 1.0 - volatilities / 100.0
+    spread = 2 * volatilities / 100.0
+
+    tick = 0
+    for row, checkpoint in enumerate(checkpoints):
+        # Draw the growth factors of every tick up to the next checkpoint
+        # in one call; only the rounding and floor stay per tick.
+        growth = rng.random((checkpoint - tick,) + current.shape)
+        growth *= spread
+        growth += low
+        for factor in growth:
+            np.multiply(current, factor, out=current)
+            np.round(current, 2, out=current)
+            np.maximum(current, floor, out=current)
+        tick = checkpoint
+        returns[row] = (current / start) @ weights + cash - 1.0
+    return returns
+
+
+def _signature(allocations):
+    return tuple(
+        (a.asset_id, str(a.percentage), str(a.asset.volatility)) for a in allocations
+    )
+
+
+def project_allocations(allocations, days=PROJECTION_DAYS, paths=PROJECTION_PATHS):
+    """
+    Monte Carlo projection of a set of StrategyAllocation rows (with
+    their assets) over `days`. Returns {'days', 'points', 'bands',
+    'final'}: `points` are the day offsets sampled, `bands` maps each of
+    PROJECTION_PERCENTILES to the return (%) at every point and `final`
+    to the return at the horizon. Cached per allocation set, horizon and
+    day.
+    """
+    allocations = sorted(allocations, key=lambda a: a.asset_id)
+    signature = _signature(allocations)
+    digest = hashlib.sha256(repr((signature, days, paths)).encode()).hexdigest()
+    key = f"projection:{digest}:{timezone.localdate().isoformat()}"
+
+    projection = cache.get(key)
+    if projection is not None:
+        return projection
+
+    points = sorted({
+        max(1, round(days * i / PROJECTION_POINTS)) for i in range(1, PROJECTION_POINTS + 1)
+    })
+    bands = {percentile: [0.0] * len(points) for percentile in PROJECTION_PERCENTILES}
+    if signature:
+        returns = simulate_returns(
+            weights=np.array([float(a.percentage) / 100 for a in allocations]),
+            prices=np.array([float(a.asset.price) for a in allocations]),
+            volatilities=np.array([float(a.asset.volatility) for a in allocations]),
+            checkpoints=[point * PRICE_TICKS_PER_DAY for point in points],
+            paths=paths,
+            # Seeded by the key, so a projection reads the same until
+            # its inputs change.
+            rng=np.random.default_rng(int(digest[:16], 16)),
+        )
+        percentiles = np.percentile(returns, PROJECTION_PERCENTILES, axis=1) * 100
+        bands = {
+            percentile: [round(value, 2) for value in row.tolist()]
+            for percentile, row in zip(PROJECTION_PERCENTILES, percentiles)
+        }
+
+    projection = {
+        'days': days,
+        'points': points,
+        'bands': bands,
+        'final': {percentile: values[-1] for percentile, values in bands.items()},
+    }
+    cache.set(key, projection, PROJECTION_CACHE_SECONDS)
+    return projection
+
+
+def project_strategies(strategies, days=PROJECTION_DAYS):
+    """
+    {strategy_id: projection} for `strategies`, reading every allocation
+    in one query.
+    """
+    allocations = {strategy.pk: [] for strategy in strategies}
+    for allocation in StrategyAllocation.objects.filter(
+        strategy__in=list(allocations)
+    ).select_related('asset'):
+        allocations[allocation.strategy_id].append(allocation)
+
+    return {
+        strategy_id: project_allocations(rows, days)
+        for strategy_id, rows in allocations.items()
+    }
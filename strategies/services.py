@@ -1,14 +1,25 @@
+import logging
+from datetime import timedelta
 from decimal import Decimal
+from statistics import median
 from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
 
-from .models import PortfolioStrategy, StrategyHolding
-from trading.services import execute_buy
+from assets.models import Asset
+from .models import (
+    PortfolioStrategy, Strategy, StrategyAllocation, StrategyHolding,
+    StrategyLeaderboardEntry
+)
+from trading.services import Order, execute_orders, record_trades
 from portfolios.models import Portfolio, PortfolioSnapshot
 from portfolios.services import unwind_portfolio, unwind_strategy_holdings
 from trading.models import Trade
 from copytrading.utils import is_copy_trading
 
+logger = logging.getLogger(__name__)
+
 def execute_strategy(portfolio, strategy_allocation):
     strategy = strategy_allocation.strategy
     # total_cash = strategy_allocation.allocated_cash
@@ -24,8 +35,10 @@ def execute_strategy(portfolio, strategy_allocation):
         total_cash = strategy_allocation.allocated_cash
 
     if total_cash <= 0:
+        _mark_executed(strategy_allocation)
         return
 
+    orders = []
     for allocation in strategy.allocations.select_related('asset'):
         if allocation.asset.price <= 0:
             continue
@@ -33,27 +46,160 @@ def execute_strategy(portfolio, strategy_allocation):
         target_cash = (allocation.percentage / 100) * total_cash
         quantity = target_cash / allocation.asset.price
 
-        execute_buy(
-            portfolio=portfolio,
+        orders.append(Order(
             asset=allocation.asset,
+            side=Trade.BUY,
             quantity=quantity,
-            strategy_allocation=strategy_allocation,
             note=f"Strategy allocation: {strategy.name}"
-        )
+        ))
+
+    execute_orders(portfolio, orders, strategy_allocation=strategy_allocation)
+    _mark_executed(strategy_allocation)
+
+
+def _mark_executed(strategy_allocation):
+    PortfolioStrategy.objects.filter(pk=strategy_allocation.pk).update(
+        executed_at=timezone.now()
+    )
+
+
+def activate_strategy(portfolio, strategy_allocation):
+    """
+    Trade worker job behind activate_strategy_view. The allocation is
+    claimed by setting executed_at in the same transaction as its trades,
+    so a job resumed by resume_strategy_jobs never buys twice. If
+    execute_strategy raises, its trades have rolled back and the
+    allocation is marked FAILED, so the portfolio page can tell the user
+    instead of showing a strategy that never bought anything.
+    """
+    try:
+        with transaction.atomic():
+            claimed = PortfolioStrategy.objects.filter(
+                pk=strategy_allocation.pk,
+                status='ACTIVE',
+                executed_at__isnull=True
+            ).update(executed_at=timezone.now())
+            if not claimed:
+                return
+            execute_strategy(portfolio, strategy_allocation)
+    except Exception:
+        PortfolioStrategy.objects.filter(
+            pk=strategy_allocation.pk,
+            status='ACTIVE'
+        ).update(status='FAILED')
+        raise
 
 
-def strategy_average_return(strategy):
-    portfolios = Portfolio.objects.filter(
-        portfoliostrategy__strategy=strategy
+# Windows of the leaderboard's recent returns, by model field.
+LEADERBOARD_WINDOWS = {
+    'return_1d': timedelta(days=1),
+    'return_7d': timedelta(days=7),
+    'return_30d': timedelta(days=30),
+}
+
+LEADERBOARD_CHUNK_SIZE = 2000
+
+# Portfolios that started smaller than this are left out of the averages,
+# so tiny accounts cannot swing them.
+LEADERBOARD_MIN_INITIAL_VALUE = Decimal('1000')
+
+
+def _percent_change(start, end):
+    return (end - start) / start * 100
+
+
+def _leaderboard_returns(portfolio_ids, now):
+    """
+    {portfolio_id: {'all_time': %, 'return_1d': % or None, ...}} for
+    eligible portfolios, valued from their materialized totals and
+    snapshots in one query per chunk.
+    """
+    def value_at(cutoff):
+        return Subquery(
+            PortfolioSnapshot.objects.filter(
+                portfolio=OuterRef('pk'),
+                created_at__lte=cutoff
+            ).order_by('-created_at').values('total_value')[:1]
+        )
+
+    first_value = Subquery(
+        PortfolioSnapshot.objects.filter(
+            portfolio=OuterRef('pk')
+        ).order_by('created_at').values('total_value')[:1]
     )
 
-    returns = [
-        p.return_percentage()
-        for p in portfolios
-        if p.initial_value() and p.initial_value() >= 1000
-    ]
+    returns = {}
+    portfolio_ids = sorted(portfolio_ids)
+    for start in range(0, len(portfolio_ids), LEADERBOARD_CHUNK_SIZE):
+        rows = Portfolio.objects.filter(
+            pk__in=portfolio_ids[start:start + LEADERBOARD_CHUNK_SIZE]
+        ).annotate(
+            first_value=first_value,
+            **{field: value_at(now - window) for field, window in LEADERBOARD_WINDOWS.items()}
+        ).values_list(
+            'pk', 'cash_balance', 'holdings_value', 'first_value', *LEADERBOARD_WINDOWS
+        )
+
+        for pk, cash_balance, holdings_value, first, *window_values in rows:
+            initial = first if first is not None else cash_balance
+            if not initial or initial < LEADERBOARD_MIN_INITIAL_VALUE:
+                continue
+            current = cash_balance + holdings_value
+            returns[pk] = {'all_time': _percent_change(initial, current)}
+            for field, value in zip(LEADERBOARD_WINDOWS, window_values):
+                returns[pk][field] = _percent_change(value, current) if value else None
+    return returns
+
+
+def refresh_strategy_leaderboard(now=None):
+    """
+    Rebuild every StrategyLeaderboardEntry: average and median all-time
+    return, average 1d/7d/30d return and asset types per strategy, over
+    the portfolios that ever ran it. Runs a fixed number of queries per
+    chunk of portfolios and swaps the rows in one transaction. Returns
+    the number of strategies ranked.
+    """
+    now = now or timezone.now()
+    cents = Decimal('0.01')
 
-    return sum(returns) / len(returns) if returns else 0
+    members = {}
+    for strategy_id, portfolio_id in PortfolioStrategy.objects.values_list(
+        'strategy_id', 'portfolio_id'
+    ).distinct():
+        members.setdefault(strategy_id, set()).add(portfolio_id)
+    returns = _leaderboard_returns(set().union(*members.values()), now)
+
+    labels = dict(Asset.ASSET_TYPES)
+    asset_types = {}
+    for strategy_id, asset_type in StrategyAllocation.objects.values_list(
+        'strategy_id', 'asset__asset_type'
+    ).distinct():
+        asset_types.setdefault(strategy_id, set()).add(labels.get(asset_type, asset_type))
+
+    entries = []
+    for strategy_id in Strategy.objects.values_list('pk', flat=True):
+        portfolio_returns = [
+            returns[pk] for pk in members.get(strategy_id, ()) if pk in returns
+        ]
+        all_time = [r['all_time'] for r in portfolio_returns]
+        entry = StrategyLeaderboardEntry(
+            strategy_id=strategy_id,
+            asset_types=", ".join(sorted(asset_types.get(strategy_id, ()))),
+            portfolio_count=len(portfolio_returns),
+            average_return=(sum(all_time) / len(all_time)).quantize(cents) if all_time else 0,
+            median_return=median(all_time).quantize(cents) if all_time else 0,
+            refreshed_at=now,
+        )
+        for field in LEADERBOARD_WINDOWS:
+            values = [r[field] for r in portfolio_returns if r[field] is not None]
+            if values:
+                setattr(entry, field, (sum(values) / len(values)).quantize(cents))
+        entries.append(entry)
+
+    with transaction.atomic():
+        StrategyLeaderboardEntry.objects.all().delete()
+        StrategyLeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
 
 
 def switch_strategy(portfolio, new_strategy):
@@ -88,13 +234,13 @@ def switch_strategy(portfolio, new_strategy):
     )
 
     # ✅ Add Trade/Audit log for strategy switch
-    Trade.objects.create(
+    record_trades([Trade(
         portfolio=portfolio,
         trade_type=Trade.SWITCH,
         quantity=0,
         price=portfolio.total_value(),
         note=f"Switched to strategy: {new_strategy.name}"
-    )
+    )])
 
     return portfolio_strategy
 
@@ -106,6 +252,12 @@ def liquidate_strategy(portfolio, strategy_allocation=None):
     """
     with transaction.atomic():
         if strategy_allocation:
+            # Already liquidated by an earlier run of this job.
+            if not PortfolioStrategy.objects.select_for_update().filter(
+                pk=strategy_allocation.pk
+            ).exists():
+                return
+
             # Sell only holdings linked to this strategy allocation
             unwind_strategy_holdings(portfolio, strategy_allocation)
             
@@ -113,7 +265,7 @@ def liquidate_strategy(portfolio, strategy_allocation=None):
             strategy_allocation.delete()
         else:
             # Sell all holdings for all active strategies
-            for ps in portfolio.strategy_allocations.filter(status='ACTIVE'):
+            for ps in portfolio.strategy_allocations.filter(status__in=('ACTIVE', 'STOPPING')):
                 unwind_strategy_holdings(portfolio, ps)
                 ps.delete()
 
@@ -125,6 +277,35 @@ def liquidate_strategy(portfolio, strategy_allocation=None):
         )
 
 
+def resume_strategy_jobs(older_than=timedelta(minutes=10)):
+    """
+    Rerun the activation and liquidation jobs lost with a restarted
+    process (the trade dispatcher's queues live in memory): allocations
+    still waiting to be bought after `older_than`, and every allocation
+    left STOPPING. Both jobs check the allocation's state first, so one
+    still queued elsewhere does no harm. Returns (activated, stopped).
+    """
+    activated = stopped = 0
+    pending = PortfolioStrategy.objects.filter(
+        status='ACTIVE',
+        executed_at__isnull=True,
+        activated_at__lt=timezone.now() - older_than
+    ).select_related('portfolio', 'strategy', 'copy_relationship')
+    for ps in pending:
+        try:
+            activate_strategy(ps.portfolio, ps)
+        except Exception:
+            # Marked FAILED for the user by activate_strategy.
+            logger.exception("Resuming activation of strategy allocation %s failed", ps.pk)
+        else:
+            activated += 1
+
+    for ps in PortfolioStrategy.objects.filter(status='STOPPING').select_related('portfolio'):
+        liquidate_strategy(ps.portfolio, ps)
+        stopped += 1
+    return activated, stopped
+
+
 def calculate_strategy_metrics(strategy_allocation):
     """
     Returns value, cost, pnl, roi for a strategy
@@ -133,12 +314,22 @@ def calculate_strategy_metrics(strategy_allocation):
         strategy_allocation=strategy_allocation
     ).select_related("asset")
 
+    return strategy_metrics_from_holdings(holdings)
+
+
+def strategy_metrics_from_holdings(holdings, prices=None):
+    """
+    calculate_strategy_metrics() for already loaded strategy holdings
+    (with their assets), so many strategies can share one query. With
+    `prices` ({asset_id: price}) the assets are not needed.
+    """
     total_cost = Decimal("0")
     current_value = Decimal("0")
 
     for sh in holdings:
+        price = prices[sh.asset_id] if prices is not None else sh.asset.price
         cost = sh.quantity * sh.average_price
-        value = sh.quantity * sh.asset.price
+        value = sh.quantity * price
 
         total_cost += cost
         current_value += value
@@ -0,0 +1,9 @@
+from django.dispatch import receiver
+
+from portfolios.signals import snapshots_taken
+
+
+@receiver(snapshots_taken)
+def refresh_leaderboard_on_snapshots(sender, run, **kwargs):
+    from .services import refresh_strategy_leaderboard
+    refresh_strategy_leaderboard()
@@ -1,3 +1,274 @@
-from django.test import TestCase
+import statistics
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import User
+from assets.models import Asset
+from portfolios.models import Portfolio, PortfolioSnapshot
+from . import projection
+from .backtest import backtest_metrics
+from .models import (
+    PortfolioStrategy, Strategy, StrategyAllocation, StrategyHolding, StrategyLeaderboardEntry
+)
+from .services import refresh_strategy_leaderboard, resume_strategy_jobs
+
+
+class StrategyJobTests(TestCase):
+    """
+    Activation and liquidation jobs queued in memory are lost with their
+    process; these must be refused when repeated and resumable after.
+    """
+
+    def setUp(self):
+        asset = Asset.objects.create(
+            name="Asset",
+            symbol="JOB0",
+            asset_type='STOCK',
+            price=Decimal('10.00')
+        )
+        self.strategy = Strategy.objects.create(
+            name="All in",
+            risk_level='HIGH',
+            target_return_min=1,
+            target_return_max=5
+        )
+        StrategyAllocation.objects.create(strategy=self.strategy, asset=asset, percentage=Decimal('100'))
+        self.user = User.objects.create_user(email="jobs@example.com", password="x", full_name="Jobs")
+        self.portfolio = self.user.portfolio
+
+    def queued_activation(self):
+        # As left behind by a process that died before running the job.
+        ps = PortfolioStrategy.objects.create(
+            portfolio=self.portfolio,
+            strategy=self.strategy,
+            allocated_cash=Decimal('100'),
+            remaining_cash=Decimal('100')
+        )
+        PortfolioStrategy.objects.filter(pk=ps.pk).update(
+            activated_at=timezone.now() - timedelta(hours=1)
+        )
+        return ps
+
+    def test_lost_activation_is_resumed_once(self):
+        ps = self.queued_activation()
+
+        self.assertEqual(resume_strategy_jobs(), (1, 0))
+        self.assertEqual(resume_strategy_jobs(), (0, 0))
+
+        ps.refresh_from_db()
+        self.assertIsNotNone(ps.executed_at)
+        holding = StrategyHolding.objects.get(strategy_allocation=ps)
+        self.assertEqual(holding.quantity, Decimal('10'))
+
+    def test_recent_activation_is_left_to_its_job(self):
+        PortfolioStrategy.objects.create(
+            portfolio=self.portfolio,
+            strategy=self.strategy,
+            allocated_cash=Decimal('100'),
+            remaining_cash=Decimal('100')
+        )
+        self.assertEqual(resume_strategy_jobs(), (0, 0))
+
+    def test_repeated_stop_is_refused_and_lost_stop_resumed(self):
+        ps = self.queued_activation()
+        resume_strategy_jobs()
+        self.client.force_login(self.user)
+        url = reverse('strategy:stop_strategy', args=[ps.pk])
+
+        # The liquidation jobs queue on commit and are never run here.
+        self.client.get(url)
+        response = self.client.get(url, follow=True)
+        self.assertContains(response, "already stopped")
+        ps.refresh_from_db()
+        self.assertEqual(ps.status, 'STOPPING')
+
+        self.assertEqual(resume_strategy_jobs(), (0, 1))
+        self.assertFalse(PortfolioStrategy.objects.filter(pk=ps.pk).exists())
+        self.assertFalse(StrategyHolding.objects.filter(portfolio=self.portfolio).exists())
+
+
+class ProjectionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="PRJ0",
+            asset_type='STOCK',
+            price=Decimal('10.00'),
+            volatility=Decimal('2.00')
+        )
+        self.strategy = Strategy.objects.create(
+            name="Projected",
+            risk_level='MEDIUM',
+            target_return_min=1,
+            target_return_max=5
+        )
+        StrategyAllocation.objects.create(
+            strategy=self.strategy, asset=self.asset, percentage=Decimal('60')
+        )
+
+    def test_price_ticks_reuse_the_days_projection(self):
+        first = projection.project_strategies([self.strategy])[self.strategy.pk]
+        self.assertEqual(first['points'][-1], projection.PROJECTION_DAYS)
+
+        Asset.objects.filter(pk=self.asset.pk).update(price=Decimal('11.00'))
+        with mock.patch.object(projection, 'simulate_returns') as simulate:
+            again = projection.project_strategies([self.strategy])[self.strategy.pk]
+        simulate.assert_not_called()
+        self.assertEqual(again, first)
+
+    def test_new_day_recomputes(self):
+        projection.project_strategies([self.strategy])
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            with mock.patch.object(projection, 'simulate_returns', wraps=projection.simulate_returns) as simulate:
+                projection.project_strategies([self.strategy])
+        simulate.assert_called_once()
+
+    def test_simulation_runs_to_the_last_checkpoint(self):
+        rng = mock.Mock(wraps=np.random.default_rng(0))
+        returns = projection.simulate_returns(
+            weights=np.array([0.5]),
+            prices=np.array([10.0]),
+            volatilities=np.array([0.0]),
+            checkpoints=[2, 5],
+            paths=3,
+            rng=rng
+        )
+        self.assertEqual(returns.shape, (2, 3))
+        self.assertTrue(np.allclose(returns, 0.0))
+        drawn = sum(call.args[0][0] for call in rng.random.call_args_list)
+        self.assertEqual(drawn, 5)
+
+
+class BacktestMetricsTests(SimpleTestCase):
+
+    def setUp(self):
+        # Four years to the day: years and periods per year are whole.
+        first = date(2020, 1, 1)
+        self.dates = [first + timedelta(days=offset) for offset in (0, 365, 730, 1096, 1461)]
+
+    def test_metrics_match_a_hand_computed_series(self):
+        equity = np.array([
+            # From day 0: +25%, -20%, +10%, then to 146.41 overall.
+            [100.0, 125.0, 100.0, 110.0, 146.41],
+            # From day 1; flat at the capital before.
+            [100.0, 100.0, 80.0, 120.0, 96.0],
+            # Never started.
+            [100.0] * 5,
+        ]).T
+        start = np.array([0, 1, 5])
+
+        cagr, max_drawdown, volatility = backtest_metrics(self.dates, equity, start, capital=100.0)
+
+        # 1.1 ** 4 == 1.4641
+        self.assertAlmostEqual(cagr[0], 0.10)
+        self.assertAlmostEqual(cagr[1], 0.96 ** (365.25 / 1096) - 1)
+        self.assertTrue(np.isnan(cagr[2]))
+
+        # 125 -> 100 and 120 -> 96
+        self.assertAlmostEqual(max_drawdown[0], 0.20)
+        self.assertAlmostEqual(max_drawdown[1], 0.20)
+        self.assertTrue(np.isnan(max_drawdown[2]))
+
+        # One period per year, so no annualising factor.
+        self.assertAlmostEqual(volatility[0], statistics.stdev([0.25, -0.2, 0.1, 146.41 / 110 - 1]))
+        self.assertAlmostEqual(volatility[1], statistics.stdev([-0.2, 0.5, -0.2]))
+        self.assertTrue(np.isnan(volatility[2]))
+
+    def test_single_day_has_no_metrics(self):
+        metrics = backtest_metrics(self.dates[:1], np.array([[100.0]]), np.array([0]), capital=100.0)
+        self.assertTrue(all(np.isnan(values[0]) for values in metrics))
+
+
+class StrategyLeaderboardTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        self.strategy = Strategy.objects.create(
+            name="Ranked",
+            risk_level='MEDIUM',
+            target_return_min=1,
+            target_return_max=5
+        )
+        self.user = User.objects.create_user(email="rank0@example.com", password="x", full_name="Rank")
+
+    def join(self, portfolio, current, history, strategy=None):
+        """
+        Run `strategy` on `portfolio`, now worth `current`, with snapshots
+        of {age: total_value} in place of its opening one.
+        """
+        PortfolioStrategy.objects.create(
+            portfolio=portfolio,
+            strategy=strategy or self.strategy,
+            allocated_cash=Decimal('0'),
+            remaining_cash=Decimal('0')
+        )
+        Portfolio.objects.filter(pk=portfolio.pk).update(
+            cash_balance=Decimal(current), holdings_value=Decimal('0')
+        )
+        portfolio.snapshots.all().delete()
+        for age, value in history.items():
+            snapshot = PortfolioSnapshot.objects.create(
+                portfolio=portfolio, total_value=Decimal(value), cash_balance=Decimal(value)
+            )
+            PortfolioSnapshot.objects.filter(pk=snapshot.pk).update(created_at=self.now - age)
+
+    def test_windows_read_the_last_snapshot_at_or_before_their_cutoff(self):
+        self.join(self.user.portfolio, '1100', {
+            timedelta(days=40): '1000',
+            # Exactly on the 30 day cutoff: counted.
+            timedelta(days=30): '800',
+            timedelta(days=8): '880',
+            # A second short of the 7 day cutoff: too recent.
+            timedelta(days=7) - timedelta(seconds=1): '1250',
+            timedelta(days=1): '1000',
+        })
+        # Started under LEADERBOARD_MIN_INITIAL_VALUE: left out.
+        small = User.objects.create_user(email="rank1@example.com", password="x", full_name="Small")
+        self.join(small.portfolio, '5000', {timedelta(days=40): '500'})
+
+        self.assertEqual(refresh_strategy_leaderboard(now=self.now), 1)
+
+        entry = StrategyLeaderboardEntry.objects.get(strategy=self.strategy)
+        self.assertEqual(entry.portfolio_count, 1)
+        self.assertEqual(entry.average_return, Decimal('10.00'))
+        self.assertEqual(entry.return_1d, Decimal('10.00'))
+        self.assertEqual(entry.return_7d, Decimal('25.00'))
+        self.assertEqual(entry.return_30d, Decimal('37.50'))
+
+    def test_windows_older_than_the_history_are_null(self):
+        self.join(self.user.portfolio, '2200', {timedelta(hours=2): '2000'})
+
+        refresh_strategy_leaderboard(now=self.now)
+
+        entry = StrategyLeaderboardEntry.objects.get(strategy=self.strategy)
+        self.assertEqual(entry.average_return, Decimal('10.00'))
+        self.assertEqual(
+            (entry.return_1d, entry.return_7d, entry.return_30d), (None, None, None)
+        )
+
+    def test_empty_table_is_built_on_first_view_only(self):
+        self.client.force_login(self.user)
+        url = reverse('strategy:strategy_leaderboard')
+
+        with mock.patch(
+            'strategies.views.refresh_strategy_leaderboard', wraps=refresh_strategy_leaderboard
+        ) as refresh:
+            response = self.client.get(url)
+            self.assertContains(response, "Ranked")
+            self.assertEqual(refresh.call_count, 1)
+
+            # Built, even if every strategy on it is now inactive.
+            Strategy.objects.update(is_active=False)
+            response = self.client.get(url)
+            self.assertNotContains(response, "Ranked")
+            self.assertEqual(refresh.call_count, 1)
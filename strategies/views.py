@@ -5,10 +5,14 @@ from django.core.exceptions import ValidationError
 from django.contrib import messages
 
 from portfolios.models import Portfolio, PortfolioSnapshot
-from .models import Strategy, PortfolioStrategy
-from .services import execute_strategy, strategy_average_return, liquidate_strategy
+from .models import Strategy, PortfolioStrategy, StrategyLeaderboardEntry
+from .projection import project_strategies
+from .services import activate_strategy, liquidate_strategy, refresh_strategy_leaderboard
+from trading.dispatcher import dispatch
+from trading.idempotency import idempotent, new_idempotency_key
 
 @login_required
+@idempotent
 def activate_strategy_view(request, strategy_id):
     portfolio = request.user.portfolio
     strategy = get_object_or_404(Strategy, id=strategy_id)
@@ -45,25 +49,31 @@ def activate_strategy_view(request, strategy_id):
             status='ACTIVE'
         )
 
-        # Execute strategy USING allocated cash only
-        execute_strategy(
+        # Execute strategy USING allocated cash only, on the portfolio's
+        # trade worker
+        dispatch(
+            portfolio.pk,
+            activate_strategy,
             portfolio=portfolio,
-            # strategy=strategy,
             strategy_allocation=ps
         )
 
         messages.success(
             request,
-            f"Strategy {strategy.name} activated with ${allocated_cash}."
+            f"Strategy {strategy.name} is being activated with ${allocated_cash}."
         )
         return redirect('account:portfolio')
 
+    projection = project_strategies([strategy])[strategy.pk]
     return render(
         request,
         "account/customer/strategies/activate_strategy.html",
         {
             "strategy": strategy,
-            "portfolio": portfolio
+            "portfolio": portfolio,
+            "idempotency_key": new_idempotency_key(),
+            "projection": projection,
+            "projection_rows": zip(projection['points'], *projection['bands'].values()),
         }
     )
 
@@ -71,7 +81,13 @@ def activate_strategy_view(request, strategy_id):
 
 @login_required
 def strategy_list_view(request):
-    strategies = Strategy.objects.filter(is_active=True)
+    strategies = list(Strategy.objects.filter(is_active=True))
+
+    # Projected one-year return bands, cached per allocation set and
+    # price version (see strategies.projection).
+    projections = project_strategies(strategies)
+    for strategy in strategies:
+        strategy.projection = projections[strategy.pk]
 
     try:
         portfolio = Portfolio.objects.get(user=request.user)
@@ -85,20 +101,17 @@ def strategy_list_view(request):
 
 @login_required
 def strategy_leaderboard(request):
-    strategies = Strategy.objects.filter(is_active=True)
-
-    leaderboard = []
-    for strategy in strategies:
-        leaderboard.append({
-            'strategy': strategy,
-            'avg_return': strategy_average_return(strategy),
-            'asset_types': ", ".join(strategy.asset_types()),
-        })
-
-    leaderboard.sort(
-        key=lambda x: x['avg_return'],
-        reverse=True
-    )
+    # Precomputed after every snapshot run (see
+    # strategies.services.refresh_strategy_leaderboard).
+    entries = StrategyLeaderboardEntry.objects.filter(
+        strategy__is_active=True
+    ).select_related('strategy').order_by('-average_return')
+
+    leaderboard = list(entries)
+    if not leaderboard and not StrategyLeaderboardEntry.objects.exists():
+        # Never built yet on this database.
+        refresh_strategy_leaderboard()
+        leaderboard = list(entries.all())
 
     return render(
         request,
@@ -117,19 +130,26 @@ def stop_strategy_view(request, strategy_allocation_id):
         portfolio=portfolio
     )
 
-    if ps.status != 'ACTIVE':
+    # Claimed before the job is queued, so a repeated click is refused
+    # instead of liquidating twice.
+    stopping = PortfolioStrategy.objects.filter(pk=ps.pk, status='ACTIVE').update(
+        status='STOPPING'
+    )
+    if not stopping:
         messages.info(request, "This strategy is already stopped.")
         return redirect('account:portfolio')
 
     # Liquidate only this strategy
-    liquidate_strategy(
+    dispatch(
+        portfolio.pk,
+        liquidate_strategy,
         portfolio=portfolio,
         strategy_allocation=ps
     )
 
     messages.success(
         request,
-        f"Strategy {ps.strategy.name} stopped and cash returned."
+        f"Strategy {ps.strategy.name} is being stopped and its cash returned."
     )
 
     return redirect('account:portfolio')
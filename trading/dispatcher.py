@@ -0,0 +1,199 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Worker threads. Every portfolio maps to exactly one worker, so its
+# orders run in submission order while different portfolios run
+# concurrently. 0 runs every job inline in the caller, the default on
+# SQLite, which only takes one writer at a time and would answer
+# concurrent workers with "database is locked".
+TRADE_DISPATCHER_WORKERS = getattr(
+    settings,
+    'TRADE_DISPATCHER_WORKERS',
+    0 if settings.DATABASES['default']['ENGINE'].endswith('sqlite3') else 4
+)
+
+# Portfolios whose latency stats are kept, most recently active first;
+# older ones are dropped so a long-lived worker does not grow with the
+# number of portfolios it has ever served.
+TRADE_DISPATCHER_LATENCY_PORTFOLIOS = getattr(
+    settings,
+    'TRADE_DISPATCHER_LATENCY_PORTFOLIOS',
+    1000
+)
+
+
+class TradeDispatcher:
+    """
+    Routes trading jobs to worker threads keyed by portfolio id.
+
+    Jobs are plain callables. Each worker owns a FIFO queue and its own
+    database connection; the trading write path is safe to run from
+    several workers at once (see trading.services.execute_orders).
+
+    Queues live in process memory: per-portfolio ordering only holds
+    within one process, and jobs still queued when it exits are lost.
+    Every job must therefore be safe to rerun from database state:
+    strategy activations and liquidations are picked up again by the
+    resume_strategy_jobs command, and limit orders and price triggers
+    stay OPEN/ACTIVE until filled, so the next full rebuild of the
+    order book (see trading.orderbook) matches them again.
+    """
+
+    def __init__(
+        self,
+        workers=TRADE_DISPATCHER_WORKERS,
+        latency_portfolios=TRADE_DISPATCHER_LATENCY_PORTFOLIOS
+    ):
+        self.workers = workers
+        self.latency_portfolios = latency_portfolios
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        # [jobs, total seconds, max seconds], measured from submission to
+        # completion, over every job and per recently active portfolio.
+        self._latency_all = [0, 0.0, 0.0]
+        self._latency = OrderedDict()
+
+    def start(self):
+        for index, jobs in enumerate(self._queues):
+            thread = threading.Thread(
+                target=self._work,
+                args=(jobs,),
+                name=f"trade-dispatcher-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, wait=True):
+        for jobs in self._queues:
+            jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def submit(self, portfolio_id, fn, *args, **kwargs):
+        """
+        Queue fn(*args, **kwargs) on the worker owning `portfolio_id`.
+        Returns a concurrent.futures.Future for the result.
+        """
+        future = Future()
+        with self._lock:
+            self._submitted += 1
+
+        job = (portfolio_id, fn, args, kwargs, future, time.monotonic())
+        if not self.workers:
+            self._run(job)
+        else:
+            self._queues[portfolio_id % self.workers].put(job)
+        return future
+
+    def _work(self, jobs):
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            close_old_connections()
+            try:
+                self._run(job)
+            finally:
+                close_old_connections()
+
+    def _run(self, job):
+        portfolio_id, fn, args, kwargs, future, submitted_at = job
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            logger.exception("Trade job for portfolio %s failed", portfolio_id)
+            future.set_exception(exc)
+            failed = True
+        else:
+            future.set_result(result)
+            failed = False
+
+        elapsed = time.monotonic() - submitted_at
+        with self._lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            latency = self._latency.pop(portfolio_id, None) or [0, 0.0, 0.0]
+            self._latency[portfolio_id] = latency
+            if len(self._latency) > self.latency_portfolios:
+                self._latency.popitem(last=False)
+            for stats in (self._latency_all, latency):
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+
+    def stats(self):
+        """
+        Queue depth per worker, job counters, throughput since start and
+        latency (seconds from submission to completion), overall and for
+        the most recently active portfolios.
+        """
+        with self._lock:
+            uptime = time.monotonic() - self._started_at
+            finished = self._completed + self._failed
+            return {
+                'workers': self.workers,
+                'queue_depth': sum(jobs.qsize() for jobs in self._queues),
+                'queue_depths': [jobs.qsize() for jobs in self._queues],
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'throughput_per_sec': finished / uptime if uptime else 0.0,
+                'latency_overall': _latency_summary(*self._latency_all),
+                'latency': {
+                    portfolio_id: _latency_summary(*latency)
+                    for portfolio_id, latency in self._latency.items()
+                },
+            }
+
+
+def _latency_summary(jobs, total, worst):
+    return {
+        'jobs': jobs,
+        'avg': total / jobs if jobs else 0.0,
+        'max': worst,
+    }
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = TradeDispatcher().start()
+        return _dispatcher
+
+
+def dispatch(portfolio_id, fn, *args, **kwargs):
+    """
+    Queue a trading job for `portfolio_id` once the current transaction
+    commits, so the job sees everything its caller wrote.
+    """
+    transaction.on_commit(
+        lambda: get_dispatcher().submit(portfolio_id, fn, *args, **kwargs)
+    )
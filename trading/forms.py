@@ -0,0 +1,73 @@
+from datetime import datetime, time, timedelta
+
+from django import forms
+from django.utils import timezone
+
+from .models import Trade
+
+
+class TradeHistoryFilterForm(forms.Form):
+    trade_type = forms.ChoiceField(
+        required=False,
+        choices=[('', 'All types')] + Trade.TRADE_TYPE_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    asset = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Symbol'})
+    )
+    start = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    end = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+
+        if start and end and start > end:
+            raise forms.ValidationError("Start date must be before end date.")
+
+        return cleaned_data
+
+    def criteria(self):
+        """
+        The submitted filters as {'trade_type', 'symbol', 'start', 'end'},
+        with dates as whole local days: `start` inclusive, `end`
+        exclusive. Invalid input filters nothing.
+        """
+        criteria = {'trade_type': None, 'symbol': None, 'start': None, 'end': None}
+        if not self.is_valid():
+            return criteria
+
+        data = self.cleaned_data
+        criteria['trade_type'] = data['trade_type'] or None
+        if data['asset']:
+            criteria['symbol'] = data['asset'].strip().upper()
+        if data['start']:
+            criteria['start'] = timezone.make_aware(datetime.combine(data['start'], time.min))
+        if data['end']:
+            criteria['end'] = timezone.make_aware(
+                datetime.combine(data['end'] + timedelta(days=1), time.min)
+            )
+        return criteria
+
+    def filter(self, trades):
+        """
+        Narrow `trades` to the submitted filters (see criteria).
+        """
+        criteria = self.criteria()
+        if criteria['trade_type']:
+            trades = trades.filter(trade_type=criteria['trade_type'])
+        if criteria['symbol']:
+            trades = trades.filter(asset__symbol=criteria['symbol'])
+        if criteria['start']:
+            trades = trades.filter(timestamp__gte=criteria['start'])
+        if criteria['end']:
+            trades = trades.filter(timestamp__lt=criteria['end'])
+        return trades
@@ -0,0 +1,296 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+# How long a key replays its first outcome. Older keys are purged by the
+# purge_idempotency_keys command.
+IDEMPOTENCY_TTL = getattr(settings, 'IDEMPOTENCY_TTL', timedelta(hours=24))
+
+# Finished outcomes kept in memory per process, least recently used
+# evicted first; the database is the source of truth behind it.
+IDEMPOTENCY_CACHE_SIZE = getattr(settings, 'IDEMPOTENCY_CACHE_SIZE', 10_000)
+
+# How long a repeat waits for the first request to finish before giving
+# up with 409 Conflict.
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_POLL_SECONDS = 0.05
+
+# A running marker older than this is taken to be left behind by a
+# worker that died before recording the outcome, and the next repeat runs
+# the view again. Keep it well above the slowest trade view.
+IDEMPOTENCY_CLAIM_TIMEOUT = getattr(settings, 'IDEMPOTENCY_CLAIM_TIMEOUT', timedelta(minutes=5))
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+IDEMPOTENCY_FIELD = 'idempotency_key'
+
+Outcome = namedtuple(
+    'Outcome',
+    ['request_hash', 'status_code', 'content_type', 'location', 'body', 'expires_at']
+)
+
+
+def new_idempotency_key():
+    """
+    A fresh token for a form; render it as a hidden `idempotency_key`.
+    """
+    return uuid.uuid4().hex
+
+
+class OutcomeCache:
+    """
+    Bounded LRU of finished outcomes with a TTL, plus hit/miss counters.
+    Thread safe.
+    """
+
+    def __init__(self, size=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL):
+        self.size = size
+        self.ttl = ttl.total_seconds()
+        self._outcomes = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            (
+                'requests', 'executed', 'memory_hits', 'db_hits', 'waited',
+                'conflicts', 'mismatches', 'abandoned',
+            ),
+            0
+        )
+
+    def get(self, scope):
+        with self._lock:
+            outcome = self._outcomes.get(scope)
+            if outcome is None:
+                return None
+            if outcome.expires_at < time.monotonic():
+                del self._outcomes[scope]
+                return None
+            self._outcomes.move_to_end(scope)
+            return outcome
+
+    def put(self, scope, outcome):
+        with self._lock:
+            self._outcomes[scope] = outcome._replace(expires_at=time.monotonic() + self.ttl)
+            self._outcomes.move_to_end(scope)
+            while len(self._outcomes) > self.size:
+                self._outcomes.popitem(last=False)
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self):
+        """
+        Counters since start. `hit_rate` is the share of keyed requests
+        answered from a stored outcome instead of running the view.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            counts['cached'] = len(self._outcomes)
+        replayed = counts['memory_hits'] + counts['db_hits']
+        counts['hit_rate'] = replayed / counts['requests'] if counts['requests'] else 0.0
+        return counts
+
+
+_cache = OutcomeCache()
+
+
+def get_outcome_cache():
+    return _cache
+
+
+def _request_hash(request):
+    """
+    Fingerprint of the submitted data, so a key reused for a different
+    request is refused rather than replayed.
+    """
+    fields = sorted(
+        (name, values)
+        for name, values in request.POST.lists()
+        if name not in ('csrfmiddlewaretoken', IDEMPOTENCY_FIELD)
+    )
+    return hashlib.sha256(repr((request.path, fields)).encode()).hexdigest()
+
+
+def _replay(outcome):
+    response = HttpResponse(
+        bytes(outcome.body),
+        status=outcome.status_code,
+        content_type=outcome.content_type or None
+    )
+    if outcome.location:
+        response['Location'] = outcome.location
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _from_record(record):
+    return Outcome(
+        record.request_hash,
+        record.status_code,
+        record.content_type,
+        record.location,
+        record.body,
+        None,
+    )
+
+
+def _mismatch():
+    return HttpResponse(
+        "This idempotency key was already used for a different request.",
+        status=422
+    )
+
+
+def _claim(user, endpoint, key, request_hash):
+    """
+    Insert the running marker for a key, or wait for the request holding
+    it. Returns (None, claimed_at) to go ahead, (outcome, None) to replay
+    a finished one, or (None, None) if it is still running after the
+    wait. A marker older than IDEMPOTENCY_CLAIM_TIMEOUT is taken over.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    waited = False
+    while True:
+        record, created = IdempotencyKey.objects.get_or_create(
+            user=user,
+            endpoint=endpoint,
+            key=key,
+            defaults={'request_hash': request_hash}
+        )
+        if created:
+            return None, record.claimed_at
+        now = timezone.now()
+        if record.created_at < now - IDEMPOTENCY_TTL:
+            # Expired but not purged yet: the key is free again.
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            continue
+        if record.status_code is not None:
+            return _from_record(record), None
+        if record.claimed_at < now - IDEMPOTENCY_CLAIM_TIMEOUT:
+            # Abandoned; the filter on the old claim lets only one repeat
+            # take it over.
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk,
+                status_code__isnull=True,
+                claimed_at=record.claimed_at
+            ).update(claimed_at=now, request_hash=request_hash)
+            if taken:
+                _cache.count('abandoned')
+                return None, now
+            continue
+        if not waited:
+            _cache.count('waited')
+            waited = True
+        if time.monotonic() >= deadline:
+            return None, None
+        time.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+
+def idempotent(view_func):
+    """
+    Run a POST view at most once per (user, endpoint, token). The token
+    comes from an Idempotency-Key header or an `idempotency_key` form
+    field; requests without one run as usual. A repeat gets the first
+    response back without running the view again, waiting for it if the
+    first request is still in flight. Server errors and exceptions free
+    the key so the client can retry, and so does a run that never
+    finished (see IDEMPOTENCY_CLAIM_TIMEOUT).
+    """
+    endpoint = f"{view_func.__module__}.{view_func.__name__}"
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER) or request.POST.get(IDEMPOTENCY_FIELD)
+        if request.method != 'POST' or not key or not request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        if len(key) > 64:
+            return HttpResponse("Idempotency key is too long.", status=400)
+
+        _cache.count('requests')
+        scope = (request.user.pk, endpoint, key)
+        request_hash = _request_hash(request)
+
+        outcome = _cache.get(scope)
+        if outcome is not None:
+            if outcome.request_hash != request_hash:
+                _cache.count('mismatches')
+                return _mismatch()
+            _cache.count('memory_hits')
+            return _replay(outcome)
+
+        outcome, claimed_at = _claim(request.user, endpoint, key, request_hash)
+        if outcome is not None:
+            if outcome.request_hash != request_hash:
+                _cache.count('mismatches')
+                return _mismatch()
+            _cache.count('db_hits')
+            _cache.put(scope, outcome)
+            return _replay(outcome)
+        if claimed_at is None:
+            _cache.count('conflicts')
+            return HttpResponse("This request is still being processed.", status=409)
+
+        running = IdempotencyKey.objects.filter(
+            user=request.user,
+            endpoint=endpoint,
+            key=key,
+            status_code__isnull=True,
+            claimed_at=claimed_at
+        )
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            running.delete()
+            raise
+        _cache.count('executed')
+
+        if response.status_code >= 500 or response.streaming:
+            running.delete()
+            return response
+
+        outcome = Outcome(
+            request_hash,
+            response.status_code,
+            response.get('Content-Type', ''),
+            response.get('Location', ''),
+            response.content,
+            None,
+        )
+        running.update(
+            status_code=outcome.status_code,
+            content_type=outcome.content_type,
+            location=outcome.location,
+            body=outcome.body,
+            completed_at=timezone.now()
+        )
+        _cache.put(scope, outcome)
+        return response
+
+    return _wrapped_view
+
+
+def idempotency_stats():
+    """
+    This process's counters, plus key totals from the database.
+    """
+    stats = _cache.stats()
+    stats['stored_keys'] = IdempotencyKey.objects.count()
+    return stats
+
+
+def purge_idempotency_keys(now=None):
+    """
+    Delete keys older than IDEMPOTENCY_TTL; returns how many went.
+    """
+    cutoff = (now or timezone.now()) - IDEMPOTENCY_TTL
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,92 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assets.models import Asset
+from trading.models import LimitOrder, Trade
+from trading.orderbook import MatchingEngine, open_limit_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rebuilding the limit order book and matching price ticks "
+        "against it. Orders are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--assets', type=int, default=1000)
+        parser.add_argument('--ticks', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email="orderbook-bench@example.invalid",
+                password=None,
+                full_name="Order book benchmark"
+            )
+            assets = Asset.objects.bulk_create([
+                Asset(
+                    name=f"Order book bench {i}",
+                    symbol=f"OBBENCH{i}",
+                    asset_type='STOCK',
+                    price=Decimal('100.00'),
+                    volatility=Decimal('1.50'),
+                )
+                for i in range(options['assets'])
+            ])
+            # Limits spread +/-10% around the price, so a tick crosses a
+            # small slice of the book.
+            LimitOrder.objects.bulk_create(
+                [
+                    LimitOrder(
+                        portfolio=user.portfolio,
+                        asset=rng.choice(assets),
+                        side=side,
+                        quantity=Decimal('1'),
+                        limit_price=Decimal(
+                            rng.randint(9000, 9999) if side == Trade.BUY
+                            else rng.randint(10001, 11000)
+                        ).scaleb(-2),
+                    )
+                    for side in (
+                        rng.choice((Trade.BUY, Trade.SELL))
+                        for _ in range(options['orders'])
+                    )
+                ],
+                batch_size=5000
+            )
+
+            engine = MatchingEngine(open_limit_orders)
+            started = time.perf_counter()
+            loaded = engine.rebuild()
+            rebuild = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        prices = {asset.pk: Decimal('100.00') for asset in assets}
+        matched = 0
+        elapsed = 0.0
+        for _ in range(options['ticks']):
+            for asset_id, price in prices.items():
+                move = Decimal(rng.uniform(0.985, 1.015)).quantize(Decimal('0.0001'))
+                prices[asset_id] = (price * move).quantize(Decimal('0.01'))
+
+            started = time.perf_counter()
+            crossed = engine.match(prices)
+            engine.settle([entry_id for entry_id, _ in crossed])
+            matched += len(crossed)
+            elapsed += time.perf_counter() - started
+
+        self.stdout.write(f"Rebuilt {loaded:,} open orders in {rebuild * 1000:.0f} ms")
+        self.stdout.write(
+            f"{options['ticks']} ticks x {len(prices):,} assets: "
+            f"{elapsed / options['ticks'] * 1000:.2f} ms/tick, "
+            f"{matched:,} orders matched, {len(engine):,} still open"
+        )
@@ -0,0 +1,92 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from assets.models import Asset
+from trading.models import PriceTrigger
+from trading.orderbook import MatchingEngine, active_price_triggers
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rebuilding the stop-loss/take-profit index and matching "
+        "price ticks against it. Triggers are created in a transaction that "
+        "is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--triggers', type=int, default=300000)
+        parser.add_argument('--assets', type=int, default=3000)
+        parser.add_argument('--ticks', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email="trigger-bench@example.invalid",
+                password=None,
+                full_name="Trigger benchmark"
+            )
+            assets = Asset.objects.bulk_create([
+                Asset(
+                    name=f"Trigger bench {i}",
+                    symbol=f"TRBENCH{i}",
+                    asset_type='STOCK',
+                    price=Decimal('100.00'),
+                    volatility=Decimal('1.50'),
+                )
+                for i in range(options['assets'])
+            ], batch_size=1000)
+            # Stops 0-10% below the price, targets 0-10% above, so a tick
+            # crosses a small slice of the index.
+            PriceTrigger.objects.bulk_create(
+                [
+                    PriceTrigger(
+                        portfolio=user.portfolio,
+                        asset=rng.choice(assets),
+                        kind=kind,
+                        trigger_price=Decimal(
+                            rng.randint(9000, 9999) if kind == PriceTrigger.STOP_LOSS
+                            else rng.randint(10001, 11000)
+                        ).scaleb(-2),
+                    )
+                    for kind in (
+                        rng.choice((PriceTrigger.STOP_LOSS, PriceTrigger.TAKE_PROFIT))
+                        for _ in range(options['triggers'])
+                    )
+                ],
+                batch_size=5000
+            )
+
+            index = MatchingEngine(active_price_triggers)
+            started = time.perf_counter()
+            loaded = index.rebuild()
+            rebuild = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        prices = {asset.pk: Decimal('100.00') for asset in assets}
+        fired = 0
+        elapsed = 0.0
+        for _ in range(options['ticks']):
+            for asset_id, price in prices.items():
+                move = Decimal(rng.uniform(0.985, 1.015)).quantize(Decimal('0.0001'))
+                prices[asset_id] = (price * move).quantize(Decimal('0.01'))
+
+            started = time.perf_counter()
+            crossed = index.match(prices)
+            index.settle([entry_id for entry_id, _ in crossed])
+            fired += len(crossed)
+            elapsed += time.perf_counter() - started
+
+        self.stdout.write(f"Rebuilt {loaded:,} active triggers in {rebuild * 1000:.0f} ms")
+        self.stdout.write(
+            f"{options['ticks']} ticks x {len(prices):,} assets: "
+            f"{elapsed / options['ticks'] * 1000:.2f} ms/tick, "
+            f"{fired:,} triggers fired, {len(index):,} still active"
+        )
@@ -0,0 +1,160 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from assets.models import Asset
+from trading.models import Trade
+from trading.services import TRADE_PAGE_SIZE, encode_trade_cursor, trade_page
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark OFFSET against keyset pagination of trade history on a "
+        "large Trade table. Rows are inserted in a transaction that is "
+        "rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000)
+        parser.add_argument('--portfolios', type=int, default=1000)
+        parser.add_argument('--assets', type=int, default=200)
+        parser.add_argument('--depth', type=int, default=None,
+                            help="Rows skipped before the measured page (default: half the table)")
+        parser.add_argument('--explain', action='store_true',
+                            help="Print the query plan of every keyset query")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+
+        with transaction.atomic():
+            User = get_user_model()
+            users = [
+                User.objects.create_user(
+                    email=f"history-bench-{i}@example.invalid",
+                    password=None,
+                    full_name=f"History benchmark {i}"
+                )
+                for i in range(options['portfolios'])
+            ]
+            portfolio_ids = [user.portfolio.pk for user in users]
+            assets = Asset.objects.bulk_create([
+                Asset(
+                    name=f"History bench {i}",
+                    symbol=f"HBENCH{i}",
+                    asset_type='STOCK',
+                    price=Decimal('100.00'),
+                    volatility=Decimal('1.50'),
+                )
+                for i in range(options['assets'])
+            ])
+
+            started = time.perf_counter()
+            self._insert(rng, options['rows'], portfolio_ids, [a.pk for a in assets])
+            self.stdout.write(
+                f"Inserted {options['rows']:,} trades in {time.perf_counter() - started:.1f} s"
+            )
+
+            depth = options['depth']
+            if depth is None:
+                depth = options['rows'] // 2
+            self._compare(
+                "all trades (staff)",
+                Trade.objects.all(), depth, options['explain']
+            )
+            self._compare(
+                "trade type (staff)",
+                Trade.objects.filter(trade_type=Trade.SELL), depth // 2, options['explain']
+            )
+            self._compare(
+                "one asset (staff)",
+                Trade.objects.filter(asset_id=assets[0].pk),
+                depth // options['assets'], options['explain']
+            )
+            self._compare(
+                "one portfolio (customer)",
+                Trade.objects.filter(portfolio_id=portfolio_ids[0]),
+                depth // options['portfolios'], options['explain']
+            )
+            self._compare(
+                "portfolio + type (customer)",
+                Trade.objects.filter(portfolio_id=portfolio_ids[0], trade_type=Trade.BUY),
+                depth // options['portfolios'] // 2, options['explain']
+            )
+            newest = Trade.objects.order_by('-timestamp').values_list('timestamp', flat=True).first()
+            self._compare(
+                "last 7 days (staff)",
+                Trade.objects.filter(timestamp__gte=newest - timedelta(days=7)),
+                depth // 100, options['explain']
+            )
+
+            transaction.set_rollback(True)
+
+    def _insert(self, rng, rows, portfolio_ids, asset_ids):
+        opts = Trade._meta
+        qn = connection.ops.quote_name
+        columns = ['portfolio', 'asset', 'trade_type', 'quantity', 'price', 'total_value', 'note', 'timestamp']
+        sql = "INSERT INTO {table} ({columns}) VALUES ({params})".format(
+            table=qn(opts.db_table),
+            columns=", ".join(qn(opts.get_field(name).column) for name in columns),
+            params=", ".join(["%s"] * len(columns)),
+        )
+
+        # One trade every ~3 seconds going back from now, with ties.
+        start = timezone.now() - timedelta(seconds=3 * rows)
+        price = connection.ops.adapt_decimalfield_value(Decimal('100.00'), 20, 2)
+        quantity = connection.ops.adapt_decimalfield_value(Decimal('1'), 20, 6)
+        trade_types = [Trade.BUY, Trade.BUY, Trade.SELL, Trade.SELL, Trade.DIVIDEND]
+
+        def batch(offset, size):
+            for i in range(offset, offset + size):
+                yield (
+                    rng.choice(portfolio_ids),
+                    rng.choice(asset_ids),
+                    rng.choice(trade_types),
+                    quantity,
+                    price,
+                    price,
+                    '',
+                    connection.ops.adapt_datetimefield_value(
+                        start + timedelta(seconds=3 * i - i % 2)
+                    ),
+                )
+
+        with connection.cursor() as cursor:
+            for offset in range(0, rows, 100_000):
+                cursor.executemany(sql, batch(offset, min(100_000, rows - offset)))
+
+    def _compare(self, label, trades, depth, explain):
+        ordered = trades.order_by('-timestamp', '-pk')
+        anchor = ordered[depth:depth + 1].first() if depth else None
+        if depth and anchor is None:
+            self.stdout.write(f"{label}: fewer than {depth:,} rows, skipped")
+            return
+
+        started = time.perf_counter()
+        list(ordered.select_related('asset')[depth:depth + TRADE_PAGE_SIZE])
+        offset_ms = (time.perf_counter() - started) * 1000
+
+        cursor = encode_trade_cursor(anchor) if anchor else None
+        started = time.perf_counter()
+        trade_page(trades.select_related('asset'), after=cursor)
+        keyset_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(
+            f"{label}, page at depth {depth:,}: "
+            f"OFFSET {offset_ms:.1f} ms, keyset {keyset_ms:.1f} ms"
+        )
+        if explain:
+            with CaptureQueriesContext(connection) as queries:
+                trade_page(trades, after=cursor)
+            with connection.cursor() as db:
+                db.execute(f"{connection.ops.explain_query_prefix()} {queries[-1]['sql']}")
+                for row in db.fetchall():
+                    self.stdout.write(f"    {row[-1]}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from trading.idempotency import IDEMPOTENCY_TTL, purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = f"Delete idempotency keys older than {IDEMPOTENCY_TTL}."
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys()
+        self.stdout.write(f"Purged {deleted} idempotency keys")
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trading.services import first_rebuildable_day, rebuild_asset_volume
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-asset daily volume rollups from the Trade table "
+        "for the last few days, e.g. after a backfill or bulk import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Rebuild today and this many days before it (default: 7). '
+                 'Days with archived trades are skipped.'
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.localdate() - timedelta(days=options['days'])
+        first_day = first_rebuildable_day()
+        if first_day is not None and since < first_day:
+            self.stdout.write(f"Trades before {first_day} are archived; starting there")
+            since = first_day
+        written = rebuild_asset_volume(since)
+        self.stdout.write(f"Rebuilt {written} asset volume rows since {since}")
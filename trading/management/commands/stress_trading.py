@@ -0,0 +1,199 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from assets.models import Asset
+from portfolios.models import Portfolio
+from portfolios.services import reconcile_holdings_values
+from strategies.models import PortfolioStrategy, Strategy, StrategyHolding
+from trading.models import Trade
+from trading.services import execute_buy, execute_sell
+
+STARTING_CASH = Decimal('100000.00')
+ALLOCATED_CASH = Decimal('50000.00')
+MAX_RETRIES = 50
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer execute_buy/execute_sell from several threads against a few "
+        "shared portfolios, then check that cash, strategy budgets and "
+        "positions are conserved. Creates its own data and deletes it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--portfolios', type=int, default=4)
+        parser.add_argument('--assets', type=int, default=5)
+        parser.add_argument(
+            '--trades',
+            type=int,
+            default=200,
+            help='Trades per thread'
+        )
+
+    def handle(self, *args, **options):
+        accounts, assets, strategy = self.seed(options['portfolios'], options['assets'])
+        stats = {'filled': 0, 'rejected': 0, 'retries': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            # Instances are loaded once and go stale on purpose: the write
+            # path must not trust in-memory balances.
+            try:
+                for _ in range(options['trades']):
+                    portfolio, strategy_allocation = rng.choice(accounts)
+                    asset = rng.choice(assets)
+                    trade = execute_buy if rng.random() < 0.6 else execute_sell
+                    quantity = Decimal(rng.randint(1, 10))
+
+                    for attempt in range(MAX_RETRIES):
+                        try:
+                            trade(
+                                portfolio=portfolio,
+                                asset=asset,
+                                quantity=quantity,
+                                strategy_allocation=strategy_allocation,
+                                note="Stress test"
+                            )
+                            outcome = 'filled'
+                            break
+                        except ValueError:
+                            outcome = 'rejected'
+                            break
+                        except OperationalError:
+                            # SQLite allows one writer at a time.
+                            with lock:
+                                stats['retries'] += 1
+                            time.sleep(0.001 * (attempt + 1))
+                    else:
+                        outcome = 'rejected'
+
+                    with lock:
+                        stats[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(i,))
+            for i in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            errors = self.verify(accounts)
+        finally:
+            self.cleanup(accounts, assets, strategy)
+
+        self.stdout.write(
+            f"{stats['filled']} filled, {stats['rejected']} rejected, "
+            f"{stats['retries']} lock retries in {elapsed:.2f} s "
+            f"({stats['filled'] / elapsed:,.0f} trades/sec)"
+        )
+        for error in errors:
+            self.stdout.write(self.style.ERROR(error))
+        if not errors:
+            self.stdout.write(self.style.SUCCESS("Balances and positions conserved"))
+
+    def seed(self, portfolio_count, asset_count):
+        User = get_user_model()
+        assets = [
+            Asset.objects.create(
+                name=f"Stress {i}",
+                symbol=f"STRESS{i}",
+                asset_type='STOCK',
+                price=Decimal('100.00') + i,
+                volatility=Decimal('1.00'),
+            )
+            for i in range(asset_count)
+        ]
+        strategy = Strategy.objects.create(
+            name="Stress test",
+            risk_level='LOW',
+            target_return_min=Decimal('1.00'),
+            target_return_max=Decimal('2.00'),
+        )
+
+        accounts = []
+        for i in range(portfolio_count):
+            user = User.objects.create_user(
+                email=f"stress{i}@example.invalid",
+                password=None,
+                full_name=f"Stress {i}"
+            )
+            portfolio = user.portfolio
+            Portfolio.objects.filter(pk=portfolio.pk).update(cash_balance=STARTING_CASH)
+            portfolio.cash_balance = STARTING_CASH
+            strategy_allocation = PortfolioStrategy.objects.create(
+                portfolio=portfolio,
+                strategy=strategy,
+                allocated_cash=ALLOCATED_CASH,
+                remaining_cash=ALLOCATED_CASH,
+            )
+            accounts.append((portfolio, strategy_allocation))
+
+        return accounts, assets, strategy
+
+    def verify(self, accounts):
+        errors = []
+        for portfolio, strategy_allocation in accounts:
+            bought = sold = Decimal('0')
+            positions = {}
+            for trade_type, asset_id, quantity, total_value in Trade.objects.filter(
+                portfolio=portfolio
+            ).values_list('trade_type', 'asset_id', 'quantity', 'total_value'):
+                sign = 1 if trade_type == Trade.BUY else -1
+                positions[asset_id] = positions.get(asset_id, Decimal('0')) + sign * quantity
+                if trade_type == Trade.BUY:
+                    bought += total_value
+                else:
+                    sold += total_value
+
+            cash = Portfolio.objects.values_list('cash_balance', flat=True).get(pk=portfolio.pk)
+            if cash != STARTING_CASH - bought + sold:
+                errors.append(
+                    f"Portfolio {portfolio.pk}: cash {cash}, expected {STARTING_CASH - bought + sold}"
+                )
+
+            remaining = PortfolioStrategy.objects.values_list(
+                'remaining_cash', flat=True
+            ).get(pk=strategy_allocation.pk)
+            if remaining != ALLOCATED_CASH - bought:
+                errors.append(
+                    f"Strategy {strategy_allocation.pk}: remaining {remaining}, expected {ALLOCATED_CASH - bought}"
+                )
+
+            held = dict(
+                StrategyHolding.objects.filter(portfolio=portfolio)
+                .values_list('asset_id', 'quantity')
+            )
+            for asset_id, quantity in positions.items():
+                if held.get(asset_id, Decimal('0')) != quantity:
+                    errors.append(
+                        f"Portfolio {portfolio.pk}: holds {held.get(asset_id)} of asset {asset_id}, expected {quantity}"
+                    )
+
+        for portfolio_id, stored, actual in reconcile_holdings_values(fix=False):
+            if portfolio_id in {portfolio.pk for portfolio, _ in accounts}:
+                errors.append(
+                    f"Portfolio {portfolio_id}: holdings value {stored}, expected {actual}"
+                )
+        return errors
+
+    def cleanup(self, accounts, assets, strategy):
+        get_user_model().objects.filter(
+            pk__in=[portfolio.user_id for portfolio, _ in accounts]
+        ).delete()
+        Asset.objects.filter(pk__in=[asset.pk for asset in assets]).delete()
+        strategy.delete()
@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_price_candle'),
+        ('portfolios', '0005_snapshot_rollups'),
+        ('strategies', '0004_portfoliostrategy_remaining_cash'),
+        ('trading', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LimitOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('side', models.CharField(choices=[('BUY', 'Buy'), ('SELL', 'Sell')], max_length=4)),
+                ('quantity', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('limit_price', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('status', models.CharField(choices=[('OPEN', 'Open'), ('FILLED', 'Filled'), ('CANCELLED', 'Cancelled'), ('REJECTED', 'Rejected')], default='OPEN', max_length=10)),
+                ('fill_price', models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='limit_orders', to='assets.asset')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='limit_orders', to='portfolios.portfolio')),
+                ('strategy_allocation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='limit_orders', to='strategies.portfoliostrategy')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'asset'], name='trading_lim_status_7e4f78_idx')],
+            },
+        ),
+    ]
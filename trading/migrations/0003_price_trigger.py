@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_price_candle'),
+        ('portfolios', '0005_snapshot_rollups'),
+        ('strategies', '0004_portfoliostrategy_remaining_cash'),
+        ('trading', '0002_limit_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTrigger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('STOP_LOSS', 'Stop-loss'), ('TAKE_PROFIT', 'Take-profit')], max_length=11)),
+                ('trigger_price', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('quantity', models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('FIRED', 'Fired'), ('CANCELLED', 'Cancelled')], default='ACTIVE', max_length=10)),
+                ('fill_price', models.DecimalField(blank=True, decimal_places=2, max_digits=20, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_triggers', to='assets.asset')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_triggers', to='portfolios.portfolio')),
+                ('strategy_allocation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='price_triggers', to='strategies.portfoliostrategy')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'asset'], name='trading_pri_status_b3fcdb_idx')],
+            },
+        ),
+    ]
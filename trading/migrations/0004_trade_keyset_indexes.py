@@ -0,0 +1,39 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_price_alerts'),
+        ('portfolios', '0005_snapshot_rollups'),
+        ('trading', '0003_price_trigger'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='trade',
+            options={'ordering': ['-timestamp', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['portfolio', 'timestamp', 'id'], name='trading_tra_portfol_0f0eba_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['portfolio', 'trade_type', 'timestamp', 'id'], name='trading_tra_portfol_ab54f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['timestamp', 'id'], name='trading_tra_timesta_a86037_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['trade_type', 'timestamp', 'id'], name='trading_tra_trade_t_330448_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['asset', 'timestamp', 'id'], name='trading_tra_asset_i_5564dc_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_price_alerts'),
+        ('trading', '0004_trade_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetDailyVolume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('buy_count', models.PositiveIntegerField(default=0)),
+                ('buy_quantity', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('buy_notional', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('sell_count', models.PositiveIntegerField(default=0)),
+                ('sell_quantity', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('sell_notional', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('rebalance_count', models.PositiveIntegerField(default=0)),
+                ('rebalance_quantity', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('rebalance_notional', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('notional', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_volumes', to='assets.asset')),
+            ],
+            options={
+                'ordering': ['-day', '-notional'],
+                'indexes': [models.Index(fields=['day', 'notional'], name='trading_ass_day_8cbf73_idx')],
+                'unique_together': {('asset', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 09:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0006_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
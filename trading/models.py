@@ -1,10 +1,16 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from decimal import Decimal
 from portfolios.models import Portfolio
 from assets.models import Asset
 
 # trading/models.py
 class Trade(models.Model):
+    """
+    The ledger: one append-only row per buy, sell, dividend, rebalance or
+    strategy switch. Write through trading.services.record_trades.
+    """
     BUY = 'BUY'
     SELL = 'SELL'
     DIVIDEND = 'DIVIDEND'
@@ -29,15 +35,220 @@ class Trade(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-timestamp']
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            # Keyset pagination of trade history (see
+            # trading.services.trade_page): every filter combination the
+            # customer and staff pages offer ends in (timestamp, id).
+            models.Index(fields=['portfolio', 'timestamp', 'id']),
+            models.Index(fields=['portfolio', 'trade_type', 'timestamp', 'id']),
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['trade_type', 'timestamp', 'id']),
+            models.Index(fields=['asset', 'timestamp', 'id']),
+        ]
+
+    @staticmethod
+    def value_of(trade_type, quantity, price):
+        if trade_type == Trade.DIVIDEND:
+            return price  # dividend cash
+        return price * quantity
 
     def save(self, *args, **kwargs):
-        if self.trade_type == Trade.DIVIDEND:
-            self.total_value = self.price  # dividend cash
-        else:
-            self.total_value = self.price * self.quantity
+        if not self._state.adding:
+            raise ValueError("Trades are append-only")
+        self.total_value = Trade.value_of(self.trade_type, self.quantity, self.price)
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.trade_type} {self.asset} {self.total_value}"
 
+
+
+class LimitOrder(models.Model):
+    """
+    A resting order that fills once the asset price crosses `limit_price`:
+    buys at or below it, sells at or above it. Open orders are also held
+    in memory by trading.orderbook.
+    """
+    OPEN = 'OPEN'
+    FILLED = 'FILLED'
+    CANCELLED = 'CANCELLED'
+    REJECTED = 'REJECTED'
+
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (FILLED, 'Filled'),
+        (CANCELLED, 'Cancelled'),
+        (REJECTED, 'Rejected'),
+    ]
+
+    SIDE_CHOICES = [
+        (Trade.BUY, 'Buy'),
+        (Trade.SELL, 'Sell'),
+    ]
+
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='limit_orders')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='limit_orders')
+    strategy_allocation = models.ForeignKey(
+        'strategies.PortfolioStrategy',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='limit_orders'
+    )
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES)
+    quantity = models.DecimalField(max_digits=20, decimal_places=6)
+    limit_price = models.DecimalField(max_digits=20, decimal_places=2)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    fill_price = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # open orders are reloaded into the book on startup
+            models.Index(fields=['status', 'asset']),
+        ]
+
+    def __str__(self):
+        return f"{self.side} {self.quantity} {self.asset} @ {self.limit_price} ({self.status})"
+
+
+class PriceTrigger(models.Model):
+    """
+    A protective sell on a position: a stop-loss fires once the price falls
+    to `trigger_price`, a take-profit once it rises to it. Without a
+    strategy allocation it sells from the whole holding, otherwise only
+    from that strategy's slice; an empty `quantity` sells the entire
+    position. Active triggers are also indexed in memory by
+    trading.orderbook.
+    """
+    STOP_LOSS = 'STOP_LOSS'
+    TAKE_PROFIT = 'TAKE_PROFIT'
+
+    KIND_CHOICES = [
+        (STOP_LOSS, 'Stop-loss'),
+        (TAKE_PROFIT, 'Take-profit'),
+    ]
+
+    ACTIVE = 'ACTIVE'
+    FIRED = 'FIRED'
+    CANCELLED = 'CANCELLED'
+
+    STATUS_CHOICES = [
+        (ACTIVE, 'Active'),
+        (FIRED, 'Fired'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='price_triggers')
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='price_triggers')
+    strategy_allocation = models.ForeignKey(
+        'strategies.PortfolioStrategy',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='price_triggers'
+    )
+    kind = models.CharField(max_length=11, choices=KIND_CHOICES)
+    trigger_price = models.DecimalField(max_digits=20, decimal_places=2)
+    quantity = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=ACTIVE)
+    fill_price = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # active triggers are reloaded into the index on startup
+            models.Index(fields=['status', 'asset']),
+        ]
+
+    def crossed_by(self, price):
+        if self.kind == PriceTrigger.STOP_LOSS:
+            return price <= self.trigger_price
+        return price >= self.trigger_price
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.asset} @ {self.trigger_price} ({self.status})"
+
+
+class AssetDailyVolume(models.Model):
+    """
+    Buy, sell and rebalance flow of one asset over one local day, kept
+    current by trading.services.record_trades as trades are written.
+    """
+    FLOWS = {
+        'BUY': 'buy',
+        'SELL': 'sell',
+        'REBALANCE': 'rebalance',
+    }
+
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE, related_name='daily_volumes')
+    day = models.DateField()
+    buy_count = models.PositiveIntegerField(default=0)
+    buy_quantity = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    buy_notional = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    sell_count = models.PositiveIntegerField(default=0)
+    sell_quantity = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    sell_notional = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    rebalance_count = models.PositiveIntegerField(default=0)
+    rebalance_quantity = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    rebalance_notional = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    # buy + sell + rebalance notional, for ranking the day's assets
+    notional = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-day', '-notional']
+        unique_together = ('asset', 'day')
+        indexes = [
+            models.Index(fields=['day', 'notional']),
+        ]
+
+    @property
+    def trade_count(self):
+        return self.buy_count + self.sell_count + self.rebalance_count
+
+    @property
+    def net_flow(self):
+        return self.buy_notional - self.sell_notional
+
+    def __str__(self):
+        return f"{self.asset_id} on {self.day}: {self.notional}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The outcome of one POST to a trade-triggering view, keyed on user,
+    endpoint and the client's idempotency token, so a repeat of the same
+    request replays it instead of trading again (see trading.idempotency).
+    `status_code` stays null while the first request is still running;
+    `claimed_at` is when that run started, so a marker left behind by a
+    dead worker can be told apart and taken over.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys'
+    )
+    endpoint = models.CharField(max_length=100)
+    key = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=500, blank=True)
+    body = models.BinaryField(blank=True, default=b'')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('user', 'endpoint', 'key')
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key} ({self.status_code or 'running'})"
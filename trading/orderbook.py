@@ -0,0 +1,233 @@
+import heapq
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+# How often a MatchingEngine reloads every entry from the database, which
+# also drops entries cancelled or filled by other processes. New entries
+# are picked up on every tick (see MatchingEngine.refresh).
+ORDERBOOK_REBUILD_SECONDS = getattr(settings, 'ORDERBOOK_REBUILD_SECONDS', 300)
+
+
+class OrderBook:
+    """
+    Price-triggered entries (limit orders, stops) for one asset.
+
+    Entries fire either once the price falls to their level (`below`,
+    e.g. a limit buy or a stop-loss) or rises to it (a limit sell or a
+    take-profit). Each side is a heap of price levels with a FIFO queue of
+    ids per level: below-entries keyed by -price (highest first), the rest
+    by price (lowest first). A tick only pops levels its price crossed, so
+    matching costs O(crossed entries + log levels) however many entries
+    are resting. Cancelled entries are dropped lazily when their level is
+    reached.
+    """
+
+    def __init__(self):
+        self._below_levels = []
+        self._above_levels = []
+        self._below = {}
+        self._above = {}
+
+    def add(self, entry_id, below, price):
+        if below:
+            heap, levels, key = self._below_levels, self._below, -price
+        else:
+            heap, levels, key = self._above_levels, self._above, price
+
+        level = levels.get(key)
+        if level is None:
+            level = levels[key] = deque()
+            heapq.heappush(heap, key)
+        level.append(entry_id)
+
+    def match(self, price, live):
+        """
+        Pop every entry `price` crossed, in price-time order, as
+        (entry_id, below, level price). Ids missing from `live` (cancelled
+        or already fired) are skipped.
+        """
+        crossed = []
+        for heap, levels, below, crossed_at in (
+            (self._below_levels, self._below, True, lambda key: -key >= price),
+            (self._above_levels, self._above, False, lambda key: key <= price),
+        ):
+            while heap and crossed_at(heap[0]):
+                key = heapq.heappop(heap)
+                level_price = -key if below else key
+                crossed.extend(
+                    (entry_id, below, level_price) for entry_id in levels.pop(key)
+                    if entry_id in live
+                )
+        return crossed
+
+    def __len__(self):
+        return (
+            sum(len(level) for level in self._below.values())
+            + sum(len(level) for level in self._above.values())
+        )
+
+
+class MatchingEngine:
+    """
+    One OrderBook per asset plus the live entries ({entry_id: portfolio_id}).
+    Thread safe; `rebuild` reloads every entry yielded by `load(after_id)`,
+    as (entry_id, asset_id, portfolio_id, below, price) in time order.
+
+    The database stays the source of truth. Each process keeps its own
+    engine, so `refresh` runs before every match to pick up entries
+    placed through other processes, and the fill jobs re-check each
+    entry's status under a row lock, which makes a duplicate or stale
+    match harmless.
+    """
+
+    def __init__(self, load, rebuild_every=ORDERBOOK_REBUILD_SECONDS):
+        self._load = load
+        self.rebuild_every = rebuild_every
+        self._books = {}
+        self._live = {}
+        # Matched entries not yet confirmed by `settle`:
+        # {entry_id: (asset_id, portfolio_id, below, price)}.
+        self._unsettled = {}
+        self._watermark = 0
+        self._rebuilt_at = None
+        self._lock = threading.Lock()
+
+    def _add(self, entry_id, asset_id, portfolio_id, below, price):
+        # The first add may follow a rebuild that already loaded it.
+        if entry_id in self._live:
+            return
+        self._live[entry_id] = portfolio_id
+        book = self._books.get(asset_id)
+        if book is None:
+            book = self._books[asset_id] = OrderBook()
+        book.add(entry_id, below, price)
+
+    def add(self, entry_id, asset_id, portfolio_id, below, price):
+        with self._lock:
+            self._add(entry_id, asset_id, portfolio_id, below, price)
+
+    def cancel(self, entry_id):
+        with self._lock:
+            self._live.pop(entry_id, None)
+            self._unsettled.pop(entry_id, None)
+
+    def match(self, prices):
+        """
+        Entries crossed by new prices ({asset_id: price}), as a list of
+        (entry_id, portfolio_id). Matched entries leave the book but stay
+        unsettled until `settle` confirms them once the tick commits; the
+        next match first puts back whatever a rolled back tick left
+        unsettled.
+        """
+        matched = []
+        with self._lock:
+            for entry_id, entry in self._unsettled.items():
+                self._add(entry_id, *entry)
+            self._unsettled = {}
+
+            for asset_id, price in prices.items():
+                book = self._books.get(asset_id)
+                if book is None:
+                    continue
+                for entry_id, below, level_price in book.match(price, self._live):
+                    portfolio_id = self._live.pop(entry_id)
+                    self._unsettled[entry_id] = (asset_id, portfolio_id, below, level_price)
+                    matched.append((entry_id, portfolio_id))
+        return matched
+
+    def settle(self, entry_ids):
+        """
+        Confirm matched entries whose fills were queued.
+        """
+        with self._lock:
+            for entry_id in entry_ids:
+                self._unsettled.pop(entry_id, None)
+
+    def refresh(self):
+        """
+        Catch up with the database: a full rebuild every `rebuild_every`
+        seconds, otherwise one query for entries newer than any loaded.
+        """
+        if self._rebuilt_at is None or time.monotonic() - self._rebuilt_at >= self.rebuild_every:
+            return self.rebuild()
+
+        rows = list(self._load(self._watermark))
+        with self._lock:
+            for row in rows:
+                self._add(*row)
+                self._watermark = max(self._watermark, row[0])
+        return len(rows)
+
+    def rebuild(self):
+        books = {}
+        live = {}
+        watermark = 0
+        for entry_id, asset_id, portfolio_id, below, price in self._load():
+            book = books.get(asset_id)
+            if book is None:
+                book = books[asset_id] = OrderBook()
+            book.add(entry_id, below, price)
+            live[entry_id] = portfolio_id
+            watermark = max(watermark, entry_id)
+
+        with self._lock:
+            self._books = books
+            self._live = live
+            self._unsettled = {}
+            self._watermark = watermark
+            self._rebuilt_at = time.monotonic()
+        return len(live)
+
+    def __len__(self):
+        return len(self._live)
+
+
+def open_limit_orders(after_id=0):
+    from .models import LimitOrder, Trade
+
+    rows = LimitOrder.objects.filter(status=LimitOrder.OPEN, pk__gt=after_id).order_by(
+        'created_at', 'pk'
+    ).values_list('pk', 'asset_id', 'portfolio_id', 'side', 'limit_price')
+    for order_id, asset_id, portfolio_id, side, limit_price in rows.iterator(chunk_size=5000):
+        yield order_id, asset_id, portfolio_id, side == Trade.BUY, limit_price
+
+
+def active_price_triggers(after_id=0):
+    from .models import PriceTrigger
+
+    rows = PriceTrigger.objects.filter(status=PriceTrigger.ACTIVE, pk__gt=after_id).order_by(
+        'created_at', 'pk'
+    ).values_list('pk', 'asset_id', 'portfolio_id', 'kind', 'trigger_price')
+    for trigger_id, asset_id, portfolio_id, kind, trigger_price in rows.iterator(chunk_size=5000):
+        yield trigger_id, asset_id, portfolio_id, kind == PriceTrigger.STOP_LOSS, trigger_price
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _get(name, load):
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            engine = MatchingEngine(load)
+            engine.rebuild()
+            _engines[name] = engine
+        return engine
+
+
+def get_engine():
+    """
+    The process-wide limit order book, rebuilt from the database on first use.
+    """
+    return _get('limit_orders', open_limit_orders)
+
+
+def get_trigger_index():
+    """
+    The process-wide stop-loss/take-profit index, rebuilt on first use.
+    """
+    return _get('price_triggers', active_price_triggers)
@@ -1,7 +1,17 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from django.db import transaction
-from portfolios.models import Holding
-from .models import Trade
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from portfolios.models import ArchiveSegment, Holding, move_balance
+from .dispatcher import dispatch
+from .models import AssetDailyVolume, LimitOrder, PriceTrigger, Trade
+from .orderbook import get_engine, get_trigger_index
+from .signals import trades_recorded
 # from copytrading.services import mirror_trade
 from strategies.models import StrategyHolding
 
@@ -85,6 +95,150 @@ from strategies.models import StrategyHolding
 #             note=note,
 #         )
 
+Order = namedtuple("Order", ["asset", "side", "quantity", "note"], defaults=[""])
+
+
+def record_trades(trades):
+    """
+    Append unsaved Trade instances to the ledger with one bulk insert and
+    announce them with trades_recorded once the transaction commits.
+    Every write path in the app goes through here; total_value is derived
+    in the same pass instead of per row in Trade.save().
+    """
+    for trade in trades:
+        trade.total_value = Trade.value_of(trade.trade_type, trade.quantity, trade.price)
+    trades = Trade.objects.bulk_create(trades, batch_size=1000)
+    if trades:
+        update_asset_volume(trades)
+        transaction.on_commit(lambda: trades_recorded.send(sender=Trade, trades=trades))
+    return trades
+
+
+_VOLUME_COLUMNS = [
+    f"{flow}_{measure}"
+    for flow in AssetDailyVolume.FLOWS.values()
+    for measure in ("count", "quantity", "notional")
+] + ["notional"]
+
+
+def _volume_deltas(rows):
+    """
+    {(asset_id, day): {column: delta}} from (asset_id, day, trade_type,
+    count, quantity, notional) rows; trade types without a flow are skipped.
+    """
+    deltas = {}
+    for asset_id, day, trade_type, count, quantity, notional in rows:
+        flow = AssetDailyVolume.FLOWS.get(trade_type)
+        if flow is None or asset_id is None:
+            continue
+        delta = deltas.setdefault((asset_id, day), dict.fromkeys(_VOLUME_COLUMNS, 0))
+        delta[f"{flow}_count"] += count
+        delta[f"{flow}_quantity"] += quantity
+        delta[f"{flow}_notional"] += notional
+        delta["notional"] += notional
+    return deltas
+
+
+def update_asset_volume(trades):
+    """
+    Fold saved trades into their AssetDailyVolume rows: missing rows are
+    inserted empty, then every row is bumped with one relative UPDATE,
+    so concurrent writers add up instead of overwriting each other.
+    """
+    deltas = _volume_deltas(
+        (trade.asset_id, timezone.localdate(trade.timestamp), trade.trade_type,
+         1, trade.quantity, trade.total_value)
+        for trade in trades
+    )
+    if not deltas:
+        return
+
+    AssetDailyVolume.objects.bulk_create(
+        [AssetDailyVolume(asset_id=asset_id, day=day) for asset_id, day in deltas],
+        ignore_conflicts=True
+    )
+
+    opts = AssetDailyVolume._meta
+    qn = connection.ops.quote_name
+    sql = "UPDATE {table} SET {columns} WHERE {asset} = %s AND {day} = %s".format(
+        table=qn(opts.db_table),
+        columns=", ".join(
+            "{0} = {0} + %s".format(qn(opts.get_field(name).column)) for name in _VOLUME_COLUMNS
+        ),
+        asset=qn(opts.get_field("asset").column),
+        day=qn(opts.get_field("day").column),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [delta[name] for name in _VOLUME_COLUMNS]
+            + [asset_id, connection.ops.adapt_datefield_value(day)]
+            for (asset_id, day), delta in deltas.items()
+        ])
+
+
+def first_rebuildable_day():
+    """
+    The first day whose trades are all still in the Trade table, i.e. the
+    day after the newest archived trade (see portfolios.archive), or None
+    if nothing has been archived.
+    """
+    archived_until = (
+        ArchiveSegment.objects.filter(kind=ArchiveSegment.TRADES)
+        .order_by('-end_at')
+        .values_list('end_at', flat=True)
+        .first()
+    )
+    if archived_until is None:
+        return None
+    return timezone.localdate(archived_until) + timedelta(days=1)
+
+
+def rebuild_asset_volume(since):
+    """
+    Compaction job: recompute AssetDailyVolume from the Trade table for
+    every day from `since` on, replacing whatever is there. Archived
+    trades are gone from the Trade table, so a `since` before
+    first_rebuildable_day() raises ValueError instead of zeroing those
+    days. Returns the number of rows written.
+    """
+    first_day = first_rebuildable_day()
+    if first_day is not None and since < first_day:
+        raise ValueError(
+            f"Trades before {first_day} are archived; their volume cannot be rebuilt"
+        )
+
+    start = timezone.make_aware(datetime.combine(since, time.min))
+    rows = (
+        Trade.objects.filter(timestamp__gte=start, trade_type__in=AssetDailyVolume.FLOWS)
+        .annotate(day=TruncDate("timestamp"))
+        .values_list("asset_id", "day", "trade_type")
+        .annotate(count=Count("pk"), quantity=Sum("quantity"), notional=Sum("total_value"))
+        .order_by()
+    )
+    volumes = [
+        AssetDailyVolume(asset_id=asset_id, day=day, **delta)
+        for (asset_id, day), delta in _volume_deltas(rows).items()
+    ]
+    with transaction.atomic():
+        AssetDailyVolume.objects.filter(day__gte=since).delete()
+        AssetDailyVolume.objects.bulk_create(volumes, batch_size=1000)
+    return len(volumes)
+
+
+def asset_volume_panel(day=None, limit=10):
+    """
+    The `limit` most traded assets of `day` (default today) by notional,
+    read off the (day, notional) index; the cost does not grow with the
+    number of trades.
+    """
+    day = day or timezone.localdate()
+    return list(
+        AssetDailyVolume.objects.filter(day=day)
+        .select_related("asset")
+        .order_by("-notional")[:limit]
+    )
+
+
 def execute_buy(
     portfolio,
     asset,
@@ -92,149 +246,727 @@ def execute_buy(
     strategy_allocation=None,
     note=""
 ):
-    price = asset.price
-    if price is None or price <= 0 or quantity <= 0:
-        return
+    execute_orders(
+        portfolio,
+        [Order(asset, Trade.BUY, quantity, note)],
+        strategy_allocation=strategy_allocation
+    )
 
-    cost = quantity * price
 
-    # Safety: ensure we never spend more than available cash
-    if cost > portfolio.cash_balance:
-        raise ValueError(
-            f"Cannot execute trade: portfolio balance {portfolio.cash_balance} is less than cost {cost}"
-        )
+def execute_sell(
+    portfolio,
+    asset,
+    quantity,
+    strategy_allocation=None,
+    note=""
+):
+    execute_orders(
+        portfolio,
+        [Order(asset, Trade.SELL, quantity, note)],
+        strategy_allocation=strategy_allocation
+    )
 
-    # Check against portfolio cash
-    if portfolio.cash_balance < cost:
-        return
+    # Mirror to followers if needed
+    # mirror_trade(leader_portfolio=portfolio, asset=asset, trade_type=Trade.SELL, quantity=quantity)
 
-    # Check against strategy allocation cash, if provided
-    if strategy_allocation:
-        if cost > strategy_allocation.remaining_cash:
-            return
 
-        # Only check copy_relationship if it exists
-        if getattr(strategy_allocation, "copy_relationship", None):
-            cr = strategy_allocation.copy_relationship
-            if cr and cost > cr.remaining_cash:
-                return
+QUANTITY_STEP = Decimal("0.0001")
+
+
+def _locked_value(instance, field):
+    """
+    Current value of `field`, read with SELECT ... FOR UPDATE where the
+    backend supports it (a plain read elsewhere).
+    """
+    return type(instance).objects.select_for_update().filter(
+        pk=instance.pk
+    ).values_list(field, flat=True).get()
+
+
+def _slice_update_sql(assignments, guard=""):
+    opts = StrategyHolding._meta
+    qn = connection.ops.quote_name
+    quantity = qn(opts.get_field("quantity").column)
+    average_price = qn(opts.get_field("average_price").column)
+    return "UPDATE {table} SET {assignments} WHERE {pk} = %s{guard}".format(
+        table=qn(opts.db_table),
+        assignments=assignments.format(quantity=quantity, average_price=average_price),
+        pk=qn(opts.pk.column),
+        guard=guard.format(quantity=quantity),
+    )
+
+
+def execute_orders(portfolio, orders, strategy_allocation=None):
+    """
+    Fill many BUY/SELL orders for one portfolio in a single transaction.
+
+    With a strategy allocation, buys that no longer fit its remaining cash
+    (or the copy relationship's) are skipped, and sells only draw on that
+    allocation's slices; without one, buys go to the portfolio's direct
+    position and sells draw on every slice of the asset.
+
+    Balances and positions are never written back from Python. Each is
+    changed by a relative UPDATE guarded in its WHERE clause (cash >= cost,
+    quantity >= sold), and rows are locked up front on backends that
+    support SELECT ... FOR UPDATE. Trades on different portfolios run in
+    parallel, trades on one portfolio serialize, and a failed guard rolls
+    the whole batch back with ValueError.
+
+    Returns the created trades.
+    """
+    fills = [
+        order for order in orders
+        if order.asset.price is not None
+        and order.asset.price > 0
+        and order.quantity > 0
+    ]
+    if not fills:
+        return []
+
+    asset_ids = {order.asset.pk for order in fills}
 
     with transaction.atomic():
-        portfolio.cash_balance -= cost
-        portfolio.save(update_fields=["cash_balance"])
-
+        # Lock in a fixed order (portfolio, allocation, copy relationship)
+        # and budget against fresh values, not the caller's instances.
+        cash = _locked_value(portfolio, "cash_balance")
+        copy_relationship = None
+        budget = copy_budget = None
         if strategy_allocation:
-            strategy_allocation.remaining_cash -= cost
-            strategy_allocation.save(update_fields=["remaining_cash"])
-
-            # Deduct from copy_relationship if it exists
-            if getattr(strategy_allocation, "copy_relationship", None):
-                cr = strategy_allocation.copy_relationship
-                if cr:
-                    cr.remaining_cash -= cost
-                    cr.save(update_fields=["remaining_cash"])
+            budget = _locked_value(strategy_allocation, "remaining_cash")
+            copy_relationship = getattr(strategy_allocation, "copy_relationship", None)
+            if copy_relationship:
+                copy_budget = _locked_value(copy_relationship, "remaining_cash")
+
+        buys = []
+        for order in fills:
+            if order.side != Trade.BUY:
+                continue
+            cost = order.quantity * order.asset.price
+            if budget is not None:
+                if cost > budget:
+                    continue
+                if copy_budget is not None and cost > copy_budget:
+                    continue
+                budget -= cost
+                if copy_budget is not None:
+                    copy_budget -= cost
+            buys.append(order)
+
+        buy_cost = sum(order.quantity * order.asset.price for order in buys)
+        # Safety: ensure we never spend more than available cash
+        if buy_cost > cash:
+            raise ValueError(
+                f"Cannot execute trade: portfolio balance {cash} is less than cost {buy_cost}"
+            )
 
-        holding, _ = Holding.objects.get_or_create(
-            portfolio=portfolio,
-            asset=asset,
-            defaults={
-                "quantity": Decimal("0"),
-                "average_price": price,
-            }
+        # Make sure every bought asset has a holding (and slice) row, so
+        # all position changes below are relative updates.
+        Holding.objects.bulk_create(
+            [
+                Holding(
+                    portfolio=portfolio,
+                    asset=order.asset,
+                    quantity=Decimal("0"),
+                    average_price=order.asset.price
+                )
+                for order in buys
+            ],
+            ignore_conflicts=True
         )
-
-        if strategy_allocation:
-            sh, _ = StrategyHolding.objects.get_or_create(
+        holding_ids = dict(
+            Holding.objects.filter(
                 portfolio=portfolio,
-                strategy_allocation=strategy_allocation,
-                asset=asset,
-                holding=holding,
-                defaults={
-                    "quantity": Decimal("0"),
-                    "average_price": price,
-                }
+                asset_id__in=asset_ids
+            ).values_list("asset_id", "pk")
+        )
+        # Buys land in the allocation's slice, or in the direct position
+        # (the slice without an allocation) when there is none.
+        if buys:
+            StrategyHolding.objects.bulk_create(
+                [
+                    StrategyHolding(
+                        portfolio=portfolio,
+                        strategy_allocation=strategy_allocation,
+                        asset=order.asset,
+                        holding_id=holding_ids[order.asset.pk],
+                        quantity=Decimal("0"),
+                        average_price=order.asset.price
+                    )
+                    for order in buys
+                ],
+                ignore_conflicts=True
             )
 
-            total_cost = (sh.quantity * sh.average_price) + cost
-            sh.quantity += quantity
-            sh.average_price = total_cost / sh.quantity
-            sh.save(update_fields=["quantity", "average_price"])
-
-        holding.quantity = holding.total_quantity
-        holding.save(update_fields=["quantity"])
-
-        Trade.objects.create(
+        slices = {}
+        for sh in StrategyHolding.objects.select_for_update().filter(
             portfolio=portfolio,
-            asset=asset,
-            trade_type=Trade.BUY,
-            quantity=quantity,
-            price=price,
-            note=note,
-        )
-
+            asset_id__in=asset_ids
+        ).order_by("pk"):
+            slices.setdefault(sh.asset_id, []).append(sh)
+
+        bought = {}
+        sold = {}
+        sold_asset_ids = set()
+        trades = []
+        cash_delta = Decimal("0")
+        value_delta = Decimal("0")
+        buy_ids = {id(order) for order in buys}
+
+        for order in fills:
+            asset = order.asset
+            price = asset.price
+            quantity = order.quantity
+            asset_slices = slices.get(asset.pk, [])
+
+            if order.side == Trade.BUY:
+                if id(order) not in buy_ids:
+                    continue
+                cost = quantity * price
+                allocation_id = strategy_allocation.pk if strategy_allocation else None
+                sh = next(
+                    s for s in asset_slices
+                    if s.strategy_allocation_id == allocation_id
+                )
+                step = Decimal(quantity).quantize(QUANTITY_STEP)
+                sh.quantity += step
+                added_quantity, added_cost = bought.get(sh.pk, (Decimal("0"), Decimal("0")))
+                bought[sh.pk] = (added_quantity + step, added_cost + cost)
+
+                # Market value added, at the precision the slice is stored with
+                value_delta += step * price
+                cash_delta -= cost
 
+            else:
+                sources = [
+                    sh for sh in asset_slices
+                    if sh.quantity > 0 and (
+                        strategy_allocation is None
+                        or sh.strategy_allocation_id == strategy_allocation.pk
+                    )
+                ]
+                quantity = min(quantity, sum(sh.quantity for sh in sources))
+                if quantity <= 0:
+                    continue
+
+                remaining = quantity
+                for sh in sources:
+                    taken = min(sh.quantity, remaining)
+                    sh.quantity -= taken
+                    sold[sh.pk] = sold.get(sh.pk, Decimal("0")) + taken
+                    remaining -= taken
+                    if remaining <= 0:
+                        break
+
+                proceeds = quantity * price
+                cash_delta += proceeds
+                value_delta -= proceeds
+                sold_asset_ids.add(asset.pk)
+
+            trades.append(Trade(
+                portfolio=portfolio,
+                asset=asset,
+                trade_type=order.side,
+                quantity=quantity,
+                price=price,
+                note=order.note,
+            ))
+
+        if not trades:
+            return []
+
+        with connection.cursor() as cursor:
+            if bought:
+                cursor.executemany(
+                    _slice_update_sql(
+                        "{quantity} = {quantity} + %s, "
+                        "{average_price} = ({quantity} * {average_price} + %s) / ({quantity} + %s)"
+                    ),
+                    [
+                        (added_quantity, added_cost, added_quantity, pk)
+                        for pk, (added_quantity, added_cost) in bought.items()
+                    ]
+                )
+            if sold:
+                cursor.executemany(
+                    _slice_update_sql(
+                        "{quantity} = {quantity} - %s",
+                        guard=" AND {quantity} >= %s"
+                    ),
+                    [(taken, pk, taken) for pk, taken in sold.items()]
+                )
+                if cursor.rowcount != len(sold):
+                    raise ValueError("Position changed while selling; trade rolled back")
+
+        StrategyHolding.objects.filter(
+            portfolio=portfolio,
+            asset_id__in=asset_ids,
+            quantity__lte=0
+        ).delete()
+
+        # Combined holdings are the sum of their strategy slices.
+        holdings = Holding.objects.filter(portfolio=portfolio, asset_id__in=asset_ids)
+        holdings.update(quantity=Coalesce(
+            Subquery(
+                StrategyHolding.objects.filter(holding=OuterRef("pk"))
+                .values("holding")
+                .annotate(total=Sum("quantity"))
+                .values("total")
+            ),
+            Value(Decimal("0"))
+        ))
+        holdings.filter(asset_id__in=sold_asset_ids, quantity=0).delete()
+
+        portfolio.move_cash(cash_delta)
+        portfolio.adjust_holdings_value(value_delta)
+
+        if strategy_allocation and buy_cost:
+            move_balance(strategy_allocation, "remaining_cash", -buy_cost)
+            if copy_relationship:
+                move_balance(copy_relationship, "remaining_cash", -buy_cost)
+
+        return record_trades(trades)
+
+
+def place_limit_order(portfolio, asset, side, quantity, limit_price, strategy_allocation=None):
+    """
+    Persist a resting limit order and add it to the in-memory book once
+    the transaction commits.
+    """
+    if side not in (Trade.BUY, Trade.SELL):
+        raise ValueError(f"Unknown order side {side}")
+    if quantity <= 0 or limit_price <= 0:
+        raise ValueError("Quantity and limit price must be positive")
+
+    order = LimitOrder.objects.create(
+        portfolio=portfolio,
+        asset=asset,
+        strategy_allocation=strategy_allocation,
+        side=side,
+        quantity=quantity,
+        limit_price=limit_price,
+    )
+    transaction.on_commit(lambda: get_engine().add(
+        order.pk, order.asset_id, order.portfolio_id,
+        order.side == Trade.BUY, order.limit_price
+    ))
+    return order
+
+
+def cancel_limit_order(order):
+    """
+    Cancel an open order. Returns False if it already filled or closed.
+    """
+    cancelled = LimitOrder.objects.filter(
+        pk=order.pk,
+        status=LimitOrder.OPEN
+    ).update(status=LimitOrder.CANCELLED, closed_at=timezone.now())
+    if cancelled:
+        transaction.on_commit(lambda: get_engine().cancel(order.pk))
+    return bool(cancelled)
+
+
+def match_limit_orders(changes):
+    """
+    Take the orders crossed by a price tick ({asset_id: (old, new)}) out
+    of the book and queue a fill for each on its portfolio's trade worker.
+    The matches are settled when the tick commits; on rollback they go
+    back on the book.
+    """
+    engine = get_engine()
+    engine.refresh()
+    matched = engine.match({
+        asset_id: new_price for asset_id, (_, new_price) in changes.items()
+    })
+    for order_id, portfolio_id in matched:
+        dispatch(portfolio_id, fill_limit_order, order_id)
+    if matched:
+        transaction.on_commit(lambda: engine.settle([order_id for order_id, _ in matched]))
+    return len(matched)
+
+
+def fill_limit_order(order_id):
+    """
+    Fill a matched order at the current price. If the price moved back
+    across the limit in the meantime the order goes back on the book; a
+    fill that execute_orders rejects marks the order REJECTED.
+    """
+    with transaction.atomic():
+        order = LimitOrder.objects.select_for_update().select_related(
+            'asset', 'portfolio', 'strategy_allocation'
+        ).filter(pk=order_id, status=LimitOrder.OPEN).first()
+        if order is None:
+            return None
+
+        price = order.asset.price
+        if order.side == Trade.BUY:
+            crossed = price <= order.limit_price
+        else:
+            crossed = price >= order.limit_price
+        if not crossed:
+            transaction.on_commit(lambda: get_engine().add(
+                order.pk, order.asset_id, order.portfolio_id,
+                order.side == Trade.BUY, order.limit_price
+            ))
+            return order
 
-def execute_sell(
+        try:
+            with transaction.atomic():
+                trades = execute_orders(
+                    order.portfolio,
+                    [Order(
+                        asset=order.asset,
+                        side=order.side,
+                        quantity=order.quantity,
+                        note=f"Limit {order.side} @ {order.limit_price}"
+                    )],
+                    strategy_allocation=order.strategy_allocation
+                )
+        except ValueError:
+            trades = []
+
+        order.status = LimitOrder.FILLED if trades else LimitOrder.REJECTED
+        order.fill_price = price if trades else None
+        order.closed_at = timezone.now()
+        order.save(update_fields=['status', 'fill_price', 'closed_at'])
+        return order
+
+
+def place_price_trigger(
     portfolio,
     asset,
-    quantity,
-    strategy_allocation=None,
-    note=""
+    kind,
+    trigger_price,
+    quantity=None,
+    strategy_allocation=None
 ):
-    price = asset.price
-    if price is None or price <= 0 or quantity <= 0:
-        return
+    """
+    Persist a stop-loss or take-profit on an existing position and add it
+    to the in-memory trigger index once the transaction commits.
+    """
+    if kind not in (PriceTrigger.STOP_LOSS, PriceTrigger.TAKE_PROFIT):
+        raise ValueError(f"Unknown trigger kind {kind}")
+    if trigger_price <= 0:
+        raise ValueError("Trigger price must be positive")
+    if quantity is not None and quantity <= 0:
+        raise ValueError("Quantity must be positive")
 
-    with transaction.atomic():
-        sh = StrategyHolding.objects.get(
-            portfolio=portfolio,
+    if strategy_allocation:
+        position = StrategyHolding.objects.filter(
             strategy_allocation=strategy_allocation,
             asset=asset
         )
-
-        if quantity > sh.quantity:
-            quantity = sh.quantity
-
-        proceeds = quantity * price
-
-        # 1️⃣ Reduce strategy holding
-        sh.quantity -= quantity
-        if sh.quantity == 0:
-            sh.delete()
-        else:
-            sh.save(update_fields=["quantity"])
-
-        # 2️⃣ Credit cash
-        portfolio.cash_balance += proceeds
-        portfolio.save(update_fields=["cash_balance"])
-
-        # 3️⃣ Sync combined holding
-        try:
-            holding = Holding.objects.get(
+    else:
+        position = Holding.objects.filter(portfolio=portfolio, asset=asset)
+    if not position.filter(quantity__gt=0).exists():
+        raise ValueError(f"No {asset.symbol} position to protect")
+
+    trigger = PriceTrigger.objects.create(
+        portfolio=portfolio,
+        asset=asset,
+        strategy_allocation=strategy_allocation,
+        kind=kind,
+        trigger_price=trigger_price,
+        quantity=quantity,
+    )
+    transaction.on_commit(lambda: _index_trigger(trigger))
+    return trigger
+
+
+def _index_trigger(trigger):
+    get_trigger_index().add(
+        trigger.pk, trigger.asset_id, trigger.portfolio_id,
+        trigger.kind == PriceTrigger.STOP_LOSS, trigger.trigger_price
+    )
+
+
+def cancel_price_trigger(trigger):
+    """
+    Cancel an active trigger. Returns False if it already fired or closed.
+    """
+    cancelled = PriceTrigger.objects.filter(
+        pk=trigger.pk,
+        status=PriceTrigger.ACTIVE
+    ).update(status=PriceTrigger.CANCELLED, closed_at=timezone.now())
+    if cancelled:
+        transaction.on_commit(lambda: get_trigger_index().cancel(trigger.pk))
+    return bool(cancelled)
+
+
+def match_price_triggers(changes):
+    """
+    Take the triggers crossed by a price tick ({asset_id: (old, new)}) out
+    of the index and queue one batch per portfolio on its trade worker,
+    settling them as match_limit_orders does.
+    """
+    index = get_trigger_index()
+    index.refresh()
+    matched = index.match({
+        asset_id: new_price for asset_id, (_, new_price) in changes.items()
+    })
+    if matched:
+        transaction.on_commit(lambda: index.settle([trigger_id for trigger_id, _ in matched]))
+    by_portfolio = {}
+    for trigger_id, portfolio_id in matched:
+        by_portfolio.setdefault(portfolio_id, []).append(trigger_id)
+    for portfolio_id, trigger_ids in by_portfolio.items():
+        dispatch(portfolio_id, fire_price_triggers, trigger_ids)
+    return len(matched)
+
+
+def fire_price_triggers(trigger_ids):
+    """
+    Sell the positions behind a batch of crossed triggers of one portfolio,
+    with one execute_orders call per strategy allocation involved.
+
+    Triggers the price has moved back across return to the index. A
+    trigger whose position is already gone (sold by an earlier trigger in
+    the batch, or unwound with its strategy) is cancelled, and so are the
+    remaining triggers on positions the batch closed.
+    """
+    with transaction.atomic():
+        triggers = list(
+            PriceTrigger.objects.select_for_update().select_related(
+                'asset', 'portfolio', 'strategy_allocation'
+            ).filter(pk__in=trigger_ids, status=PriceTrigger.ACTIVE).order_by('pk')
+        )
+        if not triggers:
+            return []
+
+        portfolio = triggers[0].portfolio
+        groups = {}
+        for trigger in triggers:
+            if not trigger.crossed_by(trigger.asset.price):
+                transaction.on_commit(lambda trigger=trigger: _index_trigger(trigger))
+                continue
+            groups.setdefault(trigger.strategy_allocation_id, []).append(trigger)
+
+        now = timezone.now()
+        fired = []
+        cancelled = []
+        for allocation_id, group in groups.items():
+            positions = StrategyHolding.objects.filter(
                 portfolio=portfolio,
-                asset=asset
+                asset_id__in={trigger.asset_id for trigger in group}
             )
-            holding.quantity = holding.total_quantity
-
-            if holding.quantity == 0:
-                holding.delete()
+            if allocation_id:
+                positions = positions.filter(strategy_allocation_id=allocation_id)
+            available = {}
+            for asset_id, quantity in positions.values_list('asset_id', 'quantity'):
+                available[asset_id] = available.get(asset_id, Decimal("0")) + quantity
+
+            orders = []
+            selling = []
+            for trigger in group:
+                held = available.get(trigger.asset_id, Decimal("0"))
+                quantity = held if trigger.quantity is None else min(trigger.quantity, held)
+                if quantity <= 0:
+                    cancelled.append(trigger)
+                    continue
+                available[trigger.asset_id] = held - quantity
+                orders.append(Order(
+                    asset=trigger.asset,
+                    side=Trade.SELL,
+                    quantity=quantity,
+                    note=f"{trigger.get_kind_display()} @ {trigger.trigger_price}"
+                ))
+                selling.append(trigger)
+
+            if not orders:
+                continue
+            try:
+                with transaction.atomic():
+                    execute_orders(
+                        portfolio,
+                        orders,
+                        strategy_allocation=group[0].strategy_allocation
+                    )
+            except ValueError:
+                # Stay active and retry on a later tick.
+                for trigger in selling:
+                    transaction.on_commit(lambda trigger=trigger: _index_trigger(trigger))
             else:
-                holding.save(update_fields=["quantity"])
-        except Holding.DoesNotExist:
-            pass
+                fired.extend(selling)
+
+        for trigger in fired:
+            trigger.status = PriceTrigger.FIRED
+            trigger.fill_price = trigger.asset.price
+            trigger.closed_at = now
+        for trigger in cancelled:
+            trigger.status = PriceTrigger.CANCELLED
+            trigger.closed_at = now
+        PriceTrigger.objects.bulk_update(
+            fired + cancelled,
+            ['status', 'fill_price', 'closed_at']
+        )
+
+        if fired:
+            _cancel_orphaned_triggers(portfolio, {trigger.asset_id for trigger in fired})
+        return fired
 
-        # 4️⃣ Trade record
-        Trade.objects.create(
+
+def _cancel_orphaned_triggers(portfolio, asset_ids):
+    held = set(
+        Holding.objects.filter(
+            portfolio=portfolio,
+            asset_id__in=asset_ids
+        ).values_list('asset_id', flat=True)
+    )
+    slices = set(
+        StrategyHolding.objects.filter(
+            portfolio=portfolio,
+            asset_id__in=asset_ids
+        ).values_list('strategy_allocation_id', 'asset_id')
+    )
+    orphaned = [
+        trigger_id
+        for trigger_id, allocation_id, asset_id in PriceTrigger.objects.filter(
             portfolio=portfolio,
-            asset=asset,
-            trade_type=Trade.SELL,
-            quantity=quantity,
-            price=price,
-            note=note,
+            asset_id__in=asset_ids,
+            status=PriceTrigger.ACTIVE
+        ).values_list('pk', 'strategy_allocation_id', 'asset_id')
+        if (asset_id not in held if allocation_id is None
+            else (allocation_id, asset_id) not in slices)
+    ]
+    if orphaned:
+        PriceTrigger.objects.filter(pk__in=orphaned).update(
+            status=PriceTrigger.CANCELLED,
+            closed_at=timezone.now()
         )
 
-    # Mirror to followers if needed
-    # mirror_trade(leader_portfolio=portfolio, asset=asset, trade_type=Trade.SELL, quantity=quantity)
+        def unindex():
+            index = get_trigger_index()
+            for trigger_id in orphaned:
+                index.cancel(trigger_id)
+        transaction.on_commit(unindex)
+
+
+TRADE_PAGE_SIZE = 50
+
+
+def encode_trade_cursor(trade):
+    return urlsafe_b64encode(
+        f"{trade.timestamp.isoformat()}|{trade.pk}".encode()
+    ).decode()
+
+
+def decode_trade_cursor(cursor):
+    """
+    (timestamp, pk) from a cursor made by encode_trade_cursor. Raises
+    ValueError for anything else.
+    """
+    try:
+        timestamp, pk = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        timestamp = datetime.fromisoformat(timestamp)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if timezone.is_naive(timestamp):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return timestamp, pk
+
+
+def trade_page(trades, after=None, before=None, limit=TRADE_PAGE_SIZE, archived=None):
+    """
+    One page of `trades`, newest first, by keyset on (timestamp, id):
+    the trades older than cursor `after`, or the ones just newer than
+    `before`. Each page is a bounded range scan of the (…, timestamp, id)
+    indexes on Trade however deep it is, unlike OFFSET.
+
+    `archived(older_than=, newer_than=, limit=)` pages through the same
+    trades in cold storage (see portfolios.archive), which all predate
+    the live ones; pages run on into it past the oldest live trade.
+
+    Returns {'trades', 'next_cursor', 'previous_cursor'}; a cursor is None
+    when there is nothing further that way.
+    """
+    if before:
+        timestamp, pk = decode_trade_cursor(before)
+        rows = []
+        if archived:
+            rows = archived(newer_than=(timestamp, pk), limit=limit + 1)
+        if len(rows) <= limit:
+            live = trades.filter(timestamp__gte=timestamp)
+            if not rows:
+                live = live.filter(Q(timestamp__gt=timestamp) | Q(pk__gt=pk))
+            rows += list(live.order_by("timestamp", "pk")[:limit + 1 - len(rows)])
+        has_newer = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_older = True
+    else:
+        key = None
+        if after:
+            key = timestamp, pk = decode_trade_cursor(after)
+            # The plain bound on timestamp is what lets the database seek
+            # into the index; the OR alone makes it scan.
+            trades = trades.filter(timestamp__lte=timestamp).filter(
+                Q(timestamp__lt=timestamp) | Q(pk__lt=pk)
+            )
+        rows = list(trades.order_by("-timestamp", "-pk")[:limit + 1])
+        if archived and len(rows) <= limit:
+            if rows:
+                key = rows[-1].timestamp, rows[-1].pk
+            rows += archived(older_than=key, limit=limit + 1 - len(rows))
+        has_older = len(rows) > limit
+        rows = rows[:limit]
+        has_newer = bool(after)
+
+    return {
+        "trades": rows,
+        "next_cursor": encode_trade_cursor(rows[-1]) if rows and has_older else None,
+        "previous_cursor": encode_trade_cursor(rows[0]) if rows and has_newer else None,
+    }
+
+
+def trade_history_page(trades, params, portfolio_id=None):
+    """
+    Template context for a trade history page: `trades` narrowed by the
+    filters in `params` (a QueryDict) and paged by its after/before
+    cursor, running on into archived trades of the same scope (one
+    portfolio, or all with None). An unreadable cursor falls back to the
+    first page.
+    """
+    from portfolios.archive import archived_trades
+    from assets.models import Asset
+    from .forms import TradeHistoryFilterForm
+
+    filter_form = TradeHistoryFilterForm(params)
+    trades = filter_form.filter(trades)
+
+    criteria = filter_form.criteria()
+    asset_id = None
+    if criteria["symbol"]:
+        asset_id = Asset.objects.filter(symbol=criteria["symbol"]).values_list("pk", flat=True).first()
+
+    def archived(**page):
+        if criteria["symbol"] and asset_id is None:
+            return []
+        return archived_trades(
+            portfolio_id=portfolio_id,
+            trade_type=criteria["trade_type"],
+            asset_id=asset_id,
+            start=criteria["start"],
+            end=criteria["end"],
+            **page
+        )
+
+    try:
+        page = trade_page(
+            trades,
+            after=params.get("after"),
+            before=params.get("before"),
+            archived=archived
+        )
+    except ValueError:
+        page = trade_page(trades, archived=archived)
+
+    filter_query = params.copy()
+    filter_query.pop("after", None)
+    filter_query.pop("before", None)
+    return {
+        **page,
+        "filter_form": filter_form,
+        "filter_query": filter_query.urlencode(),
+    }
 
 
 # def execute_sell(portfolio, asset, quantity, strategy_allocation=None, note=""):
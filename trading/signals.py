@@ -0,0 +1,20 @@
+from django.dispatch import Signal, receiver
+
+from assets.signals import price_ticked
+
+# Sent once a batch of ledger rows commits, with the created `trades`
+# (possibly spanning portfolios). Trades are bulk-inserted by
+# trading.services.record_trades, so post_save does not fire for them.
+trades_recorded = Signal()
+
+
+@receiver(price_ticked)
+def match_limit_orders_on_tick(sender, changes, **kwargs):
+    from .services import match_limit_orders
+    match_limit_orders(changes)
+
+
+@receiver(price_ticked)
+def fire_price_triggers_on_tick(sender, changes, **kwargs):
+    from .services import match_price_triggers
+    match_price_triggers(changes)
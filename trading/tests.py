@@ -1,3 +1,683 @@
+import tempfile
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.http import QueryDict
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import User
+from assets.models import Asset
+from portfolios import archive
+from portfolios.models import ArchiveSegment, Holding
+from strategies.models import PortfolioStrategy, Strategy, StrategyAllocation
+from strategies.services import activate_strategy
+from .dispatcher import TradeDispatcher
+from .idempotency import IDEMPOTENCY_CLAIM_TIMEOUT
+from .orderbook import MatchingEngine, get_trigger_index, open_limit_orders
+from .models import AssetDailyVolume, IdempotencyKey, LimitOrder, PriceTrigger, Trade
+from .services import (
+    Order,
+    execute_buy,
+    execute_orders,
+    execute_sell,
+    fill_limit_order,
+    fire_price_triggers,
+    first_rebuildable_day,
+    match_price_triggers,
+    place_limit_order,
+    place_price_trigger,
+    rebuild_asset_volume,
+    record_trades,
+    trade_history_page,
+    trade_page,
+)
+
+
+class TradeDispatcherTests(TestCase):
+
+    def test_latency_stats_are_bounded(self):
+        dispatcher = TradeDispatcher(workers=0, latency_portfolios=3)
+        for portfolio_id in range(10):
+            dispatcher.submit(portfolio_id, lambda: None)
+
+        stats = dispatcher.stats()
+        self.assertEqual(list(stats['latency']), [7, 8, 9])
+        self.assertEqual(stats['latency_overall']['jobs'], 10)
+        self.assertEqual(stats['completed'], 10)
+
+    def test_failed_job_resolves_future(self):
+        dispatcher = TradeDispatcher(workers=0)
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertLogs('trading.dispatcher', 'ERROR'):
+            future = dispatcher.submit(1, fail)
+        with self.assertRaises(ValueError):
+            future.result()
+        self.assertEqual(dispatcher.stats()['failed'], 1)
+
+
+class StrategyActivationFailureTests(TestCase):
+
+    def setUp(self):
+        asset = Asset.objects.create(name="Asset", symbol="ACT0", asset_type='STOCK')
+        self.strategy = Strategy.objects.create(
+            name="All in",
+            risk_level='HIGH',
+            target_return_min=1,
+            target_return_max=5
+        )
+        StrategyAllocation.objects.create(strategy=self.strategy, asset=asset, percentage=Decimal('100'))
+        self.user = User.objects.create_user(email="activate@example.com", password="x", full_name="Act")
+        self.portfolio = self.user.portfolio
+
+    def test_failed_activation_is_reported_once(self):
+        # More than the portfolio holds, so execute_orders refuses it.
+        ps = PortfolioStrategy.objects.create(
+            portfolio=self.portfolio,
+            strategy=self.strategy,
+            allocated_cash=self.portfolio.cash_balance * 2,
+            remaining_cash=self.portfolio.cash_balance * 2
+        )
+        with self.assertRaises(ValueError):
+            activate_strategy(self.portfolio, ps)
+        ps.refresh_from_db()
+        self.assertEqual(ps.status, 'FAILED')
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('account:portfolio'))
+        self.assertIn(
+            "could not be activated",
+            " ".join(str(message) for message in get_messages(response.wsgi_request))
+        )
+        ps.refresh_from_db()
+        self.assertEqual(ps.status, 'STOPPED')
+
+
+class DirectPositionTests(TestCase):
+    """
+    Orders without a strategy allocation buy into the portfolio's direct
+    position; cash plus holdings must be conserved across every fill.
+    """
+
+    def setUp(self):
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="LIM0",
+            asset_type='STOCK',
+            price=Decimal('10.00')
+        )
+        self.portfolio = User.objects.create_user(
+            email="limit@example.com", password="x", full_name="Lim"
+        ).portfolio
+        self.worth = self.portfolio.total_value()
+
+    def assertConserved(self):
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.total_value(), self.worth)
+        self.assertEqual(
+            self.portfolio.holdings_value,
+            self.portfolio.valuation()['holdings_value']
+        )
+
+    def test_limit_buy_fill_conserves_value(self):
+        order = place_limit_order(
+            self.portfolio, self.asset, Trade.BUY, Decimal('3'), Decimal('12.00')
+        )
+        order = fill_limit_order(order.pk)
+
+        self.assertEqual(order.status, LimitOrder.FILLED)
+        self.assertConserved()
+        self.assertEqual(self.portfolio.holdings_value, Decimal('30'))
+        self.assertEqual(
+            Holding.objects.get(portfolio=self.portfolio, asset=self.asset).quantity,
+            Decimal('3')
+        )
+
+        order = place_limit_order(
+            self.portfolio, self.asset, Trade.SELL, Decimal('3'), Decimal('9.00')
+        )
+        order = fill_limit_order(order.pk)
+
+        self.assertEqual(order.status, LimitOrder.FILLED)
+        self.assertConserved()
+        self.assertFalse(Holding.objects.filter(portfolio=self.portfolio).exists())
+
+    def test_repeated_buys_share_one_direct_position(self):
+        execute_buy(self.portfolio, self.asset, Decimal('2'))
+        execute_buy(self.portfolio, self.asset, Decimal('5'))
+
+        self.assertConserved()
+        holding = Holding.objects.get(portfolio=self.portfolio, asset=self.asset)
+        self.assertEqual(holding.quantity, Decimal('7'))
+        self.assertEqual(holding.strategy_slices.count(), 1)
+
+
+class ExecuteOrdersTests(TestCase):
+    """
+    A batch either fills as a whole or not at all, skips what it cannot
+    fill, and costs the same number of queries however many orders it
+    holds.
+    """
+
+    def setUp(self):
+        self.assets = [
+            Asset.objects.create(
+                name=f"Asset {i}",
+                symbol=f"BAT{i}",
+                asset_type='STOCK',
+                price=Decimal('10.00')
+            )
+            for i in range(5)
+        ]
+        self.portfolio = User.objects.create_user(
+            email="batch@example.com", password="x", full_name="Batch"
+        ).portfolio
+        self.cash = self.portfolio.cash_balance
+
+    def quantity(self, asset):
+        holding = Holding.objects.filter(portfolio=self.portfolio, asset=asset).first()
+        return holding.quantity if holding else Decimal('0')
+
+    def test_batch_beyond_cash_is_rejected_whole(self):
+        affordable = Order(self.assets[0], Trade.BUY, Decimal('1'))
+        too_dear = Order(self.assets[1], Trade.BUY, self.cash / Decimal('10'))
+
+        with self.assertRaises(ValueError):
+            execute_orders(self.portfolio, [affordable, too_dear])
+
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, self.cash)
+        self.assertFalse(Trade.objects.exists())
+        self.assertFalse(Holding.objects.filter(portfolio=self.portfolio).exists())
+
+    def test_failed_cash_guard_rolls_back_the_batch(self):
+        # Cash spent elsewhere after the budget was read: the guarded
+        # UPDATE refuses, and the slices already written go with it.
+        with mock.patch('trading.services._locked_value', return_value=self.cash * 2):
+            with self.assertRaises(ValueError):
+                execute_orders(self.portfolio, [
+                    Order(self.assets[0], Trade.BUY, Decimal('1')),
+                    Order(self.assets[1], Trade.BUY, self.cash / Decimal('10')),
+                ])
+
+        self.assertFalse(Trade.objects.exists())
+        self.assertFalse(Holding.objects.filter(portfolio=self.portfolio).exists())
+
+    def test_sells_are_capped_at_the_position(self):
+        execute_buy(self.portfolio, self.assets[0], Decimal('3'))
+
+        trades = execute_orders(self.portfolio, [
+            Order(self.assets[0], Trade.SELL, Decimal('5')),
+            # Not held at all: skipped.
+            Order(self.assets[1], Trade.SELL, Decimal('1')),
+            Order(self.assets[2], Trade.BUY, Decimal('2')),
+        ])
+
+        self.assertEqual(
+            [(t.asset_id, t.trade_type, t.quantity) for t in trades],
+            [(self.assets[0].pk, Trade.SELL, Decimal('3')),
+             (self.assets[2].pk, Trade.BUY, Decimal('2'))]
+        )
+        self.assertEqual(self.quantity(self.assets[0]), Decimal('0'))
+        self.assertEqual(self.quantity(self.assets[2]), Decimal('2'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, self.cash - Decimal('20'))
+
+    def test_partial_batch_skips_what_the_allocation_cannot_afford(self):
+        strategy = Strategy.objects.create(
+            name="Budget",
+            risk_level='LOW',
+            target_return_min=1,
+            target_return_max=5
+        )
+        allocation = PortfolioStrategy.objects.create(
+            portfolio=self.portfolio,
+            strategy=strategy,
+            allocated_cash=Decimal('50'),
+            remaining_cash=Decimal('50')
+        )
+        Asset.objects.filter(pk=self.assets[4].pk).update(price=Decimal('0'))
+        self.assets[4].refresh_from_db()
+
+        trades = execute_orders(self.portfolio, [
+            Order(self.assets[0], Trade.BUY, Decimal('3')),
+            # 40 more would exceed the remaining 20: skipped.
+            Order(self.assets[1], Trade.BUY, Decimal('4')),
+            Order(self.assets[2], Trade.BUY, Decimal('2')),
+            Order(self.assets[3], Trade.BUY, Decimal('0')),
+            Order(self.assets[4], Trade.BUY, Decimal('1')),
+        ], strategy_allocation=allocation)
+
+        self.assertEqual([t.asset_id for t in trades], [self.assets[0].pk, self.assets[2].pk])
+        allocation.refresh_from_db()
+        self.assertEqual(allocation.remaining_cash, Decimal('0'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, self.cash - Decimal('50'))
+        self.assertEqual(self.quantity(self.assets[1]), Decimal('0'))
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        with self.assertNumQueries(16):
+            execute_orders(self.portfolio, [Order(self.assets[0], Trade.BUY, Decimal('1'))])
+        with self.assertNumQueries(16):
+            execute_orders(self.portfolio, [
+                Order(asset, Trade.BUY, Decimal('1')) for asset in self.assets
+            ])
+        # Emptying the positions adds the holding deletes, once.
+        with self.assertNumQueries(17):
+            execute_orders(self.portfolio, [
+                Order(asset, Trade.SELL, Decimal('2')) for asset in self.assets
+            ])
+
+
+class MatchingEngineTests(TestCase):
+
+    def setUp(self):
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="BOOK0",
+            asset_type='STOCK',
+            price=Decimal('10.00')
+        )
+        self.portfolio = User.objects.create_user(
+            email="book@example.com", password="x", full_name="Book"
+        ).portfolio
+        self.engine = MatchingEngine(open_limit_orders)
+        self.engine.rebuild()
+
+    def place(self, limit_price):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_limit_order(
+                self.portfolio, self.asset, Trade.BUY, Decimal('1'), limit_price
+            )
+
+    def test_rolled_back_match_returns_to_book(self):
+        order = self.place(Decimal('9.00'))
+        self.engine.refresh()
+
+        with transaction.atomic():
+            self.assertEqual(
+                self.engine.match({self.asset.pk: Decimal('8.50')}),
+                [(order.pk, self.portfolio.pk)]
+            )
+            transaction.set_rollback(True)
+
+        self.assertEqual(
+            self.engine.match({self.asset.pk: Decimal('8.50')}),
+            [(order.pk, self.portfolio.pk)]
+        )
+        self.engine.settle([order.pk])
+        self.assertEqual(self.engine.match({self.asset.pk: Decimal('8.00')}), [])
+        self.assertEqual(len(self.engine), 0)
+
+    def test_refresh_picks_up_orders_placed_elsewhere(self):
+        # Placed through another process: this engine never saw the add.
+        order = LimitOrder.objects.create(
+            portfolio=self.portfolio,
+            asset=self.asset,
+            side=Trade.BUY,
+            quantity=Decimal('1'),
+            limit_price=Decimal('9.00')
+        )
+        self.assertEqual(self.engine.match({self.asset.pk: Decimal('8.50')}), [])
+
+        self.assertEqual(self.engine.refresh(), 1)
+        self.assertEqual(
+            self.engine.match({self.asset.pk: Decimal('8.50')}),
+            [(order.pk, self.portfolio.pk)]
+        )
+
+
+class RebuildAssetVolumeTests(TestCase):
+
+    def setUp(self):
+        asset = Asset.objects.create(name="Asset", symbol="VOL0", asset_type='STOCK')
+        end_at = timezone.now() - timedelta(days=30)
+        self.archived_day = timezone.localdate(end_at)
+        # Rolled up before its trades went to cold storage.
+        AssetDailyVolume.objects.create(
+            asset=asset,
+            day=self.archived_day,
+            buy_count=1,
+            buy_quantity=Decimal('1'),
+            buy_notional=Decimal('10')
+        )
+        ArchiveSegment.objects.create(
+            kind=ArchiveSegment.TRADES,
+            path="trades/test.npz",
+            period=self.archived_day.replace(day=1),
+            first_id=1,
+            last_id=1,
+            start_at=end_at - timedelta(days=1),
+            end_at=end_at,
+            row_count=1,
+            size_bytes=1
+        )
+
+    def test_archived_days_are_not_rebuilt(self):
+        with self.assertRaises(ValueError):
+            rebuild_asset_volume(self.archived_day)
+        self.assertTrue(AssetDailyVolume.objects.filter(day=self.archived_day).exists())
+
+        self.assertEqual(first_rebuildable_day(), self.archived_day + timedelta(days=1))
+        rebuild_asset_volume(first_rebuildable_day())
+        self.assertTrue(AssetDailyVolume.objects.filter(day=self.archived_day).exists())
+
+
+class IdempotentViewTests(TestCase):
+    endpoint = 'trading.views.place_limit_order_view'
+
+    def setUp(self):
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="IDEM0",
+            asset_type='STOCK',
+            price=Decimal('10.00')
+        )
+        self.user = User.objects.create_user(email="idem@example.com", password="x", full_name="Idem")
+        self.client.force_login(self.user)
+        self.url = reverse('trading:place_limit_order', args=[self.asset.pk])
+
+    def post(self, key, quantity='1'):
+        return self.client.post(self.url, {
+            'side': Trade.BUY,
+            'quantity': quantity,
+            'limit_price': '9.00',
+            'idempotency_key': key,
+        })
+
+    def mark_running(self, key, claimed_at):
+        return IdempotencyKey.objects.create(
+            user=self.user,
+            endpoint=self.endpoint,
+            key=key,
+            request_hash='',
+            claimed_at=claimed_at
+        )
+
+    def test_repeat_is_replayed(self):
+        first = self.post('replay')
+        second = self.post('replay')
+
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(LimitOrder.objects.count(), 1)
+
+    def test_key_reused_for_other_request_is_refused(self):
+        self.post('mismatch')
+        response = self.post('mismatch', quantity='2')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(LimitOrder.objects.count(), 1)
+
+    def test_running_key_conflicts(self):
+        self.mark_running('running', timezone.now())
+
+        with mock.patch('trading.idempotency.IDEMPOTENCY_WAIT_SECONDS', 0):
+            response = self.post('running')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(LimitOrder.objects.exists())
+
+    def test_abandoned_key_is_taken_over(self):
+        self.mark_running('abandoned', timezone.now() - IDEMPOTENCY_CLAIM_TIMEOUT - timedelta(seconds=1))
+
+        response = self.post('abandoned')
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(LimitOrder.objects.count(), 1)
+        self.assertEqual(
+            IdempotencyKey.objects.get(key='abandoned').status_code,
+            302
+        )
+
+    def test_exception_releases_key(self):
+        with mock.patch('trading.views.place_limit_order', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.post('error')
+        self.assertFalse(IdempotencyKey.objects.filter(key='error').exists())
+
+        response = self.post('error')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(LimitOrder.objects.count(), 1)
+
+
+class TradePageTests(TestCase):
+    """
+    Keyset pages over (timestamp, id), running on into archived trades.
+    """
+
+    def setUp(self):
+        self.assets = [
+            Asset.objects.create(
+                name=f"Asset {i}",
+                symbol=f"PAGE{i}",
+                asset_type='STOCK',
+                price=Decimal('10.00')
+            )
+            for i in range(2)
+        ]
+        self.user = User.objects.create_user(email="pages@example.com", password="x", full_name="Pages")
+        self.portfolio = self.user.portfolio
+        self.base = timezone.now() - timedelta(days=10)
+
+        # Nine trades, three to a timestamp, so pages split ties.
+        self.kinds = {}
+        for i in range(9):
+            trade, = record_trades([Trade(
+                portfolio=self.portfolio,
+                asset=self.assets[i % 2],
+                trade_type=Trade.SELL if i % 3 == 0 else Trade.BUY,
+                quantity=Decimal('1'),
+                price=Decimal('10.00')
+            )])
+            Trade.objects.filter(pk=trade.pk).update(timestamp=self.base + timedelta(hours=i // 3))
+            self.kinds[trade.pk] = trade.asset_id, trade.trade_type
+
+        self.trades = self.portfolio.trades.all()
+        self.newest_first = list(self.trades.order_by('-timestamp', '-pk').values_list('pk', flat=True))
+
+    def archive_oldest(self, count):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        patcher = mock.patch.object(archive, 'ARCHIVE_ROOT', Path(root.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        archive._load.cache_clear()
+        self.addCleanup(archive._load.cache_clear)
+
+        cutoff = self.base + timedelta(hours=count // 3)
+        archive.archive_records(ArchiveSegment.TRADES, cutoff)
+        return lambda **page: archive.archived_trades(portfolio_id=self.portfolio.pk, **page)
+
+    def walk(self, limit, archived=None):
+        """
+        Every page forwards by next_cursor, then back by previous_cursor.
+        """
+        pages = [trade_page(self.trades, limit=limit, archived=archived)]
+        while pages[-1]['next_cursor']:
+            pages.append(trade_page(
+                self.trades, after=pages[-1]['next_cursor'], limit=limit, archived=archived
+            ))
+        forward = [trade.pk for page in pages for trade in page['trades']]
+
+        backward = [trade.pk for trade in pages[-1]['trades']]
+        page = pages[-1]
+        while page['previous_cursor']:
+            page = trade_page(
+                self.trades, before=page['previous_cursor'], limit=limit, archived=archived
+            )
+            backward = [trade.pk for trade in page['trades']] + backward
+        return forward, backward
+
+    def test_pages_split_equal_timestamps(self):
+        for limit in (1, 2, 4):
+            forward, backward = self.walk(limit)
+            self.assertEqual(forward, self.newest_first)
+            self.assertEqual(backward, self.newest_first)
+
+    def test_before_returns_previous_page(self):
+        first = trade_page(self.trades, limit=4)
+        second = trade_page(self.trades, after=first['next_cursor'], limit=4)
+        back = trade_page(self.trades, before=second['previous_cursor'], limit=4)
+
+        self.assertEqual(back['trades'], first['trades'])
+        self.assertIsNone(first['previous_cursor'])
+        self.assertIsNone(back['previous_cursor'])
+        self.assertEqual(back['next_cursor'], first['next_cursor'])
+
+    def test_pages_run_on_into_archived_trades(self):
+        archived = self.archive_oldest(6)
+        self.assertEqual(self.trades.count(), 3)
+
+        for limit in (2, 4):
+            forward, backward = self.walk(limit, archived=archived)
+            self.assertEqual(forward, self.newest_first)
+            self.assertEqual(backward, self.newest_first)
+
+    def test_filters_apply_to_live_and_archived_trades(self):
+        self.archive_oldest(6)
+
+        history = trade_history_page(
+            self.trades,
+            QueryDict(f"asset=page1&trade_type={Trade.BUY}"),
+            portfolio_id=self.portfolio.pk
+        )
+        expected = [
+            pk for pk in self.newest_first
+            if self.kinds[pk] == (self.assets[1].pk, Trade.BUY)
+        ]
+        self.assertEqual(len(expected), 3)
+        self.assertEqual([trade.pk for trade in history['trades']], expected)
+        self.assertIn("asset=page1", history['filter_query'])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        first = trade_history_page(self.trades, QueryDict(""))
+        cursors = [
+            "garbage",
+            "!!!",
+            urlsafe_b64encode(b"2024-01-01T00:00:00|1").decode(),
+            urlsafe_b64encode(b"2024-01-01T00:00:00+00:00|x").decode(),
+            urlsafe_b64encode(b"no separator").decode(),
+            urlsafe_b64encode(b"\xff\xfe|1").decode(),
+        ]
+        for cursor in cursors:
+            for direction in ("after", "before"):
+                params = QueryDict(mutable=True)
+                params[direction] = cursor
+                history = trade_history_page(self.trades, params)
+                self.assertEqual(history['trades'], first['trades'])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('account:history'), {'after': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+
+
+class PriceTriggerTests(TestCase):
+
+    def setUp(self):
+        # A fresh trigger index per test; the process-wide one outlives
+        # the test transaction.
+        patcher = mock.patch.dict('trading.orderbook._engines', clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.asset = Asset.objects.create(
+            name="Asset",
+            symbol="TRIG0",
+            asset_type='STOCK',
+            price=Decimal('10.00')
+        )
+        self.portfolio = User.objects.create_user(
+            email="trigger@example.com", password="x", full_name="Trig"
+        ).portfolio
+        execute_buy(self.portfolio, self.asset, Decimal('5'))
+        self.portfolio.refresh_from_db()
+
+    def place(self, kind, trigger_price):
+        with self.captureOnCommitCallbacks(execute=True):
+            return place_price_trigger(self.portfolio, self.asset, kind, Decimal(trigger_price))
+
+    def move_price(self, price):
+        Asset.objects.filter(pk=self.asset.pk).update(price=Decimal(price))
+
+    def position(self):
+        holding = Holding.objects.filter(portfolio=self.portfolio, asset=self.asset).first()
+        return holding.quantity if holding else Decimal('0')
+
+    def test_crossing_tick_fires_and_cancels_the_other_side(self):
+        stop = self.place(PriceTrigger.STOP_LOSS, '9.00')
+        take = self.place(PriceTrigger.TAKE_PROFIT, '12.00')
+        cash = self.portfolio.cash_balance
+
+        # A tick that stays above the stop fires nothing.
+        self.move_price('9.50')
+        self.assertEqual(match_price_triggers({self.asset.pk: (Decimal('10.00'), Decimal('9.50'))}), 0)
+
+        self.move_price('8.50')
+        with self.captureOnCommitCallbacks(execute=True):
+            matched = match_price_triggers({self.asset.pk: (Decimal('9.50'), Decimal('8.50'))})
+        self.assertEqual(matched, 1)
+
+        stop.refresh_from_db()
+        take.refresh_from_db()
+        self.assertEqual(stop.status, PriceTrigger.FIRED)
+        self.assertEqual(stop.fill_price, Decimal('8.50'))
+        # Its position is gone, so the take-profit is orphaned.
+        self.assertEqual(take.status, PriceTrigger.CANCELLED)
+        self.assertEqual(self.position(), 0)
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, cash + Decimal('42.50'))
+
+    def test_trigger_on_sold_position_is_cancelled(self):
+        stop = self.place(PriceTrigger.STOP_LOSS, '9.00')
+        execute_sell(self.portfolio, self.asset, Decimal('5'))
+
+        self.move_price('8.00')
+        self.assertEqual(fire_price_triggers([stop.pk]), [])
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, PriceTrigger.CANCELLED)
+
+    def test_price_moved_back_returns_trigger_to_index(self):
+        stop = self.place(PriceTrigger.STOP_LOSS, '9.00')
+        index = get_trigger_index()
+        index.match({self.asset.pk: Decimal('8.00')})
+        index.settle([stop.pk])
+        self.assertEqual(len(index), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(fire_price_triggers([stop.pk]), [])
+        self.assertEqual(len(index), 1)
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, PriceTrigger.ACTIVE)
+
+    def test_failed_sale_is_retried(self):
+        stop = self.place(PriceTrigger.STOP_LOSS, '9.00')
+        index = get_trigger_index()
+        self.move_price('8.00')
+        index.match({self.asset.pk: Decimal('8.00')})
+        index.settle([stop.pk])
+
+        with mock.patch('trading.services.execute_orders', side_effect=ValueError("no")):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(fire_price_triggers([stop.pk]), [])
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, PriceTrigger.ACTIVE)
+        self.assertEqual(self.position(), Decimal('5'))
 
-# Create your tests here.
+        # Back in the index, so the next tick retries it.
+        self.assertEqual(index.match({self.asset.pk: Decimal('7.90')}), [(stop.pk, self.portfolio.pk)])
+        self.assertEqual(fire_price_triggers([stop.pk]), [stop])
+        stop.refresh_from_db()
+        self.assertEqual(stop.status, PriceTrigger.FIRED)
+        self.assertEqual(self.position(), 0)
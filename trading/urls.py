@@ -6,4 +6,10 @@ app_name = 'trading'
 
 urlpatterns = [
     path('test-buy/<int:asset_id>/', views.test_buy_view, name='test_buy'),
+    path('limit-orders/<int:asset_id>/place/', views.place_limit_order_view, name='place_limit_order'),
+    path('limit-orders/<int:order_id>/cancel/', views.cancel_limit_order_view, name='cancel_limit_order'),
+    path('triggers/<int:asset_id>/place/', views.place_price_trigger_view, name='place_price_trigger'),
+    path('triggers/<int:trigger_id>/cancel/', views.cancel_price_trigger_view, name='cancel_price_trigger'),
+    path('dispatcher-stats/', views.dispatcher_stats_view, name='dispatcher_stats'),
+    path('idempotency-stats/', views.idempotency_stats_view, name='idempotency_stats'),
 ]
\ No newline at end of file
@@ -1,18 +1,140 @@
+from decimal import Decimal, InvalidOperation
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import redirect
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.views.decorators.http import require_POST
 from assets.models import Asset
 from portfolios.models import Portfolio
-from .services import execute_buy
+from staff.decorators import admin_staff_only
+from .dispatcher import dispatch, get_dispatcher
+from .idempotency import idempotency_stats, idempotent
+from strategies.models import PortfolioStrategy
+from .models import LimitOrder, PriceTrigger
+from .services import (
+    cancel_limit_order,
+    cancel_price_trigger,
+    execute_buy,
+    place_limit_order,
+    place_price_trigger,
+)
 
 @login_required
 def test_buy_view(request, asset_id):
     asset = Asset.objects.get(id=asset_id)
     portfolio = Portfolio.objects.get(user=request.user)
 
-    execute_buy(
+    dispatch(
+        portfolio.pk,
+        execute_buy,
         portfolio=portfolio,
         asset=asset,
         quantity=10
     )
 
     return redirect('account:customer_dashboard')
+
+
+@login_required
+@admin_staff_only
+def dispatcher_stats_view(request):
+    return JsonResponse(get_dispatcher().stats())
+
+
+@login_required
+@admin_staff_only
+def idempotency_stats_view(request):
+    return JsonResponse(idempotency_stats())
+
+
+@login_required
+@require_POST
+@idempotent
+def place_limit_order_view(request, asset_id):
+    asset = get_object_or_404(Asset, id=asset_id)
+
+    try:
+        order = place_limit_order(
+            portfolio=request.user.portfolio,
+            asset=asset,
+            side=request.POST.get("side", ""),
+            quantity=Decimal(request.POST.get("quantity", "0")),
+            limit_price=Decimal(request.POST.get("limit_price", "0")),
+        )
+    except (InvalidOperation, ValueError) as exc:
+        messages.error(request, f"Could not place order: {exc}")
+    else:
+        messages.success(
+            request,
+            f"Limit {order.side.lower()} for {order.quantity} {asset.symbol} "
+            f"at ${order.limit_price} placed."
+        )
+    return redirect('account:customer_dashboard')
+
+
+@login_required
+@require_POST
+def cancel_limit_order_view(request, order_id):
+    order = get_object_or_404(
+        LimitOrder,
+        id=order_id,
+        portfolio=request.user.portfolio
+    )
+
+    if cancel_limit_order(order):
+        messages.success(request, "Limit order cancelled.")
+    else:
+        messages.info(request, "This order is no longer open.")
+    return redirect('account:customer_dashboard')
+
+
+@login_required
+@require_POST
+@idempotent
+def place_price_trigger_view(request, asset_id):
+    asset = get_object_or_404(Asset, id=asset_id)
+    portfolio = request.user.portfolio
+
+    strategy_allocation = None
+    if request.POST.get("strategy_allocation"):
+        strategy_allocation = get_object_or_404(
+            PortfolioStrategy,
+            id=request.POST["strategy_allocation"],
+            portfolio=portfolio
+        )
+
+    try:
+        quantity = request.POST.get("quantity")
+        trigger = place_price_trigger(
+            portfolio=portfolio,
+            asset=asset,
+            kind=request.POST.get("kind", ""),
+            trigger_price=Decimal(request.POST.get("trigger_price", "0")),
+            quantity=Decimal(quantity) if quantity else None,
+            strategy_allocation=strategy_allocation,
+        )
+    except (InvalidOperation, ValueError) as exc:
+        messages.error(request, f"Could not set trigger: {exc}")
+    else:
+        messages.success(
+            request,
+            f"{trigger.get_kind_display()} for {asset.symbol} "
+            f"at ${trigger.trigger_price} set."
+        )
+    return redirect('account:customer_dashboard')
+
+
+@login_required
+@require_POST
+def cancel_price_trigger_view(request, trigger_id):
+    trigger = get_object_or_404(
+        PriceTrigger,
+        id=trigger_id,
+        portfolio=request.user.portfolio
+    )
+
+    if cancel_price_trigger(trigger):
+        messages.success(request, f"{trigger.get_kind_display()} cancelled.")
+    else:
+        messages.info(request, "This trigger is no longer active.")
+    return redirect('account:customer_dashboard')